@@ -23,4 +23,6 @@ try:
         time.sleep(0.3)
 
 except KeyboardInterrupt:
-    sensor.setOperatingMode(TMAG5273_STANDBY_BY_MODE)
\ No newline at end of file
+    sensor.setOperatingMode(TMAG5273_STANDBY_BY_MODE)
+finally:
+    sensor.close()
@@ -21,4 +21,6 @@ try:
         time.sleep(1)
 
 except KeyboardInterrupt:
-    sensor.setOperatingMode(TMAG5273_STANDBY_BY_MODE)
\ No newline at end of file
+    sensor.setOperatingMode(TMAG5273_STANDBY_BY_MODE)
+finally:
+    sensor.close()
@@ -1,5 +1,71 @@
-from smbus2 import SMBus
+import errno
+import struct
+import time
+from collections import namedtuple
 from TMAG5273_RaspberryPi_Library_Defs import *
+from TMAG5273_RaspberryPi_Library_Transport import TMAG5273Transport, SMBusTransport
+from TMAG5273_RaspberryPi_Library_Metrics import TMAG5273Metrics, InstrumentedTransport
+
+# One decoded set of conversion results. Channels that are not enabled are None.
+TMAG5273Sample = namedtuple("TMAG5273Sample", ["temperature", "x", "y", "z", "convStatus", "angle", "magnitude"])
+
+# T_MSB_RESULT (0x10) .. MAGNITUDE_RESULT (0x1B): T, X, Y, Z, CONV_STATUS, ANGLE, MAGNITUDE
+TMAG5273_RESULT_BLOCK = struct.Struct(">HhhhBHB")
+TMAG5273_RESULT_BLOCK_LENGTH = TMAG5273_RESULT_BLOCK.size
+
+# DEVICE_CONFIG_1 (0x00) .. I2C_ADDRESS (0x0C)
+TMAG5273_CONFIG_BLOCK_LENGTH = TMAG5273_REG_I2C_ADDRESS - TMAG5273_REG_DEVICE_CONFIG_1 + 1
+
+# configure() keyword -> (register, bit mask, least significant bit, maximum value)
+TMAG5273_CONFIG_FIELDS = {
+    "crc": (TMAG5273_REG_DEVICE_CONFIG_1, TMAG5273_CRC_MODE_BITS, TMAG5273_CRC_MODE_LSB, TMAG5273_CRC_ENABLE),
+    "mag_temp": (TMAG5273_REG_DEVICE_CONFIG_1, TMAG5273_MAG_TEMP_BITS, TMAG5273_MAG_TEMP_LSB, TMAG5273_MAG_TEMP_0P2PCT),
+    "avg": (TMAG5273_REG_DEVICE_CONFIG_1, TMAG5273_CONV_AVG_BITS, TMAG5273_CONV_AVG_LSB, TMAG5273_X32_CONVERSION),
+    "read_mode": (TMAG5273_REG_DEVICE_CONFIG_1, TMAG5273_I2C_READ_MODE_BITS, TMAG5273_I2C_READ_MODE_LSB, TMAG5273_I2C_MODE_1BYTE_8BIT),
+    "thr_hyst": (TMAG5273_REG_DEVICE_CONFIG_2, TMAG5273_THR_HYST_BITS, TMAG5273_THR_HYST_LSB, TMAG5273_THRESHOLD_HYST_7LSB),
+    "low_power": (TMAG5273_REG_DEVICE_CONFIG_2, TMAG5273_LOW_POWER_BITS, TMAG5273_LOW_POWER_LSB, TMAG5273_LOW_NOISE_MODE),
+    "glitch_filter": (TMAG5273_REG_DEVICE_CONFIG_2, TMAG5273_GLITCH_FILTER_BITS, TMAG5273_GLITCH_FILTER_LSB, TMAG5273_GLITCH_OFF),
+    "trigger": (TMAG5273_REG_DEVICE_CONFIG_2, TMAG5273_TRIGGER_MODE_BITS, TMAG5273_TRIGGER_MODE_LSB, TMAG5273_TRIGGER_INT_SIGNAL),
+    "mode": (TMAG5273_REG_DEVICE_CONFIG_2, TMAG5273_OPERATING_MODE_BITS, TMAG5273_OPERATING_MODE_LSB, TMAG5273_WAKE_UP_AND_SLEEP_MODE),
+    "channel": (TMAG5273_REG_SENSOR_CONFIG_1, TMAG5273_CHANNEL_MODE_BITS, TMAG5273_CHANNEL_MODE_LSB, TMAG5273_XZX_ENABLE),
+    "sleep": (TMAG5273_REG_SENSOR_CONFIG_1, TMAG5273_SLEEP_MODE_BITS, TMAG5273_SLEEP_MODE_LSB, TMAG5273_SLEEP_20000MS),
+    "threshold_count": (TMAG5273_REG_SENSOR_CONFIG_2, TMAG5273_THRESHOLD_COUNT_BITS, TMAG5273_THRESHOLD_COUNT_LSB, TMAG5273_THRESHOLD_4),
+    "threshold_dir": (TMAG5273_REG_SENSOR_CONFIG_2, TMAG5273_THRESHOLD_INT_BITS, TMAG5273_THRESHOLD_INT_LSB, TMAG5273_THRESHOLD_INT_BELOW),
+    "gain_channel": (TMAG5273_REG_SENSOR_CONFIG_2, TMAG5273_GAIN_ADJUST_BITS, TMAG5273_GAIN_ADJUST_LSB, TMAG5273_GAIN_ADJUST_CHANNEL_2),
+    "angle": (TMAG5273_REG_SENSOR_CONFIG_2, TMAG5273_ANGLE_CALCULATION_BITS, TMAG5273_ANGLE_CALCULATION_LSB, TMAG5273_XZ_ANGLE_CALCULATION),
+    "range_xy": (TMAG5273_REG_SENSOR_CONFIG_2, TMAG5273_XY_RANGE_BITS, TMAG5273_XY_RANGE_LSB, TMAG5273_RANGE_80MT),
+    "range_z": (TMAG5273_REG_SENSOR_CONFIG_2, TMAG5273_Z_RANGE_BITS, TMAG5273_Z_RANGE_LSB, TMAG5273_RANGE_80MT),
+    "x_threshold": (TMAG5273_REG_X_THR_CONFIG, 0xFF, 0, 0xFF),
+    "y_threshold": (TMAG5273_REG_Y_THR_CONFIG, 0xFF, 0, 0xFF),
+    "z_threshold": (TMAG5273_REG_Z_THR_CONFIG, 0xFF, 0, 0xFF),
+    "temperature": (TMAG5273_REG_T_CONFIG, TMAG5273_TEMPERATURE_BITS, TMAG5273_TEMPERATURE_LSB, TMAG5273_TEMPERATURE_ENABLE),
+    "int_result": (TMAG5273_REG_INT_CONFIG_1, TMAG5273_INTERRUPT_RESULT_BITS, TMAG5273_INTERRUPT_RESULT_LSB, TMAG5273_INTERRUPT_ASSERTED),
+    "int_threshold": (TMAG5273_REG_INT_CONFIG_1, TMAG5273_INTERRUPT_THRESHOLD_BITS, TMAG5273_INTERRUPT_THRESHOLD_LSB, TMAG5273_INTERRUPT_ASSERTED),
+    "int_state": (TMAG5273_REG_INT_CONFIG_1, TMAG5273_INTERRUPT_PIN_STATE_BITS, TMAG5273_INTERRUPT_PIN_STATE_LSB, TMAG5273_INTERRUPT_PULSED),
+    "int_mode": (TMAG5273_REG_INT_CONFIG_1, TMAG5273_INTERRUPT_MODE_BITS, TMAG5273_INTERRUPT_MODE_LSB, TMAG5273_INTERRUPT_THROUGH_SCL_I2C),
+    "int_mask": (TMAG5273_REG_INT_CONFIG_1, TMAG5273_INTERRUPT_MASK_BITS, TMAG5273_INTERRUPT_MASK_LSB, TMAG5273_INTERRUPT_DISABLED),
+    "gain": (TMAG5273_REG_MAG_GAIN_CONFIG, 0xFF, 0, 0xFF),
+    "offset_1": (TMAG5273_REG_MAG_OFFSET_CONFIG_1, 0xFF, 0, 0xFF),
+    "offset_2": (TMAG5273_REG_MAG_OFFSET_CONFIG_2, 0xFF, 0, 0xFF),
+}
+
+# CRC-8 used by the I2C CRC mode: polynomial x^8 + x^2 + x + 1, initial value 0xFF
+def _crc8TableEntry(value):
+    for _ in range(8):
+        value = ((value << 1) ^ 0x07) & 0xFF if value & 0x80 else (value << 1) & 0xFF
+    return value
+
+_CRC8_TABLE = bytes(_crc8TableEntry(value) for value in range(256))
+
+def crc8(data, crc=0xFF):
+    """CRC-8 of data using the precomputed table: one lookup per byte"""
+    for byte in data:
+        crc = _CRC8_TABLE[crc ^ byte]
+    return crc
+
+# With CRC enabled the device sends one CRC byte after every 4 data bytes
+TMAG5273_CRC_FRAME_DATA = 4
+
 
 def printOperatingMode(mode):
         match mode:
@@ -15,8 +81,266 @@ def printOperatingMode(mode):
 
 
 class TMAG5273:
-    def __init__(self):
-        """Empty Constructor"""
+    def __init__(self, bus=1, address=TMAG5273_I2C_ADDRESS_INITIAL):
+        """
+        @brief Constructor. Opens the I2C bus once; the handle is kept for
+         the whole life of the driver instead of being reopened on every
+         register access.
+        @param bus I2C bus number to open (1 = /dev/i2c-1), an already
+         opened SMBus object or a TMAG5273Transport (e.g. a simulated bus).
+         A passed-in SMBus or transport is shared, not owned: close() leaves
+         it open so several drivers can use the same handle.
+        @param address 7-bit I2C address of the sensor
+        """
+        self.address = address
+        if isinstance(bus, TMAG5273Transport):
+            self._bus = bus
+        else:
+            self._bus = SMBusTransport(bus)
+        self._ownsBus = isinstance(bus, int)
+        # Write-through shadow of DEVICE_CONFIG_1 (0x00) .. I2C_ADDRESS (0x0C)
+        self._config = bytearray(TMAG5273_CONFIG_BLOCK_LENGTH)
+        self._configValid = False
+        # (channelMode, temperatureEnabled, angleEnabled, xyRange, zRange) derived from the shadow
+        self._sampleLayout = None
+        # (length, unpacker, slots, shift) for the configured I2C read mode, built with the layout
+        self._readPlan = None
+        # SET_COUNT of the last conversion handed out and when it was first seen
+        self._lastSetCount = None
+        self._lastDataTime = 0.0
+        # CRC checked reads: retries per read and failure counters
+        self.crcRetries = 3
+        self.crcErrorCount = 0    # Frames that failed the CRC check
+        self.crcFailureCount = 0  # Reads that still failed after all retries
+        # Configuration restored after a power-on reset, see snapshotConfig()
+        self._snapshot = None
+        self.porRecovery = True
+        self.porRecoveryCount = 0  # Power-on resets detected and recovered from
+        # Time of the last I2C conversion trigger whose result was not read yet
+        self._triggerTime = None
+
+    def close(self):
+        """
+        @brief Releases the I2C bus handle if it was opened by this driver.
+         Safe to call more than once.
+        """
+        if self._ownsBus and self._bus is not None:
+            self._bus.close()
+        self._bus = None
+
+    @property
+    def transport(self):
+        """The TMAG5273Transport used for every bus transaction"""
+        return self._bus
+
+    def enableMetrics(self, metrics=None):
+        """
+        @brief Routes every bus operation of this driver through a metrics
+         collector (see TMAG5273_RaspberryPi_Library_Metrics). Several drivers
+         can share one collector.
+        @param metrics TMAG5273Metrics to report to, defaults to a new one
+        @return The collector
+        """
+        self.disableMetrics()
+        if metrics is None:
+            metrics = TMAG5273Metrics()
+        self._bus = InstrumentedTransport(self._bus, metrics)
+        metrics.addSensor(self)
+        return metrics
+
+    def disableMetrics(self):
+        """
+        @brief Removes the metrics collector; bus operations go straight to the
+         transport again.
+        """
+        if isinstance(self._bus, InstrumentedTransport):
+            self._bus.metrics.removeSensor(self)
+            self._bus = self._bus.transport
+
+    @property
+    def metrics(self):
+        """The attached TMAG5273Metrics, or None"""
+        return self._bus.metrics if isinstance(self._bus, InstrumentedTransport) else None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _readRegister(self, register):
+        """Reads a single register over the persistent bus handle"""
+        return self._bus.readByte(self.address, register)
+
+    def _readRegisters(self, register, length):
+        """Reads length consecutive registers starting at register in one transaction"""
+        return self._bus.readBlock(self.address, register, length)
+
+    def _readDirect(self, length):
+        """Reads length bytes without a register address phase (1-byte read modes)"""
+        return self._bus.read(self.address, length)
+
+    def _readCrcChecked(self, read, length):
+        """Reads length data bytes as CRC frames with read(framedLength) and
+        checks every frame, retrying up to crcRetries times"""
+        frames = -(-length // TMAG5273_CRC_FRAME_DATA)
+        frameLength = TMAG5273_CRC_FRAME_DATA + 1
+        for attempt in range(self.crcRetries + 1):
+            data = memoryview(bytes(read(frames * frameLength)))
+            payload = bytearray()
+            for offset in range(0, frames * frameLength, frameLength):
+                frame = data[offset:offset + TMAG5273_CRC_FRAME_DATA]
+                if crc8(frame) != data[offset + TMAG5273_CRC_FRAME_DATA]:
+                    self.crcErrorCount += 1
+                    break
+                payload += frame
+            else:
+                return payload[:length]
+        if self._checkPor():
+            # The reset switched the CRC mode off; restoring the snapshot turned it back on
+            return self._readCrcChecked(read, length)
+        self.crcFailureCount += 1
+        raise OSError(errno.EIO, f"I2C CRC mismatch after {self.crcRetries + 1} attempts")
+
+    def _readRegisterCrc(self, register):
+        """_readRegister() when the I2C CRC mode is enabled"""
+        return self._readRegistersCrc(register, 1)[0]
+
+    def _readRegistersCrc(self, register, length):
+        """_readRegisters() when the I2C CRC mode is enabled"""
+        return list(self._readCrcChecked(lambda framedLength: self._bus.readBlock(self.address, register, framedLength), length))
+
+    def _readDirectCrc(self, length):
+        """_readDirect() when the I2C CRC mode is enabled"""
+        return bytes(self._readCrcChecked(lambda framedLength: TMAG5273._readDirect(self, framedLength), length))
+
+    def _configChanged(self):
+        """Drops state derived from the configuration shadow and binds the read
+        helpers for the CRC mode in the shadow. Reads without CRC keep using
+        the plain methods, so they cost nothing extra."""
+        self._sampleLayout = None
+        self._triggerTime = None
+        if self._config[TMAG5273_REG_DEVICE_CONFIG_1] & TMAG5273_CRC_MODE_BITS:
+            self._readRegister = self._readRegisterCrc
+            self._readRegisters = self._readRegistersCrc
+            self._readDirect = self._readDirectCrc
+        else:
+            for name in ("_readRegister", "_readRegisters", "_readDirect"):
+                self.__dict__.pop(name, None)
+
+    def _writeRegister(self, register, value):
+        """Writes a single register over the persistent bus handle, keeping the
+        configuration shadow in step"""
+        self._bus.writeByte(self.address, register, value)
+        if register <= TMAG5273_REG_I2C_ADDRESS:
+            self._config[register] = value
+            self._configChanged()
+            if self._snapshot is not None:
+                self._snapshot = bytes(self._config)
+
+    def _writeRegisters(self, register, values):
+        """Writes consecutive registers starting at register in one transaction,
+        keeping the configuration shadow in step"""
+        self._bus.writeBlock(self.address, register, values)
+        end = min(register + len(values), TMAG5273_CONFIG_BLOCK_LENGTH)
+        if register < end:
+            self._config[register:end] = bytes(values[:end - register])
+            self._configChanged()
+            if self._snapshot is not None:
+                self._snapshot = bytes(self._config)
+
+    def refresh(self):
+        """
+        @brief Reloads the configuration shadow (DEVICE_CONFIG_1 through
+         I2C_ADDRESS) from the device with a single block read. Call this after
+         the device was reset or reconfigured by someone else.
+        """
+        self._config[:] = bytes(self._readRegisters(TMAG5273_REG_DEVICE_CONFIG_1, TMAG5273_CONFIG_BLOCK_LENGTH))
+        self._configValid = True
+        self._configChanged()
+
+    def invalidate(self):
+        """
+        @brief Marks the configuration shadow as stale; the next access to a
+         configuration register reloads it from the device.
+        """
+        self._configValid = False
+        self._sampleLayout = None
+
+    def snapshotConfig(self):
+        """
+        @brief Takes a snapshot of the configuration registers DEVICE_CONFIG_1
+         through I2C_ADDRESS with a single block read (also reloading the
+         shadow) and clears the POR flag. From then on every configuration
+         write through this driver updates the snapshot, and a power-on reset
+         seen in CONV_STATUS restores it (see restoreConfig()). begin() takes
+         the snapshot.
+        @return The snapshot, bytes of length TMAG5273_CONFIG_BLOCK_LENGTH
+        """
+        self.refresh()
+        self._snapshot = bytes(self._config)
+        self._writeRegister(TMAG5273_REG_CONV_STATUS, TMAG5273_CONV_STATUS_POR_BITS)
+        return self._snapshot
+
+    def restoreConfig(self, snapshot=None):
+        """
+        @brief Writes a configuration snapshot back in one block write
+         (DEVICE_CONFIG_1 through MAG_OFFSET_CONFIG_2) and clears the POR flag
+         in CONV_STATUS: two transactions instead of a full begin(). The
+         I2C_ADDRESS register is not written; a sensor moved with
+         setI2CAddress() answers at TMAG5273_I2C_ADDRESS_INITIAL after a reset
+         and cannot be reached at its configured address.
+        @param snapshot Bytes from snapshotConfig() or getConfigBlock(), the
+         last snapshot if None
+        """
+        if snapshot is None:
+            snapshot = self._snapshot
+        if snapshot is None:
+            raise RuntimeError("No configuration snapshot, call snapshotConfig() first")
+        self._writeRegisters(TMAG5273_REG_DEVICE_CONFIG_1, snapshot[:TMAG5273_REG_I2C_ADDRESS])
+        self._writeRegister(TMAG5273_REG_CONV_STATUS, TMAG5273_CONV_STATUS_POR_BITS)
+        self._configValid = True
+        # SET_COUNT starts over after a reset
+        self._lastSetCount = None
+        self._lastDataTime = time.monotonic()
+
+    def _recoverPor(self):
+        """Called when CONV_STATUS reports a power-on reset: restores the
+        snapshot and returns True, or returns False if recovery is off or no
+        snapshot was taken"""
+        if not self.porRecovery or self._snapshot is None:
+            return False
+        self.restoreConfig()
+        self.porRecoveryCount += 1
+        return True
+
+    def _checkPor(self):
+        """Reads CONV_STATUS with a plain single byte read, which works in the
+        CRC and 1-byte read modes as well as in the defaults a reset returns
+        to, and recovers if it reports a power-on reset. Used where the reset
+        cannot show in the data: CRC checked reads that fail because the reset
+        switched CRC off, and 1-byte mode reads that no longer return the
+        results. Returns True if it recovered."""
+        if not self.porRecovery or self._snapshot is None:
+            return False
+        convStatus = self._bus.readByte(self.address, TMAG5273_REG_CONV_STATUS)
+        return bool(convStatus & TMAG5273_CONV_STATUS_POR_BITS) and self._recoverPor()
+
+    def _porCheckTime(self, since):
+        """Time after which a polling loop without a new conversion checks for
+        a power-on reset with _checkPor(): four conversion times after since.
+        None in the 3-byte read mode, where CONV_STATUS is part of each read."""
+        if self._sampleLayout is None:
+            self.getSampleLayout()
+        if self._readPlan[2] is None:
+            return None
+        return since + 4 * self.getConversionTime()
+
+    def _getConfigRegister(self, register):
+        """Returns a configuration register from the shadow, loading it first if stale"""
+        if not self._configValid:
+            self.refresh()
+        return self._config[register]
 
     def begin(self):
         """
@@ -26,20 +350,50 @@ class TMAG5273:
         @param wirePort I2C port to use for communication, defaults to Wire
         @return Error code (1 is success, 0 is failure, negative is warning)        
         """
-        self.setMagneticChannel(TMAG5273_X_Y_Z_ENABLE)
-        self.setTemperatureEn(True)
-        self.setOperatingMode(TMAG5273_CONTINUOUS_MEASURE_MODE)
-        self.setAngleEn(TMAG5273_NO_ANGLE_CALCULATION)
-        self.setLowPower(TMAG5273_LOW_ACTIVE_CURRENT_MODE)
-        self.setXYAxisRange(TMAG5273_RANGE_40MT)
-        self.setZAxisRange(TMAG5273_RANGE_40MT)
+        self.refresh()
+        self.configure(channel=TMAG5273_X_Y_Z_ENABLE,
+                       temperature=TMAG5273_TEMPERATURE_ENABLE,
+                       mode=TMAG5273_CONTINUOUS_MEASURE_MODE,
+                       angle=TMAG5273_NO_ANGLE_CALCULATION,
+                       low_power=TMAG5273_LOW_ACTIVE_CURRENT_MODE,
+                       range_xy=TMAG5273_RANGE_40MT,
+                       range_z=TMAG5273_RANGE_40MT)
+        self.snapshotConfig()
         self.getError()
-        if (self.getLowPower() != TMAG5273_LOW_ACTIVE_CURRENT_MODE or 
-            (self.getOperatingMode() != TMAG5273_CONTINUOUS_MEASURE_MODE) or
-            (self.getMagneticChannel() != TMAG5273_X_Y_Z_ENABLE) or 
-            (self.getTemperatureEN() != TMAG5273_TEMPERATURE_ENABLE) or 
-            (self.getAngleEn() != TMAG5273_NO_ANGLE_CALCULATION)):
-            raise "Configuration is not as expected"
+
+    def configure(self, **fields):
+        """
+        @brief Applies several configuration bit fields at once. The new
+         register values are computed from the shadow, every changed register
+         between the first and the last one is written in one block write and
+         verified with one block read-back. Fields that are not given keep
+         their current value.
+        @param fields Keyword per bit field, named as in TMAG5273_CONFIG_FIELDS,
+         e.g. configure(channel=TMAG5273_X_Y_Z_ENABLE, avg=TMAG5273_X8_CONVERSION,
+         range_xy=TMAG5273_RANGE_80MT, angle=TMAG5273_XY_ANGLE_CALCULATION,
+         mode=TMAG5273_CONTINUOUS_MEASURE_MODE)
+        """
+        if not self._configValid:
+            self.refresh()
+        config = bytearray(self._config)
+        for name, value in fields.items():
+            if name not in TMAG5273_CONFIG_FIELDS:
+                raise ValueError(f"Unknown configuration field: {name}")
+            register, bits, lsb, maximum = TMAG5273_CONFIG_FIELDS[name]
+            value = int(value)
+            if value < 0 or value > maximum:
+                raise ValueError(f"Invalid {name}: {hex(value)}")
+            config[register] = TMAG5273.setBitFieldValue(config[register], value, bits, lsb)
+
+        changed = [register for register in range(TMAG5273_CONFIG_BLOCK_LENGTH) if config[register] != self._config[register]]
+        if not changed:
+            return
+        first = changed[0]
+        last = changed[-1]
+        self._writeRegisters(first, config[first:last + 1])
+        if bytes(self._readRegisters(first, last - first + 1)) != bytes(config[first:last + 1]):
+            self.invalidate()
+            raise RuntimeError("Configuration is not as expected")
 
     @staticmethod
     def setBitFieldValue(bitfield, new_value, bit_mask, bit_lsb):
@@ -83,11 +437,10 @@ class TMAG5273:
         if (channel_mode > TMAG5273_XZX_ENABLE):
             raise f"Invalid channel mode: {channel_mode}"
         mode = 0
-        with SMBus(1) as bus:
-            mode = bus.read_byte_data(TMAG5273_I2C_ADDRESS_INITIAL, TMAG5273_REG_SENSOR_CONFIG_1)
-            mode = TMAG5273.setBitFieldValue(mode, channel_mode, TMAG5273_CHANNEL_MODE_BITS, TMAG5273_CHANNEL_MODE_LSB)
-            print(f"Setting magnetic channel config to: {hex(mode)}")
-            bus.write_byte_data(TMAG5273_I2C_ADDRESS_INITIAL, TMAG5273_REG_SENSOR_CONFIG_1, mode)
+        mode = self._getConfigRegister(TMAG5273_REG_SENSOR_CONFIG_1)
+        mode = TMAG5273.setBitFieldValue(mode, channel_mode, TMAG5273_CHANNEL_MODE_BITS, TMAG5273_CHANNEL_MODE_LSB)
+        print(f"Setting magnetic channel config to: {hex(mode)}")
+        self._writeRegister(TMAG5273_REG_SENSOR_CONFIG_1, mode)
 
 
     def setTemperatureEn(self, temperatureEnable):
@@ -101,11 +454,10 @@ class TMAG5273:
         @return Error code (0 is success, negative is failure, positive is warning)
         """
         mode = 0
-        with SMBus(1) as bus:
-            mode = bus.read_byte_data(TMAG5273_I2C_ADDRESS_INITIAL, TMAG5273_REG_T_CONFIG)
-            mode = TMAG5273.setBitFieldValue(mode, temperatureEnable, TMAG5273_TEMPERATURE_BITS, TMAG5273_TEMPERATURE_LSB)
-            print(f"Setting temperature config to: {hex(mode)}")
-            bus.write_byte_data(TMAG5273_I2C_ADDRESS_INITIAL, TMAG5273_REG_T_CONFIG, mode)
+        mode = self._getConfigRegister(TMAG5273_REG_T_CONFIG)
+        mode = TMAG5273.setBitFieldValue(mode, temperatureEnable, TMAG5273_TEMPERATURE_BITS, TMAG5273_TEMPERATURE_LSB)
+        print(f"Setting temperature config to: {hex(mode)}")
+        self._writeRegister(TMAG5273_REG_T_CONFIG, mode)
 
 
     def setOperatingMode(self, opMode):
@@ -122,10 +474,9 @@ class TMAG5273:
             raise f"Invalid operating mode: {opMode}"
 
         mode = 0
-        with SMBus(1) as bus:
-            mode = bus.read_byte_data(TMAG5273_I2C_ADDRESS_INITIAL, TMAG5273_REG_DEVICE_CONFIG_2)
-            mode = TMAG5273.setBitFieldValue(mode, opMode, TMAG5273_OPERATING_MODE_BITS, TMAG5273_OPERATING_MODE_LSB)
-            bus.write_byte_data(TMAG5273_I2C_ADDRESS_INITIAL, TMAG5273_REG_DEVICE_CONFIG_2, mode)
+        mode = self._getConfigRegister(TMAG5273_REG_DEVICE_CONFIG_2)
+        mode = TMAG5273.setBitFieldValue(mode, opMode, TMAG5273_OPERATING_MODE_BITS, TMAG5273_OPERATING_MODE_LSB)
+        self._writeRegister(TMAG5273_REG_DEVICE_CONFIG_2, mode)
         printOperatingMode(mode)
 
 
@@ -145,11 +496,10 @@ class TMAG5273:
         if (angleEnable > TMAG5273_XZ_ANGLE_CALCULATION):
             raise f"Invalid angleEnable {hex(angleEnable)}"
         mode = 0
-        with SMBus(1) as bus:
-            mode = bus.read_byte_data(TMAG5273_I2C_ADDRESS_INITIAL, TMAG5273_REG_SENSOR_CONFIG_2)
-            mode = TMAG5273.setBitFieldValue(mode, angleEnable, TMAG5273_ANGLE_CALCULATION_BITS, TMAG5273_ANGLE_CALCULATION_LSB)
-            print(f"Setting angleEnable config to: {hex(mode)}")
-            bus.write_byte_data(TMAG5273_I2C_ADDRESS_INITIAL, TMAG5273_REG_SENSOR_CONFIG_2, mode)
+        mode = self._getConfigRegister(TMAG5273_REG_SENSOR_CONFIG_2)
+        mode = TMAG5273.setBitFieldValue(mode, angleEnable, TMAG5273_ANGLE_CALCULATION_BITS, TMAG5273_ANGLE_CALCULATION_LSB)
+        print(f"Setting angleEnable config to: {hex(mode)}")
+        self._writeRegister(TMAG5273_REG_SENSOR_CONFIG_2, mode)
 
 
     def setLowPower(self, lpLnMode):
@@ -161,11 +511,10 @@ class TMAG5273:
         if (lpLnMode > TMAG5273_LOW_NOISE_MODE):
             raise f"Invalid lpLnMode {hex(lpLnMode)}"
         mode = 0
-        with SMBus(1) as bus:
-            mode = bus.read_byte_data(TMAG5273_I2C_ADDRESS_INITIAL, TMAG5273_REG_DEVICE_CONFIG_2)
-            mode = TMAG5273.setBitFieldValue(mode, lpLnMode, TMAG5273_LOW_POWER_BITS, TMAG5273_LOW_POWER_LSB)
-            print(f"Setting low power mode config to: {hex(mode)}")
-            bus.write_byte_data(TMAG5273_I2C_ADDRESS_INITIAL, TMAG5273_REG_DEVICE_CONFIG_2, mode)
+        mode = self._getConfigRegister(TMAG5273_REG_DEVICE_CONFIG_2)
+        mode = TMAG5273.setBitFieldValue(mode, lpLnMode, TMAG5273_LOW_POWER_BITS, TMAG5273_LOW_POWER_LSB)
+        print(f"Setting low power mode config to: {hex(mode)}")
+        self._writeRegister(TMAG5273_REG_DEVICE_CONFIG_2, mode)
 
 
     def setXYAxisRange(self, xyAxisRange):
@@ -180,11 +529,10 @@ class TMAG5273:
         if (xyAxisRange > TMAG5273_RANGE_80MT):
             raise f"Invalid xyAxisRange {hex(xyAxisRange)}"
         mode = 0
-        with SMBus(1) as bus:
-            mode = bus.read_byte_data(TMAG5273_I2C_ADDRESS_INITIAL, TMAG5273_REG_SENSOR_CONFIG_2)
-            mode = TMAG5273.setBitFieldValue(mode, xyAxisRange, TMAG5273_XY_RANGE_BITS, TMAG5273_XY_RANGE_LSB)
-            print(f"Setting xyAxisRange config to: {hex(mode)}")
-            bus.write_byte_data(TMAG5273_I2C_ADDRESS_INITIAL, TMAG5273_REG_SENSOR_CONFIG_2, mode)
+        mode = self._getConfigRegister(TMAG5273_REG_SENSOR_CONFIG_2)
+        mode = TMAG5273.setBitFieldValue(mode, xyAxisRange, TMAG5273_XY_RANGE_BITS, TMAG5273_XY_RANGE_LSB)
+        print(f"Setting xyAxisRange config to: {hex(mode)}")
+        self._writeRegister(TMAG5273_REG_SENSOR_CONFIG_2, mode)
 
 
     def setZAxisRange(self, zAxisRange):
@@ -199,11 +547,10 @@ class TMAG5273:
         if (zAxisRange > TMAG5273_RANGE_80MT):
             raise f"Invalid zAxisRange {hex(zAxisRange)}"
         mode = 0
-        with SMBus(1) as bus:
-            mode = bus.read_byte_data(TMAG5273_I2C_ADDRESS_INITIAL, TMAG5273_REG_SENSOR_CONFIG_2)
-            mode = TMAG5273.setBitFieldValue(mode, zAxisRange, TMAG5273_Z_RANGE_BITS, TMAG5273_Z_RANGE_LSB)
-            print(f"Setting zAxisRange config to: {hex(mode)}")
-            bus.write_byte_data(TMAG5273_I2C_ADDRESS_INITIAL, TMAG5273_REG_SENSOR_CONFIG_2, mode)
+        mode = self._getConfigRegister(TMAG5273_REG_SENSOR_CONFIG_2)
+        mode = TMAG5273.setBitFieldValue(mode, zAxisRange, TMAG5273_Z_RANGE_BITS, TMAG5273_Z_RANGE_LSB)
+        print(f"Setting zAxisRange config to: {hex(mode)}")
+        self._writeRegister(TMAG5273_REG_SENSOR_CONFIG_2, mode)
 
 
     def getDeviceStatus(self):
@@ -215,8 +562,7 @@ class TMAG5273:
             TMAG5273_REG_DEVICE_STATUS
         @return Device Status Register as a raw value."""
         deviceStatusReg = 0
-        with SMBus(1) as bus:
-            deviceStatusReg = bus.read_byte_data(TMAG5273_I2C_ADDRESS_INITIAL, TMAG5273_REG_DEVICE_STATUS)
+        deviceStatusReg = self._readRegister(TMAG5273_REG_DEVICE_STATUS)
         return deviceStatusReg
 
     def getError(self):
@@ -227,6 +573,40 @@ class TMAG5273:
             raise(f"Error detected. Status registry: {statusReg}")
 
 
+    def getManufacturerID(self):
+        """
+        @brief Reads the manufacturer ID registers (MANUFACTURER_ID_MSB and
+         MANUFACTURER_ID_LSB) in one transaction.
+        @return 16-bit manufacturer ID, TMAG5273_DEVICE_ID_VALUE for TI
+        """
+        dataBuffer = self._readRegisters(TMAG5273_REG_MANUFACTURER_ID_LSB, 2)
+        return (dataBuffer[1] << 8) | dataBuffer[0]
+
+    def isConnected(self):
+        """
+        @brief Checks that a TMAG5273 answers at this bus and address.
+        @return True if the manufacturer ID matches
+        """
+        try:
+            return self.getManufacturerID() == TMAG5273_DEVICE_ID_VALUE
+        except OSError:
+            return False
+
+    def setI2CAddress(self, newAddress):
+        """
+        @brief Changes the I2C address of the device at runtime and starts
+         using the new address. The device returns to
+         TMAG5273_I2C_ADDRESS_INITIAL after a power-on reset.
+        @param newAddress New 7-bit I2C address (0x08 - 0x77)
+            TMAG5273_REG_I2C_ADDRESS - bits 7-1, update enable bit 0
+        """
+        if newAddress < 0x08 or newAddress > 0x77:
+            raise ValueError(f"Invalid I2C address: {hex(newAddress)}")
+        value = TMAG5273.setBitFieldValue(0, newAddress, TMAG5273_I2C_ADDRESS_BITS, TMAG5273_I2C_ADDRESS_LSB)
+        value = TMAG5273.setBitFieldValue(value, TMAG5273_I2C_ADDRESS_CHANGE_ENABLE, TMAG5273_I2C_ADDRESS_CHANGE_BITS, TMAG5273_I2C_ADDRESS_CHANGE_LSB)
+        self._writeRegister(TMAG5273_REG_I2C_ADDRESS, value)
+        self.address = newAddress
+
     def getLowPower(self):
         """
         @brief Returns if the device is operating in low power
@@ -237,8 +617,7 @@ class TMAG5273:
         @return Low power (0) or low noise (1) mode        
         """
         lowPowerMode = 0
-        with SMBus(1) as bus:
-            lowPowerMode = bus.read_byte_data(TMAG5273_I2C_ADDRESS_INITIAL, TMAG5273_REG_DEVICE_CONFIG_2)
+        lowPowerMode = self._getConfigRegister(TMAG5273_REG_DEVICE_CONFIG_2)
         return TMAG5273.getBitFieldValue(lowPowerMode, TMAG5273_LOW_POWER_BITS, TMAG5273_LOW_POWER_LSB)
 
 
@@ -253,8 +632,7 @@ class TMAG5273:
         @return Operating mode: stand-by, sleep, continuous, or wake-up and sleep
         """
         opMode = 0
-        with SMBus(1) as bus:
-            opMode = bus.read_byte_data(TMAG5273_I2C_ADDRESS_INITIAL, TMAG5273_REG_DEVICE_CONFIG_2)
+        opMode = self._getConfigRegister(TMAG5273_REG_DEVICE_CONFIG_2)
         return TMAG5273.getBitFieldValue(opMode, TMAG5273_OPERATING_MODE_BITS, TMAG5273_OPERATING_MODE_LSB)
 
 
@@ -277,8 +655,7 @@ class TMAG5273:
         @return Code for the magnetic channel axis being read
         """
         magChannel = 0
-        with SMBus(1) as bus:
-            magChannel = bus.read_byte_data(TMAG5273_I2C_ADDRESS_INITIAL, TMAG5273_REG_SENSOR_CONFIG_1)
+        magChannel = self._getConfigRegister(TMAG5273_REG_SENSOR_CONFIG_1)
         return TMAG5273.getBitFieldValue(magChannel, TMAG5273_CHANNEL_MODE_BITS, TMAG5273_CHANNEL_MODE_LSB)
 
 
@@ -292,8 +669,7 @@ class TMAG5273:
         @return Enable bit that determines if temp channel is enabled or disabled
         """
         tempENreg = 0
-        with SMBus(1) as bus:
-            tempENreg = bus.read_byte_data(TMAG5273_I2C_ADDRESS_INITIAL, TMAG5273_REG_T_CONFIG)
+        tempENreg = self._getConfigRegister(TMAG5273_REG_T_CONFIG)
         return TMAG5273.getBitFieldValue(tempENreg, TMAG5273_TEMPERATURE_BITS, TMAG5273_TEMPERATURE_LSB)
 
 
@@ -310,10 +686,64 @@ class TMAG5273:
         @return Angle calculation and associated channel order
         """
         angleReg = 0
-        with SMBus(1) as bus:
-            angleReg = bus.read_byte_data(TMAG5273_I2C_ADDRESS_INITIAL, TMAG5273_REG_SENSOR_CONFIG_2)
+        angleReg = self._getConfigRegister(TMAG5273_REG_SENSOR_CONFIG_2)
         return TMAG5273.getBitFieldValue(angleReg, TMAG5273_ANGLE_CALCULATION_BITS, TMAG5273_ANGLE_CALCULATION_LSB)
-    
+
+
+    def setMagneticGain(self, gain, gainChannel=TMAG5273_GAIN_ADJUST_CHANNEL_1):
+        """
+        @brief Sets the gain correction of one channel of the angle
+         calculation (see setAngleEn). The correction only applies while an
+         angle calculation is enabled.
+        @param gain Gain value: the channel is multiplied by gain/256, 0 means
+         1 (no correction)
+            TMAG5273_REG_MAG_GAIN_CONFIG
+        @param gainChannel Channel of the angle pair the gain applies to
+            0X0 = 1st channel
+            0X1 = 2nd channel
+            TMAG5273_REG_SENSOR_CONFIG_2 - bit 4
+        """
+        if not 0 <= gain <= 0xFF:
+            raise ValueError(f"Invalid gain: {gain}")
+        if gainChannel > TMAG5273_GAIN_ADJUST_CHANNEL_2:
+            raise ValueError(f"Invalid gainChannel: {hex(gainChannel)}")
+        self.configure(gain=gain, gain_channel=gainChannel)
+
+
+    def getMagneticGain(self):
+        """
+        @brief Returns the gain correction of the angle calculation
+        @return Tuple (gain, gainChannel), see setMagneticGain()
+        """
+        return (self._getConfigRegister(TMAG5273_REG_MAG_GAIN_CONFIG),
+                TMAG5273.getBitFieldValue(self._getConfigRegister(TMAG5273_REG_SENSOR_CONFIG_2), TMAG5273_GAIN_ADJUST_BITS, TMAG5273_GAIN_ADJUST_LSB))
+
+
+    def setMagneticOffset(self, offset1, offset2):
+        """
+        @brief Sets the offset corrections subtracted from the 1st and 2nd
+         channel of the angle calculation (see setAngleEn)
+        @param offset1, offset2 Offsets from -128 to 127 in units of
+         2*|range|/4096, i.e. 16 result register codes
+            TMAG5273_REG_MAG_OFFSET_CONFIG_1, TMAG5273_REG_MAG_OFFSET_CONFIG_2
+        """
+        for offset in (offset1, offset2):
+            if not -128 <= offset <= 127:
+                raise ValueError(f"Invalid offset: {offset}")
+        self.configure(offset_1=offset1 & 0xFF, offset_2=offset2 & 0xFF)
+
+
+    def getMagneticOffset(self):
+        """
+        @brief Returns the offset corrections of the angle calculation
+        @return Tuple (offset1, offset2), see setMagneticOffset()
+        """
+        offsets = []
+        for register in (TMAG5273_REG_MAG_OFFSET_CONFIG_1, TMAG5273_REG_MAG_OFFSET_CONFIG_2):
+            value = self._getConfigRegister(register)
+            offsets.append(value - 0x100 if value & 0x80 else value)
+        return tuple(offsets)
+
 
     def getXYAxisRange(self):
         """
@@ -325,33 +755,65 @@ class TMAG5273:
         @return X and Y axes magnetic range (0 or 1)
         """
         xyRangeReg = 0
-        with SMBus(1) as bus:
-            xyRangeReg = bus.read_byte_data(TMAG5273_I2C_ADDRESS_INITIAL, TMAG5273_REG_SENSOR_CONFIG_2)
+        xyRangeReg = self._getConfigRegister(TMAG5273_REG_SENSOR_CONFIG_2)
         return TMAG5273.getBitFieldValue(xyRangeReg, TMAG5273_XY_RANGE_BITS, TMAG5273_XY_RANGE_LSB)
     
 
+    def getZAxisRange(self):
+        """
+        @brief Returns the Z axis magnetic range from the
+         two following options:
+            0X0 = ±40mT, DEFAULT
+            0X1 = ±80mT
+            TMAG5273_REG_SENSOR_CONFIG_2 - bit 0
+        @return Z axis magnetic range (0 or 1)
+        """
+        zRangeReg = 0
+        zRangeReg = self._getConfigRegister(TMAG5273_REG_SENSOR_CONFIG_2)
+        return TMAG5273.getBitFieldValue(zRangeReg, TMAG5273_Z_RANGE_BITS, TMAG5273_Z_RANGE_LSB)
+    
+
     def calculateMagneticField(self, rawData, range):
         """
         Simple function to calculate the Magnetic field strength in mT from raw sensor data
         Defining this in the class makes it 'inline' for efficiency
         
         To convert the raw magnetic data to mT, the datasheet equation (eq 10) is as follows:
-        B = {-(D15*2^15 + D14*2^14 + ... + D1*2^1 + D0*2^0)/2^16 } * 2*|RANGE|
+        B = {(-D15*2^15 + D14*2^14 + ... + D1*2^1 + D0*2^0)/2^16 } * 2*|RANGE|
         
         Notes:
         
-        - The first section is flipping the sign bit of the data value (2's complement format)
-        This is just:  -1 * D
+        - Only the D15 term is negative: this is the 2's complement value of
+        the register pair. rawData may be given as the unsigned register value
+        (it is sign extended here) or already as a signed integer D.
         
-        B = { (-1 * D / 2^16 } * 2*|RANGE|
-        = { (-1 * D / 2^16 } * 2*|RANGE|/1
-        = ( (-1 * D * 2 * |RANGE| ) / 2^16
-        = ( 2 * (-1 * D * |RANGE| ) ) / 2^16
-        =  (-1 * D * |RANGE| ) ) / 2^15
+        B = { D / 2^16 } * 2*|RANGE|
+        = ( D * 2 * |RANGE| ) / 2^16
+        = ( D * |RANGE| ) / 2^15
         
         Note: 2^15 = 32768        
         """
-        return (float)(-1 * range * rawData) / 32768
+        if rawData >= 0x8000:
+            rawData -= 0x10000
+        return (float)(range * rawData) / 32768
+
+
+    @staticmethod
+    def calculateTemperature(rawData):
+        """
+        Converts the raw 16-bit T-Channel result to degrees C using the
+        datasheet reference point (TADC_T0 at TSENSE_T0) and resolution.
+        """
+        return TMAG5273_TSENSE_T0 + ((rawData - TMAG5273_TADC_T0) / TMAG5273_TADC_RES)
+
+
+    @staticmethod
+    def calculateAngle(rawData):
+        """
+        Converts the raw ANGLE_RESULT register pair to degrees: 9 integer
+        bits followed by 4 fractional bits (xxx/16).
+        """
+        return ((rawData >> 4) & 0x1FF) + (rawData & 0xF) / 16.
 
 
     def getXData(self):
@@ -362,11 +824,10 @@ class TMAG5273:
         @return X-Channel data conversion results        
         """
         dataBuffer = []
-        with SMBus(1) as bus:
-            dataBuffer = bus.read_i2c_block_data(TMAG5273_I2C_ADDRESS_INITIAL, TMAG5273_REG_X_MSB_RESULT, 2)
-            xData = (dataBuffer[0] << 8) | dataBuffer[1]
-            range = 40 if self.getXYAxisRange() == 0 else 80
-            return self.calculateMagneticField(xData, range)
+        dataBuffer = self._readRegisters(TMAG5273_REG_X_MSB_RESULT, 2)
+        xData = (dataBuffer[0] << 8) | dataBuffer[1]
+        range = 40 if self.getXYAxisRange() == 0 else 80
+        return self.calculateMagneticField(xData, range)
         
     
     def getYData(self):
@@ -377,11 +838,10 @@ class TMAG5273:
         @return Y-Channel data conversion results        
         """
         dataBuffer = []
-        with SMBus(1) as bus:
-            dataBuffer = bus.read_i2c_block_data(TMAG5273_I2C_ADDRESS_INITIAL, TMAG5273_REG_Y_MSB_RESULT, 2)
-            xData = (dataBuffer[0] << 8) | dataBuffer[1]
-            range = 40 if self.getXYAxisRange() == 0 else 80
-            return self.calculateMagneticField(xData, range)
+        dataBuffer = self._readRegisters(TMAG5273_REG_Y_MSB_RESULT, 2)
+        xData = (dataBuffer[0] << 8) | dataBuffer[1]
+        range = 40 if self.getXYAxisRange() == 0 else 80
+        return self.calculateMagneticField(xData, range)
 
 
     def getZData(self):
@@ -392,11 +852,10 @@ class TMAG5273:
         @return Z-Channel data conversion results.        
         """
         dataBuffer = []
-        with SMBus(1) as bus:
-            dataBuffer = bus.read_i2c_block_data(TMAG5273_I2C_ADDRESS_INITIAL, TMAG5273_REG_Z_MSB_RESULT, 2)
-            xData = (dataBuffer[0] << 8) | dataBuffer[1]
-            range = 40 if self.getXYAxisRange() == 0 else 80
-            return self.calculateMagneticField(xData, range)
+        dataBuffer = self._readRegisters(TMAG5273_REG_Z_MSB_RESULT, 2)
+        xData = (dataBuffer[0] << 8) | dataBuffer[1]
+        range = 40 if self.getZAxisRange() == 0 else 80
+        return self.calculateMagneticField(xData, range)
         
 
     def getTemp(self):
@@ -407,10 +866,9 @@ class TMAG5273:
         @return T-Channel data conversion results        
         """
         dataBuffer = []
-        with SMBus(1) as bus:
-            dataBuffer = bus.read_i2c_block_data(TMAG5273_I2C_ADDRESS_INITIAL, TMAG5273_REG_T_MSB_RESULT, 2)
-            tData = (dataBuffer[0] << 8) | dataBuffer[1]
-            return TMAG5273_TSENSE_T0 + ((tData - TMAG5273_TADC_T0) / TMAG5273_TADC_RES)
+        dataBuffer = self._readRegisters(TMAG5273_REG_T_MSB_RESULT, 2)
+        tData = (dataBuffer[0] << 8) | dataBuffer[1]
+        return TMAG5273.calculateTemperature(tData)
     
 
     def getAngleResult(self):
@@ -424,12 +882,9 @@ class TMAG5273:
         @return Angle measurement result in degrees (float value)        
         """
         dataBuffer = []
-        with SMBus(1) as bus:
-            dataBuffer = bus.read_i2c_block_data(TMAG5273_I2C_ADDRESS_INITIAL, TMAG5273_REG_ANGLE_RESULT_MSB, 2)
-            angleReg = (dataBuffer[0] << 8) | dataBuffer[1]
-            fractionValue = (angleReg & 0xF) / 16.
-            integerValue = (angleReg >> 4) & 0x1FF
-            return integerValue + fractionValue
+        dataBuffer = self._readRegisters(TMAG5273_REG_ANGLE_RESULT_MSB, 2)
+        angleReg = (dataBuffer[0] << 8) | dataBuffer[1]
+        return TMAG5273.calculateAngle(angleReg)
         
     
     def getMagnitudeResult(self):
@@ -440,8 +895,7 @@ class TMAG5273:
         @return Vector magnitude during angle measurement        
         """
         magReg = 0
-        with SMBus(1) as bus:
-            magReg = bus.read_byte_data(TMAG5273_I2C_ADDRESS_INITIAL, TMAG5273_REG_MAGNITUDE_RESULT)
+        magReg = self._readRegister(TMAG5273_REG_MAGNITUDE_RESULT)
         return magReg
     
 
@@ -463,8 +917,668 @@ class TMAG5273:
             raise f"Inalid avgMode: {hex(avgMode)}"
 
         mode = 0
-        with SMBus(1) as bus:
-            mode = bus.read_byte_data(TMAG5273_I2C_ADDRESS_INITIAL, TMAG5273_REG_DEVICE_CONFIG_1)
-            mode = TMAG5273.setBitFieldValue(mode, avgMode, TMAG5273_CONV_AVG_BITS, TMAG5273_CONV_AVG_LSB)
-            print(f"Setting conversion average to: {hex(mode)}")
-            bus.write_byte_data(TMAG5273_I2C_ADDRESS_INITIAL, TMAG5273_REG_DEVICE_CONFIG_1, mode)
+        mode = self._getConfigRegister(TMAG5273_REG_DEVICE_CONFIG_1)
+        mode = TMAG5273.setBitFieldValue(mode, avgMode, TMAG5273_CONV_AVG_BITS, TMAG5273_CONV_AVG_LSB)
+        print(f"Setting conversion average to: {hex(mode)}")
+        self._writeRegister(TMAG5273_REG_DEVICE_CONFIG_1, mode)
+
+
+    def getSampleLayout(self):
+        """
+        @brief Returns the configuration needed to decode result registers,
+         derived from the configuration shadow without touching the bus.
+        @return Tuple (channelMode, temperatureEnabled, angleEnabled, xyRange,
+         zRange) with the ranges in mT. angleEnabled is False in the 1-byte
+         read modes, which do not transfer the angle and magnitude results.
+        """
+        if self._sampleLayout is None:
+            if not self._configValid:
+                self.refresh()
+            layout = TMAG5273.calculateSampleLayout(self._config)
+            readMode = TMAG5273.getBitFieldValue(self._config[TMAG5273_REG_DEVICE_CONFIG_1], TMAG5273_I2C_READ_MODE_BITS, TMAG5273_I2C_READ_MODE_LSB)
+            self._readPlan = TMAG5273._buildReadPlan(readMode, layout[0], layout[1])
+            self._sampleLayout = layout
+        return self._sampleLayout
+
+
+    @staticmethod
+    def calculateSampleLayout(config):
+        """
+        @brief Decode layout (see getSampleLayout()) of a configuration block
+        @param config Register values DEVICE_CONFIG_1 (0x00) .. I2C_ADDRESS (0x0C),
+         as returned by getConfigBlock()
+        @return Tuple (channelMode, temperatureEnabled, angleEnabled, xyRange, zRange)
+        """
+        sensorConfig2 = config[TMAG5273_REG_SENSOR_CONFIG_2]
+        readMode = TMAG5273.getBitFieldValue(config[TMAG5273_REG_DEVICE_CONFIG_1], TMAG5273_I2C_READ_MODE_BITS, TMAG5273_I2C_READ_MODE_LSB)
+        xyRange = TMAG5273.getBitFieldValue(sensorConfig2, TMAG5273_XY_RANGE_BITS, TMAG5273_XY_RANGE_LSB)
+        zRange = TMAG5273.getBitFieldValue(sensorConfig2, TMAG5273_Z_RANGE_BITS, TMAG5273_Z_RANGE_LSB)
+        return (
+            TMAG5273.getBitFieldValue(config[TMAG5273_REG_SENSOR_CONFIG_1], TMAG5273_CHANNEL_MODE_BITS, TMAG5273_CHANNEL_MODE_LSB),
+            TMAG5273.getBitFieldValue(config[TMAG5273_REG_T_CONFIG], TMAG5273_TEMPERATURE_BITS, TMAG5273_TEMPERATURE_LSB) == TMAG5273_TEMPERATURE_ENABLE,
+            readMode == TMAG5273_I2C_MODE_3BYTE and
+            TMAG5273.getBitFieldValue(sensorConfig2, TMAG5273_ANGLE_CALCULATION_BITS, TMAG5273_ANGLE_CALCULATION_LSB) != TMAG5273_NO_ANGLE_CALCULATION,
+            40 if xyRange == TMAG5273_RANGE_40MT else 80,
+            40 if zRange == TMAG5273_RANGE_40MT else 80)
+
+
+    def getConfigBlock(self):
+        """
+        @brief Returns the configuration registers DEVICE_CONFIG_1 (0x00)
+         through I2C_ADDRESS (0x0C) from the shadow, loading it if stale.
+        @return bytes of length TMAG5273_CONFIG_BLOCK_LENGTH
+        """
+        if not self._configValid:
+            self.refresh()
+        return bytes(self._config)
+
+
+    @staticmethod
+    def _buildReadPlan(readMode, channelMode, temperatureEnabled):
+        """Returns (length, unpacker, slots, shift) describing one sample read.
+        In the 3-byte mode slots is None and the result registers are read as a
+        block. In the 1-byte modes the device sends the enabled channels (T, X,
+        Y, Z) followed by CONV_STATUS without a register address phase; slots
+        gives the position of each value in the raw sample tuple and shift
+        scales 8-bit MSB-only values back to 16-bit register values."""
+        if readMode == TMAG5273_I2C_MODE_3BYTE:
+            return (TMAG5273_RESULT_BLOCK_LENGTH, TMAG5273_RESULT_BLOCK, None, 0)
+        wide = readMode == TMAG5273_I2C_MODE_1BYTE_16BIT
+        axes = TMAG5273_CHANNEL_MODE_AXES[channelMode]
+        fmt = ">"
+        slots = []
+        if temperatureEnabled:
+            fmt += "H" if wide else "B"
+            slots.append(0)
+        for axis, slot in ((TMAG5273_AXIS_X, 1), (TMAG5273_AXIS_Y, 2), (TMAG5273_AXIS_Z, 3)):
+            if axes & axis:
+                fmt += "h" if wide else "b"
+                slots.append(slot)
+        fmt += "B"
+        unpacker = struct.Struct(fmt)
+        return (unpacker.size, unpacker, tuple(slots), 0 if wide else 8)
+
+
+    @staticmethod
+    def calculateReadLength(readMode, channelMode, temperatureEnabled):
+        """
+        @brief Number of data bytes one sample read transfers (see
+         readRawSample()), not counting CRC bytes
+        @param readMode I2C read mode (see setReadMode())
+        @param channelMode Enabled magnetic channels (TMAG5273_X_ENABLE ..)
+        @param temperatureEnabled Temperature channel enabled
+        @return Bytes read per sample
+        """
+        return TMAG5273._buildReadPlan(readMode, channelMode, temperatureEnabled)[0]
+
+
+    def _readResults(self, trigger=False):
+        """Reads one sample in the configured I2C read mode and returns it as a
+        raw sample tuple (t, x, y, z, convStatus, angle, magnitude). With
+        trigger, the 3-byte mode read also sets the conversion trigger bit."""
+        if self._sampleLayout is None:
+            self.getSampleLayout()
+        length, unpacker, slots, shift = self._readPlan
+        if slots is None:
+            register = TMAG5273_REG_T_MSB_RESULT | (TMAG5273_I2C_CONV_TRIGGER_BIT if trigger else 0)
+            return unpacker.unpack(bytes(self._readRegisters(register, length)))
+        values = unpacker.unpack(self._readDirect(length))
+        rawSample = [0, 0, 0, 0, values[-1], 0, 0]
+        for slot, value in zip(slots, values):
+            rawSample[slot] = value << shift
+        return tuple(rawSample)
+
+
+    def setCrcEnabled(self, crcEnable):
+        """
+        @brief Enables the I2C CRC mode. Every read is then transferred in
+         frames of 4 data bytes plus a CRC-8 byte; frames are checked and a
+         failing read is repeated up to crcRetries times. crcErrorCount and
+         crcFailureCount count failed frames and reads that ran out of retries
+         (those raise OSError).
+            0x0 = CRC disabled
+            0x1 = CRC enabled
+            TMAG5273_REG_DEVICE_CONFIG_1 - bit 7
+        """
+        self.configure(crc=crcEnable)
+
+
+    def setReadMode(self, readMode):
+        """
+        @brief Selects how readSample()/readRawSample() transfer results
+            0X0 = Standard 3-byte read: all result registers by register address
+            0X1 = 1-byte read: enabled channels (16-bit) and CONV_STATUS, no
+                  register address phase
+            0X2 = 1-byte read: MSB only of the enabled channels and
+                  CONV_STATUS (fastest, 8-bit resolution)
+            TMAG5273_REG_DEVICE_CONFIG_1 - bit 1-0
+        The 1-byte modes do not transfer the angle and magnitude results.
+        """
+        if (readMode > TMAG5273_I2C_MODE_1BYTE_8BIT):
+            raise ValueError(f"Invalid readMode: {hex(readMode)}")
+        self.configure(read_mode=readMode)
+
+
+    def readRawSample(self):
+        """
+        @brief Reads all result registers, T_MSB_RESULT (0x10) through
+         MAGNITUDE_RESULT (0x1B), in a single block read. In the 1-byte read
+         modes (see setReadMode) only the enabled channels and CONV_STATUS are
+         transferred; the other values are returned as 0.
+        @return Tuple of raw values (t, x, y, z, convStatus, angle, magnitude),
+         with x, y and z as signed 16-bit integers
+        """
+        rawSample = self._readResults()
+        if rawSample[4] & TMAG5273_CONV_STATUS_POR_BITS:
+            self._recoverPor()
+        self._noteConvStatus(rawSample[4])
+        return rawSample
+
+
+    def decodeSample(self, rawSample):
+        """
+        @brief Converts a raw sample from readRawSample() to physical units,
+         decoding only the channels enabled by the current configuration.
+        @param rawSample Tuple (t, x, y, z, convStatus, angle, magnitude)
+        @return TMAG5273Sample with temperature in C, x/y/z in mT and angle in
+         degrees. Disabled channels are None.
+        """
+        channelMode, temperatureEnabled, angleEnabled, xyRange, zRange = self.getSampleLayout()
+        axes = TMAG5273_CHANNEL_MODE_AXES[channelMode]
+        t, x, y, z, convStatus, angle, magnitude = rawSample
+        return TMAG5273Sample(
+            TMAG5273.calculateTemperature(t) if temperatureEnabled else None,
+            self.calculateMagneticField(x, xyRange) if axes & TMAG5273_AXIS_X else None,
+            self.calculateMagneticField(y, xyRange) if axes & TMAG5273_AXIS_Y else None,
+            self.calculateMagneticField(z, zRange) if axes & TMAG5273_AXIS_Z else None,
+            convStatus,
+            TMAG5273.calculateAngle(angle) if angleEnabled else None,
+            magnitude if angleEnabled else None)
+
+
+    def readSample(self):
+        """
+        @brief Reads a complete sample (temperature, X, Y, Z, conversion
+         status, angle and magnitude) in one bus transaction instead of one
+         or two transactions per channel.
+        @return TMAG5273Sample; channels that are not enabled are None
+        """
+        return self.decodeSample(self.readRawSample())
+
+
+    def getConversionTime(self):
+        """
+        @brief Estimates the time between two conversion results from the
+         configured averaging and the number of enabled channels, using the
+         1-axis and 3-axes data rates listed in setConvAvg().
+        @return Conversion time in seconds
+        """
+        avgMode = TMAG5273.getBitFieldValue(self._getConfigRegister(TMAG5273_REG_DEVICE_CONFIG_1), TMAG5273_CONV_AVG_BITS, TMAG5273_CONV_AVG_LSB)
+        return TMAG5273.calculateConversionTime(avgMode, self.getMagneticChannel(),
+                                                self.getTemperatureEN() == TMAG5273_TEMPERATURE_ENABLE)
+
+
+    @staticmethod
+    def calculateConversionTime(avgMode, channelMode, temperatureEnabled):
+        """
+        Time for one set of conversions in seconds. The 1-axis and 3-axes data
+        rates bracket the per-channel cost; every channel after the first adds
+        half the difference between them. The pseudo-simultaneous modes (XYX,
+        ...) convert three times, and the temperature channel counts as one
+        more conversion.
+        """
+        avgMode = min(avgMode, TMAG5273_X32_CONVERSION)
+        if channelMode >= TMAG5273_XYX_ENABLE:
+            conversions = 3
+        else:
+            conversions = bin(TMAG5273_CHANNEL_MODE_AXES[channelMode]).count("1")
+        if temperatureEnabled:
+            conversions += 1
+        oneAxisTime = 1e-3 / TMAG5273_CONV_RATE_1AXIS_KSPS[avgMode]
+        threeAxesTime = 1e-3 / TMAG5273_CONV_RATE_3AXIS_KSPS[avgMode]
+        perChannelTime = (threeAxesTime - oneAxisTime) / 2
+        return oneAxisTime + max(conversions - 1, 0) * perChannelTime
+
+
+    def secondsSinceFreshConversion(self):
+        """
+        @brief Time since the driver last handed out a conversion that had not
+         been read before. A value that keeps growing means the sensor stopped
+         converting.
+        @return Seconds, or None if no conversion was read yet
+        """
+        if not self._lastDataTime:
+            return None
+        return time.monotonic() - self._lastDataTime
+
+
+    def _noteConvStatus(self, convStatus):
+        """Records the SET_COUNT of a CONV_STATUS value that is handed out to the
+        caller. Returns True if it belongs to a conversion not seen before."""
+        setCount = TMAG5273.getBitFieldValue(convStatus, TMAG5273_CONV_STATUS_SET_COUNT_BITS, TMAG5273_CONV_STATUS_SET_COUNT_LSB)
+        if setCount == self._lastSetCount:
+            return False
+        self._lastSetCount = setCount
+        self._lastDataTime = time.monotonic()
+        return True
+
+
+    def _isNewConversion(self, convStatus):
+        """True if convStatus reports a completed conversion that was not read yet.
+        A power-on reset flagged in convStatus is recovered from here, so every
+        polling read checks for it at the cost of one bit test."""
+        if convStatus & TMAG5273_CONV_STATUS_POR_BITS and self._recoverPor():
+            return False
+        if not (convStatus & TMAG5273_CONV_STATUS_RESULT_STATUS_BITS):
+            return False
+        setCount = TMAG5273.getBitFieldValue(convStatus, TMAG5273_CONV_STATUS_SET_COUNT_BITS, TMAG5273_CONV_STATUS_SET_COUNT_LSB)
+        return setCount != self._lastSetCount
+
+
+    def _pollSchedule(self, timeout):
+        """Sleeps until the next conversion is due and returns (deadline, poll
+        interval) for the polling loops, both derived from the conversion time."""
+        now = time.monotonic()
+        deadline = now + timeout
+        conversionTime = self.getConversionTime()
+        nextConversion = self._lastDataTime + conversionTime
+        if nextConversion > now:
+            time.sleep(min(nextConversion, deadline) - now)
+        return deadline, max(conversionTime / 8, 50e-6)
+
+
+    def waitForData(self, timeout=1.0):
+        """
+        @brief Waits until a conversion that has not been read yet is
+         available, polling CONV_STATUS (one byte per poll). The first poll is
+         delayed until the next conversion is expected; after that the poll
+         interval is an eighth of the conversion time.
+        @param timeout Maximum time to wait in seconds
+        @return True if new data is ready, False on timeout
+        """
+        deadline, interval = self._pollSchedule(timeout)
+        while True:
+            if self._isNewConversion(self._readRegister(TMAG5273_REG_CONV_STATUS)):
+                return True
+            if time.monotonic() + interval > deadline:
+                return False
+            time.sleep(interval)
+
+
+    def readRawWhenReady(self, timeout=1.0):
+        """
+        @brief Returns the next conversion result that has not been read yet,
+         as readRawSample() does. The result block already contains
+         CONV_STATUS, so once a conversion is due the burst read itself is used
+         as the poll and a fresh sample costs a single transaction.
+        @param timeout Maximum time to wait in seconds
+        @return Raw sample tuple, or None on timeout
+        """
+        deadline, interval = self._pollSchedule(timeout)
+        checkTime = self._porCheckTime(self._lastDataTime)
+        while True:
+            rawSample = self._readResults()
+            if self._isNewConversion(rawSample[4]):
+                self._noteConvStatus(rawSample[4])
+                return rawSample
+            if checkTime is not None and time.monotonic() > checkTime:
+                checkTime = None
+                self._checkPor()
+            if time.monotonic() + interval > deadline:
+                return None
+            time.sleep(interval)
+
+
+    def readAngleRaw(self, magnitude=True):
+        """
+        @brief Reads only ANGLE_RESULT and optionally MAGNITUDE_RESULT in one
+         2 or 3 byte burst, without checking for a new conversion. Use it when
+         the conversion is known to be new, e.g. after a result interrupt.
+        @param magnitude Also read MAGNITUDE_RESULT
+        @return Tuple (angle, magnitude) of raw register values, magnitude 0
+         when not read
+        """
+        data = self._readRegisters(TMAG5273_REG_ANGLE_RESULT_MSB, 3 if magnitude else 2)
+        return (data[0] << 8) | data[1], data[2] if magnitude else 0
+
+
+    def readAngleRawWhenReady(self, timeout=1.0, magnitude=True):
+        """
+        @brief readRawWhenReady() for the angle only: each poll is one 3 or 4
+         byte burst of CONV_STATUS, ANGLE_RESULT and optionally
+         MAGNITUDE_RESULT, so a new conversion still costs one transaction.
+        @param timeout Maximum time to wait in seconds
+        @param magnitude Also read MAGNITUDE_RESULT
+        @return Tuple (convStatus, angle, magnitude) of raw register values,
+         or None on timeout
+        """
+        deadline, interval = self._pollSchedule(timeout)
+        length = 4 if magnitude else 3
+        while True:
+            data = self._readRegisters(TMAG5273_REG_CONV_STATUS, length)
+            if self._isNewConversion(data[0]):
+                self._noteConvStatus(data[0])
+                return data[0], (data[1] << 8) | data[2], data[3] if magnitude else 0
+            if time.monotonic() + interval > deadline:
+                return None
+            time.sleep(interval)
+
+
+    def readWhenReady(self, timeout=1.0):
+        """
+        @brief Waits for the next conversion and returns it decoded. Each
+         conversion is returned once, so no duplicate samples are produced.
+        @param timeout Maximum time to wait in seconds
+        @return TMAG5273Sample, or None on timeout
+        """
+        rawSample = self.readRawWhenReady(timeout)
+        if rawSample is None:
+            return None
+        return self.decodeSample(rawSample)
+
+
+    def setTriggeredMode(self):
+        """
+        @brief Puts the sensor in stand-by mode with conversions started by
+         the I2C trigger command, as used by triggerAndRead(). Costs no bus
+         transaction if the sensor is already set up that way.
+        """
+        self.configure(mode=TMAG5273_STANDBY_BY_MODE, trigger=TMAG5273_TRIGGER_I2C_COMMAND)
+
+
+    def triggerConversion(self):
+        """
+        @brief Starts one conversion with the I2C trigger command: a register
+         address with bit 7 set and no data. The sensor has to be in stand-by
+         mode with I2C command triggering, see setTriggeredMode().
+        """
+        self._bus.transfer(self.address, bytes((TMAG5273_REG_CONV_STATUS | TMAG5273_I2C_CONV_TRIGGER_BIT,)), 0)
+        self._triggerTime = time.monotonic()
+
+
+    @property
+    def triggerPending(self):
+        """True if a triggered conversion has not been read yet"""
+        return self._triggerTime is not None
+
+
+    def triggerAndReadRaw(self, retrigger=True, timeout=1.0):
+        """
+        @brief Single-shot acquisition in stand-by mode. Triggers a conversion
+         unless one is already pending, waits one conversion time (from the
+         averaging and enabled channels) and reads the result. With retrigger
+         the next conversion is started right away: in the 3-byte read mode
+         the burst read itself carries the trigger bit, so steady state
+         acquisition costs one transaction per sample and the conversion runs
+         while the caller processes the previous one. Without retrigger the
+         sensor stays idle until the next call.
+        @param retrigger Start the next conversion after reading this one
+        @param timeout Maximum time to wait for the conversion in seconds
+        @return Raw sample tuple (t, x, y, z, convStatus, angle, magnitude),
+         or None on timeout
+        """
+        if self._triggerTime is None:
+            self.setTriggeredMode()
+            self.triggerConversion()
+        if self._sampleLayout is None:
+            self.getSampleLayout()
+        conversionTime = self.getConversionTime()
+        deadline = time.monotonic() + timeout
+        delay = self._triggerTime + conversionTime - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        burstTrigger = retrigger and self._readPlan[2] is None
+        interval = max(conversionTime / 8, 50e-6)
+        checkTime = self._porCheckTime(self._triggerTime)
+        recoveries = self.porRecoveryCount
+        while True:
+            rawSample = self._readResults(burstTrigger)
+            if self._isNewConversion(rawSample[4]):
+                if self.porRecoveryCount == recoveries:
+                    break
+                # Triggered before the configuration was restored, so it was
+                # converted with the reset defaults. A burst read has already
+                # started the next conversion.
+                recoveries = self.porRecoveryCount
+                self._noteConvStatus(rawSample[4])
+                if not burstTrigger:
+                    self.triggerConversion()
+            if checkTime is not None and time.monotonic() > checkTime:
+                checkTime = None
+                self._checkPor()
+            if self._triggerTime is None and not burstTrigger:
+                # A power-on reset was recovered from and the trigger was lost
+                self.triggerConversion()
+            # Still converting; the device ignores a trigger while busy
+            if time.monotonic() + interval > deadline:
+                self._triggerTime = None
+                return None
+            time.sleep(interval)
+        self._noteConvStatus(rawSample[4])
+        self._triggerTime = None
+        if burstTrigger:
+            self._triggerTime = time.monotonic()
+        elif retrigger:
+            self.triggerConversion()
+        return rawSample
+
+
+    def triggerAndRead(self, retrigger=True, timeout=1.0):
+        """
+        @brief triggerAndReadRaw() decoded to a TMAG5273Sample
+        @param retrigger Start the next conversion after reading this one
+        @param timeout Maximum time to wait for the conversion in seconds
+        @return TMAG5273Sample, or None on timeout
+        """
+        rawSample = self.triggerAndReadRaw(retrigger, timeout)
+        if rawSample is None:
+            return None
+        return self.decodeSample(rawSample)
+
+
+    def enableInterrupt(self, result=True, threshold=False, intMode=TMAG5273_INTERRUPT_THROUGH_INT,
+                        state=TMAG5273_INTERRUPT_LATCHED):
+        """
+        @brief Configures INT_CONFIG_1 in one write: which events assert the
+         interrupt, where it is signalled and whether it is latched.
+        @param result Assert on every completed conversion
+        @param threshold Assert when a threshold is crossed
+        @param intMode TMAG5273_INTERRUPT_THROUGH_INT .. TMAG5273_INTERRUPT_THROUGH_SCL_I2C
+        @param state TMAG5273_INTERRUPT_LATCHED (until the sensor is addressed)
+         or TMAG5273_INTERRUPT_PULSED (10us pulse)
+        """
+        self.configure(int_result=TMAG5273_INTERRUPT_ASSERTED if result else TMAG5273_INTERRUPT_NOT_ASSERTED,
+                       int_threshold=TMAG5273_INTERRUPT_ASSERTED if threshold else TMAG5273_INTERRUPT_NOT_ASSERTED,
+                       int_state=state, int_mode=intMode, int_mask=TMAG5273_INTERRUPT_ENABLED)
+
+
+    def disableInterrupt(self):
+        """
+        @brief Stops the sensor from asserting its interrupt
+        """
+        self.configure(int_result=TMAG5273_INTERRUPT_NOT_ASSERTED, int_threshold=TMAG5273_INTERRUPT_NOT_ASSERTED,
+                       int_mode=TMAG5273_NO_INTERRUPT)
+
+
+    def setSleepTime(self, sleepTime):
+        """
+        @brief Sets the sleep time between conversions in wake-up and sleep
+         mode
+            0X0 = 1ms, 0X1 = 5ms, 0X2 = 10ms, 0X3 = 15ms, 0X4 = 20ms,
+            0X5 = 30ms, 0X6 = 50ms, 0X7 = 100ms, 0X8 = 500ms, 0X9 = 1000ms,
+            0XA = 2000ms, 0XB = 5000ms, 0XC = 20000ms
+            TMAG5273_REG_SENSOR_CONFIG_1 - bit 3-0
+        @param sleepTime One of TMAG5273_SLEEP_1MS .. TMAG5273_SLEEP_20000MS
+        """
+        self.configure(sleep=sleepTime)
+
+
+    def getSleepTime(self):
+        """
+        @brief Returns the wake-up and sleep mode sleep time setting
+            TMAG5273_REG_SENSOR_CONFIG_1 - bit 3-0
+        @return Sleep time setting, see TMAG5273_SLEEP_TIME_MS for the time in ms
+        """
+        return TMAG5273.getBitFieldValue(self._getConfigRegister(TMAG5273_REG_SENSOR_CONFIG_1), TMAG5273_SLEEP_MODE_BITS, TMAG5273_SLEEP_MODE_LSB)
+
+
+    @staticmethod
+    def calculateThresholdCode(thresholdMT, rangeMT):
+        """
+        @brief Converts a threshold in mT to the X/Y/Z_THR_CONFIG register
+         value: 8-bit two's complement, threshold = range * value / 128.
+        @param thresholdMT Threshold in mT
+        @param rangeMT Range of the axis in mT (40 or 80)
+        @return Register value 0x00 - 0xFF
+        """
+        code = int(round(thresholdMT * 128 / rangeMT))
+        if code < -128 or code > 127:
+            raise ValueError(f"Threshold {thresholdMT} mT is outside the {rangeMT} mT range")
+        return code & 0xFF
+
+
+    @staticmethod
+    def calculateThreshold(code, rangeMT):
+        """
+        @brief Converts an X/Y/Z_THR_CONFIG register value to mT
+        @param code Register value 0x00 - 0xFF
+        @param rangeMT Range of the axis in mT (40 or 80)
+        @return Threshold in mT
+        """
+        if code & 0x80:
+            code -= 0x100
+        return rangeMT * code / 128
+
+
+    def _axisThreshold(self, axis):
+        """(threshold register, range in mT) of TMAG5273_AXIS_X/Y/Z"""
+        if axis == TMAG5273_AXIS_X:
+            return TMAG5273_REG_X_THR_CONFIG, 40 if self.getXYAxisRange() == 0 else 80
+        if axis == TMAG5273_AXIS_Y:
+            return TMAG5273_REG_Y_THR_CONFIG, 40 if self.getXYAxisRange() == 0 else 80
+        if axis == TMAG5273_AXIS_Z:
+            return TMAG5273_REG_Z_THR_CONFIG, 40 if self.getZAxisRange() == 0 else 80
+        raise ValueError(f"Invalid axis: {axis}")
+
+
+    def setThreshold(self, axis, thresholdMT):
+        """
+        @brief Sets the magnetic threshold of one axis in mT, converted with
+         the range currently configured for that axis. Set the range first.
+        @param axis TMAG5273_AXIS_X, TMAG5273_AXIS_Y or TMAG5273_AXIS_Z
+        @param thresholdMT Threshold in mT
+        """
+        register, rangeMT = self._axisThreshold(axis)
+        name = {TMAG5273_REG_X_THR_CONFIG: "x_threshold", TMAG5273_REG_Y_THR_CONFIG: "y_threshold",
+                TMAG5273_REG_Z_THR_CONFIG: "z_threshold"}[register]
+        self.configure(**{name: TMAG5273.calculateThresholdCode(thresholdMT, rangeMT)})
+
+
+    def getThreshold(self, axis):
+        """
+        @brief Returns the magnetic threshold of one axis in mT
+        @param axis TMAG5273_AXIS_X, TMAG5273_AXIS_Y or TMAG5273_AXIS_Z
+        """
+        register, rangeMT = self._axisThreshold(axis)
+        return TMAG5273.calculateThreshold(self._getConfigRegister(register), rangeMT)
+
+
+    def armWakeUpAndSleep(self, x=None, y=None, z=None, sleepTime=TMAG5273_SLEEP_100MS,
+                          direction=TMAG5273_THRESHOLD_INT_ABOVE, crossings=TMAG5273_THRESHOLD_1,
+                          hysteresis=TMAG5273_THRESHOLD_HYST_2COMP, intMode=TMAG5273_INTERRUPT_THROUGH_INT):
+        """
+        @brief Configures threshold monitoring in wake-up and sleep mode with
+         a single block write: the axes with a threshold are enabled, the
+         thresholds are converted with the configured ranges, and the
+         threshold interrupt is routed to intMode. The sensor then wakes every
+         sleepTime, converts and asserts the interrupt on a field excursion.
+        @param x, y, z Threshold in mT per axis; None leaves the axis off
+        @param sleepTime One of TMAG5273_SLEEP_1MS .. TMAG5273_SLEEP_20000MS
+        @param direction TMAG5273_THRESHOLD_INT_ABOVE or TMAG5273_THRESHOLD_INT_BELOW
+        @param crossings TMAG5273_THRESHOLD_1 or TMAG5273_THRESHOLD_4 consecutive
+         crossings before the interrupt is asserted
+        @param hysteresis TMAG5273_THRESHOLD_HYST_2COMP: one signed threshold
+         per axis. TMAG5273_THRESHOLD_HYST_7LSB: the 7 LSBs give two opposite
+         thresholds of equal magnitude, so |B| beyond the threshold trips in
+         either direction.
+        @param intMode INT_CONFIG_1 interrupt mode, e.g. TMAG5273_INTERRUPT_THROUGH_INT
+        """
+        thresholds = {TMAG5273_AXIS_X: x, TMAG5273_AXIS_Y: y, TMAG5273_AXIS_Z: z}
+        axes = 0
+        fields = {}
+        for axis, name in ((TMAG5273_AXIS_X, "x_threshold"), (TMAG5273_AXIS_Y, "y_threshold"), (TMAG5273_AXIS_Z, "z_threshold")):
+            if thresholds[axis] is None:
+                continue
+            axes |= axis
+            rangeMT = self._axisThreshold(axis)[1]
+            thresholdMT = abs(thresholds[axis]) if hysteresis == TMAG5273_THRESHOLD_HYST_7LSB else thresholds[axis]
+            fields[name] = TMAG5273.calculateThresholdCode(thresholdMT, rangeMT)
+        if not axes:
+            raise ValueError("No threshold given")
+        self.configure(channel=TMAG5273_CHANNEL_MODE_AXES.index(axes), sleep=sleepTime,
+                       threshold_dir=direction, threshold_count=crossings, thr_hyst=hysteresis,
+                       int_result=TMAG5273_INTERRUPT_NOT_ASSERTED, int_threshold=TMAG5273_INTERRUPT_ASSERTED,
+                       int_state=TMAG5273_INTERRUPT_LATCHED, int_mode=intMode, int_mask=TMAG5273_INTERRUPT_ENABLED,
+                       mode=TMAG5273_WAKE_UP_AND_SLEEP_MODE, **fields)
+
+
+    def getTrippedAxes(self, rawSample=None):
+        """
+        @brief Compares a sample with the programmed thresholds the way the
+         sensor does (result code against threshold * 256), taking direction
+         and hysteresis mode into account.
+        @param rawSample Raw sample tuple to check; None reads a new one
+        @return Bitmask of TMAG5273_AXIS_X/Y/Z beyond their threshold
+        """
+        if rawSample is None:
+            rawSample = self._readResults()
+        axes = TMAG5273_CHANNEL_MODE_AXES[self.getMagneticChannel()]
+        config2 = self._getConfigRegister(TMAG5273_REG_DEVICE_CONFIG_2)
+        symmetric = TMAG5273.getBitFieldValue(config2, TMAG5273_THR_HYST_BITS, TMAG5273_THR_HYST_LSB) == TMAG5273_THRESHOLD_HYST_7LSB
+        below = TMAG5273.getBitFieldValue(self._getConfigRegister(TMAG5273_REG_SENSOR_CONFIG_2), TMAG5273_THRESHOLD_INT_BITS,
+                                          TMAG5273_THRESHOLD_INT_LSB) == TMAG5273_THRESHOLD_INT_BELOW
+        tripped = 0
+        for axis, register, value in ((TMAG5273_AXIS_X, TMAG5273_REG_X_THR_CONFIG, rawSample[1]),
+                                      (TMAG5273_AXIS_Y, TMAG5273_REG_Y_THR_CONFIG, rawSample[2]),
+                                      (TMAG5273_AXIS_Z, TMAG5273_REG_Z_THR_CONFIG, rawSample[3])):
+            if not axes & axis:
+                continue
+            code = self._getConfigRegister(register)
+            if symmetric:
+                if abs(value) > (code & 0x7F) << 8:
+                    tripped |= axis
+                continue
+            threshold = (code - 0x100 if code & 0x80 else code) << 8
+            if (value < threshold) if below else (value > threshold):
+                tripped |= axis
+        return tripped
+
+
+    def waitForThresholdCrossing(self, x=None, y=None, z=None, timeout=None, wait=None, **options):
+        """
+        @brief Arms wake-up and sleep threshold monitoring (see
+         armWakeUpAndSleep()) and blocks until a threshold is crossed.
+        @param x, y, z Threshold in mT per axis; None leaves the axis off
+        @param timeout Maximum wait in seconds, None waits forever
+        @param wait Optional callable wait(timeout) -> bool that blocks until
+         the INT line fires (e.g. a GPIO edge). Without it the results are
+         polled once per wake-up period, which keeps the sensor in its low
+         duty cycle but not the host; the crossing count is then not applied.
+        @param options Further armWakeUpAndSleep() arguments
+        @return Bitmask of the tripped TMAG5273_AXIS_X/Y/Z, 0 on timeout
+        """
+        self.armWakeUpAndSleep(x, y, z, **options)
+        period = self.getConversionTime() + TMAG5273_SLEEP_TIME_MS[self.getSleepTime()] / 1000
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return 0
+            if wait is not None:
+                if not wait(remaining):
+                    continue
+            else:
+                time.sleep(period if remaining is None else min(period, remaining))
+            tripped = self.getTrippedAxes()
+            if tripped:
+                return tripped
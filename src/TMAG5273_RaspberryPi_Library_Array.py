@@ -0,0 +1,257 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from TMAG5273_RaspberryPi_Library_Defs import *
+from TMAG5273_RaspberryPi_Library import TMAG5273
+from TMAG5273_RaspberryPi_Library_Planner import planForSensor, checkPlan
+from TMAG5273_RaspberryPi_Library_Transport import SMBusTransport
+
+
+class SensorArray:
+    """
+    Drives many TMAG5273 sensors spread over one or more I2C buses. All
+    sensors on a bus share one bus handle and are read round-robin with one
+    burst read each; different buses are served by their own worker thread
+    so they transfer in parallel and throughput scales with the number of
+    buses.
+    """
+
+    def __init__(self):
+        self._buses = {}    # bus number -> TMAG5273Transport used for that bus
+        self._ownedBuses = set()  # bus numbers opened by the array itself
+        self._sensors = {}  # bus number -> [TMAG5273, ...]
+        self._executor = None
+        self._threads = []
+        self._running = False
+        self.errorCounts = {}  # (busNumber, address) -> bus errors raised while acquiring
+
+    @classmethod
+    def scan(cls, buses=(1,), addresses=range(0x08, 0x78)):
+        """
+        @brief Creates an array with every TMAG5273 found on the given buses.
+        @param buses I2C bus numbers to scan, or a dict {busNumber: transport}
+        @param addresses 7-bit addresses to probe on each bus
+        @return SensorArray
+        """
+        sensorArray = cls()
+        if isinstance(buses, dict):
+            for busNumber, transport in buses.items():
+                sensorArray.addBus(busNumber, transport)
+        for busNumber in buses:
+            bus = sensorArray._getBus(busNumber)
+            for address in addresses:
+                sensor = TMAG5273(bus, address)
+                if sensor.isConnected():
+                    sensorArray._add(busNumber, sensor)
+        return sensorArray
+
+    def addBus(self, busNumber, transport):
+        """
+        @brief Uses transport (e.g. a simulated bus) for busNumber instead of
+         opening /dev/i2c-<busNumber>. Call before scan() or add().
+        """
+        if busNumber in self._buses:
+            raise ValueError(f"Bus {busNumber} is already in use")
+        self._buses[busNumber] = transport
+        self._sensors[busNumber] = []
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def _getBus(self, busNumber):
+        if busNumber not in self._buses:
+            self.addBus(busNumber, SMBusTransport(busNumber))
+            self._ownedBuses.add(busNumber)
+        return self._buses[busNumber]
+
+    def _add(self, busNumber, sensor):
+        self._sensors[busNumber].append(sensor)
+
+    def add(self, busNumber, address=TMAG5273_I2C_ADDRESS_INITIAL):
+        """
+        @brief Adds the sensor at busNumber/address, sharing the bus handle
+         with the other sensors on that bus.
+        @return The new TMAG5273 driver
+        """
+        sensor = TMAG5273(self._getBus(busNumber), address)
+        self._add(busNumber, sensor)
+        return sensor
+
+    def assignAddresses(self, busNumber, addresses, enableSensor):
+        """
+        @brief Runtime address assignment for sensors that all power up at
+         TMAG5273_I2C_ADDRESS_INITIAL. The sensors are brought up one at a
+         time; each one is moved to its new address before the next appears.
+        @param busNumber Bus the sensors are connected to
+        @param addresses New 7-bit address for each sensor, in power-up order
+        @param enableSensor Callback enableSensor(index) that powers up or
+         releases sensor number index (e.g. by driving its supply or a GPIO)
+        @return List of the new TMAG5273 drivers
+        """
+        bus = self._getBus(busNumber)
+        sensors = []
+        for index, address in enumerate(addresses):
+            enableSensor(index)
+            sensor = TMAG5273(bus, TMAG5273_I2C_ADDRESS_INITIAL)
+            if not sensor.isConnected():
+                raise RuntimeError(f"No sensor at {hex(TMAG5273_I2C_ADDRESS_INITIAL)} after enabling sensor {index}")
+            sensor.setI2CAddress(address)
+            self._add(busNumber, sensor)
+            sensors.append(sensor)
+        return sensors
+
+    @property
+    def sensors(self):
+        """All drivers in the array, bus by bus"""
+        return [sensor for sensors in self._sensors.values() for sensor in sensors]
+
+    def __len__(self):
+        return sum(len(sensors) for sensors in self._sensors.values())
+
+    def _map(self, function):
+        """Runs function(busNumber, sensors) for every bus in parallel and
+        returns the results merged into one dict"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=max(len(self._buses), 1), thread_name_prefix="SensorArray")
+        results = {}
+        for busResults in self._executor.map(function, list(self._sensors), list(self._sensors.values())):
+            results.update(busResults)
+        return results
+
+    def beginAll(self, **fields):
+        """
+        @brief Runs begin() on every sensor, buses in parallel, and then
+         configure(**fields) if any configuration fields are given.
+        """
+        def beginBus(busNumber, sensors):
+            for sensor in sensors:
+                sensor.begin()
+                if fields:
+                    sensor.configure(**fields)
+            return {}
+        self._map(beginBus)
+
+    def configureForRate(self, rate, busHz=400000, force=False, **options):
+        """
+        @brief Plans and applies the averaging of every sensor for rate (see
+         TMAG5273_RaspberryPi_Library_Planner.configureForRate()), counting
+         the sensors that share each bus. Nothing is written unless every
+         bus fits, except with force.
+        @param rate Target output rate per sensor in samples per second
+        @param busHz I2C clock in Hz, or a dict {busNumber: Hz}
+        @return Dict {(busNumber, address): TMAG5273Plan}
+        """
+        def busClock(busNumber):
+            return busHz[busNumber] if isinstance(busHz, dict) else busHz
+
+        plans = {}
+        for busNumber, sensors in self._sensors.items():
+            for sensor in sensors:
+                plan = planForSensor(sensor, rate, busClock(busNumber), len(sensors), **options)
+                if not force:
+                    checkPlan(plan, busClock(busNumber), len(sensors))
+                plans[(busNumber, sensor.address)] = plan
+
+        def configureBus(busNumber, sensors):
+            for sensor in sensors:
+                sensor.configure(**plans[(busNumber, sensor.address)].configuration)
+            return {}
+        self._map(configureBus)
+        return plans
+
+    def readAll(self):
+        """
+        @brief Reads one sample from every sensor: one burst read per sensor,
+         round-robin within a bus and buses in parallel.
+        @return Dict {(busNumber, address): TMAG5273Sample}
+        """
+        def readBus(busNumber, sensors):
+            return {(busNumber, sensor.address): sensor.readSample() for sensor in sensors}
+        return self._map(readBus)
+
+    def snapshot(self, retrigger=True):
+        """
+        @brief Single-shot acquisition of every sensor in stand-by mode. Each
+         bus first triggers all its sensors that have no conversion pending,
+         so they convert at nearly the same time, then collects them with
+         triggerAndRead(). With retrigger the burst reads start the next
+         snapshot, so repeated calls cost one transaction per sensor.
+        @param retrigger Start the next conversions while reading these
+        @return Dict {(busNumber, address): TMAG5273Sample}, None for a sensor
+         that did not finish in time
+        """
+        def snapshotBus(busNumber, sensors):
+            for sensor in sensors:
+                if not sensor.triggerPending:
+                    sensor.setTriggeredMode()
+                    sensor.triggerConversion()
+            return {(busNumber, sensor.address): sensor.triggerAndRead(retrigger) for sensor in sensors}
+        return self._map(snapshotBus)
+
+    def start(self, callback):
+        """
+        @brief Starts continuous acquisition with one worker thread per bus.
+         Each worker burst-reads its sensors round-robin and calls
+         callback(busNumber, address, timestamp, rawSample) for every new
+         conversion. The callback runs on the worker threads. A bus error
+         while reading one sensor is counted in errorCounts and the worker
+         moves on to the next sensor.
+        """
+        if self._running:
+            return
+        self._running = True
+        self.errorCounts = {(busNumber, sensor.address): 0 for busNumber, sensors in self._sensors.items() for sensor in sensors}
+        for busNumber, sensors in self._sensors.items():
+            if not sensors:
+                continue
+            thread = threading.Thread(target=self._run, args=(busNumber, sensors, callback),
+                                      name=f"SensorArray-i2c-{busNumber}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _run(self, busNumber, sensors, callback):
+        # Back off for a fraction of the fastest conversion when a full pass found nothing new
+        idleTime = min(sensor.getConversionTime() for sensor in sensors) / 4
+        while self._running:
+            fresh = False
+            for sensor in sensors:
+                try:
+                    rawSample = sensor.readRawWhenReady(0)
+                except OSError:
+                    self.errorCounts[(busNumber, sensor.address)] += 1
+                    continue
+                if rawSample is not None:
+                    fresh = True
+                    callback(busNumber, sensor.address, time.monotonic(), rawSample)
+            if not fresh:
+                time.sleep(idleTime)
+
+    def stop(self):
+        """
+        @brief Stops continuous acquisition and waits for the workers.
+        """
+        self._running = False
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def close(self):
+        """
+        @brief Stops acquisition and closes the bus handles opened by the
+         array. Transports passed to addBus() are left open.
+        """
+        self.stop()
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        for busNumber in self._ownedBuses:
+            self._buses[busNumber].close()
+        self._buses = {}
+        self._ownedBuses = set()
+        self._sensors = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
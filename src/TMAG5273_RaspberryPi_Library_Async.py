@@ -0,0 +1,135 @@
+import asyncio
+import functools
+import inspect
+from concurrent.futures import ThreadPoolExecutor
+from TMAG5273_RaspberryPi_Library_Defs import TMAG5273_I2C_ADDRESS_INITIAL
+from TMAG5273_RaspberryPi_Library import TMAG5273
+
+# TMAG5273 methods that never touch the bus and stay plain synchronous calls
+_SYNC_METHODS = {"close", "invalidate", "setBitFieldValue", "getBitFieldValue",
+                 "calculateMagneticField", "calculateTemperature", "calculateAngle", "calculateConversionTime",
+                 "calculateSampleLayout", "calculateReadLength", "calculateThresholdCode", "calculateThreshold",
+                 "decodeSample", "secondsSinceFreshConversion"}
+
+
+class AsyncTMAG5273:
+    """
+    asyncio front end for TMAG5273. Every public method of TMAG5273 that
+    talks to the sensor is available here as a coroutine with the same name
+    and arguments (await sensor.begin(), await sensor.getXData(), ...).
+
+    The blocking smbus2 calls run on a single worker thread per bus and are
+    serialised with an asyncio lock, so the event loop never blocks on I2C.
+    Drivers that share one bus should share the same executor and lock.
+    """
+
+    def __init__(self, bus=1, address=TMAG5273_I2C_ADDRESS_INITIAL, executor=None, lock=None):
+        """
+        @brief Creates the asynchronous driver.
+        @param bus I2C bus number, an opened SMBus object, a transport or an existing
+         TMAG5273 instance to wrap
+        @param address 7-bit I2C address of the sensor, ignored when a TMAG5273
+         instance is wrapped
+        @param executor Executor for the blocking bus calls. Defaults to a
+         private single-thread executor.
+        @param lock asyncio.Lock guarding the bus, defaults to a private lock
+        """
+        self.sensor = bus if isinstance(bus, TMAG5273) else TMAG5273(bus, address)
+        self._ownsExecutor = executor is None
+        self._executor = executor if executor is not None else ThreadPoolExecutor(max_workers=1, thread_name_prefix="TMAG5273")
+        self._lock = lock if lock is not None else asyncio.Lock()
+
+    async def _call(self, function, *args, **kwargs):
+        """Runs a blocking driver call on the executor while holding the bus lock"""
+        async with self._lock:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._executor, functools.partial(function, *args, **kwargs))
+
+    def close(self):
+        """
+        @brief Closes the wrapped driver and shuts down the private executor.
+        """
+        self.sensor.close()
+        if self._ownsExecutor:
+            self._executor.shutdown(wait=False)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def decodeSample(self, rawSample):
+        return self.sensor.decodeSample(rawSample)
+
+    def invalidate(self):
+        self.sensor.invalidate()
+
+    async def stream(self, rate=None):
+        """
+        @brief Asynchronous sample stream: async for sample in sensor.stream(100)
+        @param rate Samples per second. The schedule is drift free; if a read
+         falls behind, the stream resumes from the current time instead of
+         bursting. None follows the conversion rate and yields every new
+         conversion once; waiting happens on the event loop, not on the
+         executor, so other sensors on the same executor are not held up.
+         asyncio timer resolution limits this to a few hundred samples per
+         second; use TMAG5273Stream for full sensor rate.
+        @return Async generator of TMAG5273Sample
+        """
+        loop = asyncio.get_running_loop()
+        if rate is None:
+            conversionTime = await self._call(self.sensor.getConversionTime)
+            while True:
+                rawSample = await self._call(self.sensor.readRawWhenReady, 0)
+                if rawSample is None:
+                    await asyncio.sleep(conversionTime / 4)
+                    continue
+                yield self.sensor.decodeSample(rawSample)
+                await asyncio.sleep(conversionTime)
+
+        period = 1.0 / rate
+        nextTime = loop.time()
+        while True:
+            yield await self._call(self.sensor.readSample)
+            nextTime += period
+            delay = nextTime - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                nextTime = loop.time()
+
+
+def _mirror(name):
+    method = getattr(TMAG5273, name)
+
+    async def coroutine(self, *args, **kwargs):
+        return await self._call(method, self.sensor, *args, **kwargs)
+
+    coroutine.__name__ = name
+    coroutine.__qualname__ = f"AsyncTMAG5273.{name}"
+    coroutine.__doc__ = method.__doc__
+    return coroutine
+
+
+def _passThrough(name):
+    if isinstance(inspect.getattr_static(TMAG5273, name), staticmethod):
+        return staticmethod(getattr(TMAG5273, name))
+    method = getattr(TMAG5273, name)
+
+    def function(self, *args, **kwargs):
+        return getattr(self.sensor, name)(*args, **kwargs)
+
+    function.__name__ = name
+    function.__qualname__ = f"AsyncTMAG5273.{name}"
+    function.__doc__ = method.__doc__
+    return function
+
+
+for _name in dir(TMAG5273):
+    if not _name.startswith("_") and _name not in _SYNC_METHODS and callable(getattr(TMAG5273, _name)):
+        setattr(AsyncTMAG5273, _name, _mirror(_name))
+
+for _name in _SYNC_METHODS:
+    if _name not in AsyncTMAG5273.__dict__:
+        setattr(AsyncTMAG5273, _name, _passThrough(_name))
@@ -0,0 +1,354 @@
+# Acquisition benchmark for the TMAG5273 driver. Measures each access pattern
+# (per-axis getters, burst read, background stream, several sensors) against
+# simulated sensors, a replayed recording or real hardware and prints the
+# results as JSON so they can be compared between releases:
+#
+#   python3 TMAG5273_RaspberryPi_Library_Bench.py --bus-hz 1000000 --sensors 4 --output bench.json
+#   python3 TMAG5273_RaspberryPi_Library_Bench.py --backend replay --recording capture.bin
+import argparse
+import json
+import math
+import platform
+import sys
+import time
+from TMAG5273_RaspberryPi_Library_Defs import *
+from TMAG5273_RaspberryPi_Library import TMAG5273
+from TMAG5273_RaspberryPi_Library_Array import SensorArray
+from TMAG5273_RaspberryPi_Library_Replay import ReplayTransport, replayBlocks
+from TMAG5273_RaspberryPi_Library_Sim import SimulatedTMAG5273, SimulatedBus
+from TMAG5273_RaspberryPi_Library_Stream import TMAG5273Stream
+from TMAG5273_RaspberryPi_Library_Transport import TMAG5273Transport, SMBusTransport
+
+TMAG5273_BENCH_PATTERNS = ("getters", "burst", "stream", "multi", "decode")
+
+# Format version of the JSON report
+TMAG5273_BENCH_VERSION = 1
+
+
+class CountingTransport(TMAG5273Transport):
+    """
+    Wraps a transport and counts its transactions and payload bytes, so the
+    bus cost of a pattern can be measured on any backend.
+    """
+
+    def __init__(self, transport):
+        self.transport = transport
+        self.resetCounters()
+
+    def resetCounters(self):
+        self.transactions = 0
+        self.bytesRead = 0
+        self.bytesWritten = 0
+
+    def _count(self, written, read):
+        self.transactions += 1
+        self.bytesWritten += written
+        self.bytesRead += read
+
+    def readByte(self, address, register):
+        self._count(1, 1)
+        return self.transport.readByte(address, register)
+
+    def readBlock(self, address, register, length):
+        self._count(1, length)
+        return self.transport.readBlock(address, register, length)
+
+    def writeByte(self, address, register, value):
+        self._count(2, 0)
+        self.transport.writeByte(address, register, value)
+
+    def writeBlock(self, address, register, values):
+        values = bytes(values)
+        self._count(1 + len(values), 0)
+        self.transport.writeBlock(address, register, values)
+
+    def read(self, address, length):
+        self._count(0, length)
+        return self.transport.read(address, length)
+
+    def transfer(self, address, writeData, readLength):
+        writeData = bytes(writeData)
+        self._count(len(writeData), readLength)
+        return self.transport.transfer(address, writeData, readLength)
+
+    def close(self):
+        self.transport.close()
+
+
+def _rotatingField(t):
+    """Field of a magnet turning at 10 revolutions per second"""
+    phase = 2 * math.pi * 10 * t
+    return (20 * math.cos(phase), 20 * math.sin(phase), -10.0, 25.0)
+
+
+def _percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(int(fraction * len(values)), len(values) - 1)]
+
+
+def _report(samples, elapsed, cpu, latencies, counters):
+    """Builds the result dict of one pattern"""
+    transactions = sum(counter.transactions for counter in counters)
+    byteCount = sum(counter.bytesRead + counter.bytesWritten for counter in counters)
+    p50 = _percentile(latencies, 0.50)
+    p99 = _percentile(latencies, 0.99)
+    return {
+        "samples": samples,
+        "seconds": elapsed,
+        "samples_per_sec": samples / elapsed if elapsed else None,
+        "transactions_per_sample": transactions / samples if samples else None,
+        "bytes_per_sample": byteCount / samples if samples else None,
+        "latency_p50_us": p50 * 1e6 if p50 is not None else None,
+        "latency_p99_us": p99 * 1e6 if p99 is not None else None,
+        "cpu_us_per_sample": cpu / samples * 1e6 if samples else None,
+    }
+
+
+def _measure(readOnce, duration, counters):
+    """Calls readOnce() until duration has passed. readOnce returns the
+    number of samples it produced; its call time is the latency."""
+    for counter in counters:
+        counter.resetCounters()
+    latencies = []
+    samples = 0
+    cpuStart = time.process_time()
+    start = time.perf_counter()
+    end = start + duration
+    now = start
+    while now < end:
+        samples += readOnce()
+        finished = time.perf_counter()
+        latencies.append(finished - now)
+        now = finished
+    return _report(samples, now - start, time.process_time() - cpuStart, latencies, counters)
+
+
+def benchmarkBegin(sensor, counter, runs=20):
+    """
+    @brief Times begin(). The first call configures the sensor from its
+     power-up state (cold); the following runs find it configured already
+     and only refresh and verify (warm).
+    @return Dict with the cold time and transactions, the mean and p99 warm
+     time in us and the warm transactions per begin()
+    """
+    counter.resetCounters()
+    start = time.perf_counter()
+    sensor.begin()
+    cold = time.perf_counter() - start
+    coldTransactions = counter.transactions
+    counter.resetCounters()
+    times = []
+    for _ in range(runs):
+        sensor.invalidate()
+        start = time.perf_counter()
+        sensor.begin()
+        times.append(time.perf_counter() - start)
+    return {
+        "cold_us": cold * 1e6,
+        "cold_transactions": coldTransactions,
+        "runs": runs,
+        "mean_us": sum(times) / runs * 1e6,
+        "p99_us": _percentile(times, 0.99) * 1e6,
+        "transactions": counter.transactions / runs,
+    }
+
+
+def benchmarkGetters(sensor, counter, duration):
+    """
+    @brief One sample is getXData(), getYData(), getZData() and getTemp().
+    """
+    def readOnce():
+        sensor.getXData()
+        sensor.getYData()
+        sensor.getZData()
+        sensor.getTemp()
+        return 1
+    return _measure(readOnce, duration, [counter])
+
+
+def benchmarkBurst(sensor, counter, duration):
+    """
+    @brief One sample is one readSample() burst read.
+    """
+    def readOnce():
+        sensor.readSample()
+        return 1
+    return _measure(readOnce, duration, [counter])
+
+
+def benchmarkStream(sensor, counter, duration):
+    """
+    @brief Runs a TMAG5273Stream and consumes it in chunks. Samples are new
+     conversions only, so the rate is bounded by the conversion rate. The
+     latency is the age of a sample when the consumer receives it.
+    """
+    counter.resetCounters()
+    latencies = []
+    samples = 0
+    with TMAG5273Stream(sensor) as stream:
+        cpuStart = time.process_time()
+        start = time.perf_counter()
+        end = time.monotonic() + duration
+        while time.monotonic() < end:
+            chunk, timestamps = stream.readChunk(256, timeout=0.1)
+            received = time.monotonic()
+            latencies.extend(received - timestamp for timestamp in timestamps)
+            samples += len(timestamps)
+        elapsed = time.perf_counter() - start
+        cpu = time.process_time() - cpuStart
+    return _report(samples, elapsed, cpu, latencies, [counter])
+
+
+def benchmarkMulti(sensorArray, counters, duration):
+    """
+    @brief One round is readAll(): a burst read of every sensor, buses in
+     parallel. Each sensor read counts as a sample; the latency is per round.
+    """
+    count = len(sensorArray)
+
+    def readOnce():
+        sensorArray.readAll()
+        return count
+    return _measure(readOnce, duration, counters)
+
+
+def benchmarkDecode(recording, duration, blockSize=65536):
+    """
+    @brief Decodes a recording block by block with replayBlocks() and
+     recording.convert(), starting over at the end, without any bus access.
+     The latency is per block.
+    """
+    def readOnce():
+        samples = 0
+        for block in replayBlocks(recording, blockSize):
+            recording.convert(block)
+            samples += len(block)
+            if time.perf_counter() >= end:
+                break
+        return samples
+    end = time.perf_counter() + duration
+    return dict(_measure(readOnce, duration, []), block_size=blockSize)
+
+
+def simulatedBuses(busCount, sensorsPerBus, busHz, overhead):
+    """
+    @brief Creates busCount SimulatedBus objects with sensorsPerBus
+     simulated sensors each, addressed from TMAG5273_I2C_ADDRESS_INITIAL on.
+    @return Dict {busNumber: (transport, addresses)}
+    """
+    buses = {}
+    for busNumber in range(busCount):
+        addresses = [TMAG5273_I2C_ADDRESS_INITIAL + index for index in range(sensorsPerBus)]
+        devices = [SimulatedTMAG5273(address, field=_rotatingField, noise=0.05) for address in addresses]
+        buses[busNumber] = (SimulatedBus(devices, busHz, overhead), addresses)
+    return buses
+
+
+def runBenchmarks(buses, patterns=TMAG5273_BENCH_PATTERNS, duration=2.0, configuration=None, recording=None):
+    """
+    @brief Runs the benchmark patterns.
+    @param buses Dict {busNumber: (transport, addresses)}. The single sensor
+     patterns use the first address of the first bus, multi uses all.
+    @param patterns Names from TMAG5273_BENCH_PATTERNS
+    @param duration Seconds per pattern
+    @param configuration configure() fields applied after begin()
+    @param recording TMAG5273Recording for the decode pattern, which is
+     skipped without one
+    @return Dict of results per pattern, plus begin
+    """
+    configuration = configuration or {}
+    counters = {busNumber: CountingTransport(transport) for busNumber, (transport, addresses) in buses.items()}
+    firstBus = next(iter(buses))
+    counter = counters[firstBus]
+    sensor = TMAG5273(counter, buses[firstBus][1][0])
+    results = {"begin": benchmarkBegin(sensor, counter)}
+    if configuration:
+        sensor.configure(**configuration)
+    if "getters" in patterns:
+        results["getters"] = benchmarkGetters(sensor, counter, duration)
+    if "burst" in patterns:
+        results["burst"] = benchmarkBurst(sensor, counter, duration)
+    if "stream" in patterns:
+        results["stream"] = benchmarkStream(sensor, counter, duration)
+    if "multi" in patterns:
+        sensorArray = SensorArray()
+        for busNumber, (transport, addresses) in buses.items():
+            sensorArray.addBus(busNumber, counters[busNumber])
+            for address in addresses:
+                sensorArray.add(busNumber, address)
+        with sensorArray:
+            sensorArray.beginAll(**configuration)
+            results["multi"] = dict(benchmarkMulti(sensorArray, list(counters.values()), duration), sensors=len(sensorArray))
+    if "decode" in patterns and recording is not None:
+        results["decode"] = benchmarkDecode(recording, duration)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="TMAG5273 acquisition benchmark")
+    parser.add_argument("--backend", choices=("sim", "i2c", "replay"), default="sim",
+                        help="simulated sensors (default), real sensors on /dev/i2c-N or a recording at full speed")
+    parser.add_argument("--recording", help="recording file for the replay backend")
+    parser.add_argument("--patterns", default=",".join(TMAG5273_BENCH_PATTERNS),
+                        help="comma separated subset of " + ",".join(TMAG5273_BENCH_PATTERNS))
+    parser.add_argument("--duration", type=float, default=2.0, help="seconds per pattern")
+    parser.add_argument("--bus-hz", type=int, default=400000, help="simulated I2C clock")
+    parser.add_argument("--overhead-us", type=float, default=50.0, help="simulated time per transaction in us")
+    parser.add_argument("--buses", type=int, default=1, help="simulated buses")
+    parser.add_argument("--sensors", type=int, default=4, help="simulated sensors per bus")
+    parser.add_argument("--bus", type=int, action="append", help="I2C bus number for the i2c backend (repeatable)")
+    parser.add_argument("--address", type=lambda text: int(text, 0), action="append",
+                        help="sensor address for the i2c backend (repeatable)")
+    parser.add_argument("--avg", type=int, default=TMAG5273_X1_CONVERSION, help="conversion averaging setting")
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    patterns = [pattern for pattern in args.patterns.split(",") if pattern]
+    for pattern in patterns:
+        if pattern not in TMAG5273_BENCH_PATTERNS:
+            parser.error(f"unknown pattern {pattern}")
+    recording = None
+    if args.backend == "replay":
+        if not args.recording:
+            parser.error("the replay backend needs --recording")
+        transport = ReplayTransport(args.recording, realTime=False, loop=True)
+        recording = transport.recording
+        buses = {0: (transport, [recording.address])}
+        backend = {"type": "replay", "recording": args.recording, "records": len(recording)}
+    elif args.backend == "sim":
+        buses = simulatedBuses(args.buses, args.sensors, args.bus_hz, args.overhead_us / 1e6)
+        backend = {"type": "sim", "bus_hz": args.bus_hz, "overhead_us": args.overhead_us,
+                   "buses": args.buses, "sensors_per_bus": args.sensors}
+    else:
+        addresses = args.address or [TMAG5273_I2C_ADDRESS_INITIAL]
+        buses = {busNumber: (SMBusTransport(busNumber), addresses) for busNumber in (args.bus or [1])}
+        backend = {"type": "i2c", "buses": list(buses), "addresses": addresses}
+
+    try:
+        results = runBenchmarks(buses, patterns, args.duration, {"avg": args.avg}, recording)
+    finally:
+        for transport, addresses in buses.values():
+            transport.close()
+    report = {
+        "version": TMAG5273_BENCH_VERSION,
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "backend": backend,
+        "avg": args.avg,
+        "duration": args.duration,
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,273 @@
+# Gain and offset calibration of the angle calculation. While a magnet turns
+# over the sensor, the two channels of the angle pair trace an ellipse; its
+# centre is the offset of each channel and its extents give the gain ratio
+# between them. The fit is programmed into MAG_OFFSET_CONFIG_1/2 and
+# MAG_GAIN_CONFIG, so the sensor's CORDIC returns corrected angles and the
+# host does no per-sample correction.
+import json
+import math
+import time
+from TMAG5273_RaspberryPi_Library_Defs import *
+from TMAG5273_RaspberryPi_Library import TMAG5273
+from TMAG5273_RaspberryPi_Library_Stream import TMAG5273Stream, TMAG5273_STREAM_FIELDS
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Format version of saved calibrations
+TMAG5273_CALIBRATION_VERSION = 1
+
+# Result register codes per LSB of MAG_OFFSET_CONFIG_1/2 (2*|range|/2^12 of a 2^16 code span)
+TMAG5273_OFFSET_CODES_PER_LSB = 16
+
+# A sweep has to cover this fraction of the 12 sectors of 30 degrees around
+# the fitted centre
+TMAG5273_CALIBRATION_MIN_COVERAGE = 0.75
+TMAG5273_CALIBRATION_MIN_SAMPLES = 50
+
+# Angle calculation setting -> (1st, 2nd) index into the raw sample tuple
+_ANGLE_PAIRS = {
+    TMAG5273_XY_ANGLE_CALCULATION: (1, 2),
+    TMAG5273_YZ_ANGLE_CALCULATION: (2, 3),
+    TMAG5273_XZ_ANGLE_CALCULATION: (1, 3),
+}
+
+_ANGLE_NAMES = {TMAG5273_XY_ANGLE_CALCULATION: "xy", TMAG5273_YZ_ANGLE_CALCULATION: "yz", TMAG5273_XZ_ANGLE_CALCULATION: "xz"}
+
+
+def _pairRanges(angle, xyRange, zRange):
+    """Ranges in mT of the 1st and 2nd channel of an angle pair"""
+    return xyRange, (xyRange if angle == TMAG5273_XY_ANGLE_CALCULATION else zRange)
+
+
+class TMAG5273Calibration:
+    """
+    Offsets and amplitudes of the two channels of an angle pair, in mT, as
+    fitted from a rotation sweep. Storing physical values keeps a saved
+    calibration valid when the ranges change; registers() converts them for
+    the ranges in use.
+    """
+
+    def __init__(self, angle, offsets, amplitudes, samples=0, residual=None, created=None):
+        """
+        @param angle Angle pair (TMAG5273_XY_ANGLE_CALCULATION ..)
+        @param offsets (1st, 2nd) channel offsets in mT
+        @param amplitudes (1st, 2nd) channel amplitudes in mT
+        @param samples Number of samples the fit used
+        @param residual RMS distance of the samples from the fitted ellipse,
+         relative to its mean radius
+        @param created Wall clock time of the calibration, defaults to now
+        """
+        if angle not in _ANGLE_PAIRS:
+            raise ValueError(f"Invalid angle pair: {hex(angle)}")
+        self.angle = angle
+        self.offsets = tuple(offsets)
+        self.amplitudes = tuple(amplitudes)
+        self.samples = samples
+        self.residual = residual
+        self.created = time.time() if created is None else created
+
+    def registers(self, xyRange, zRange):
+        """
+        @brief Register values for the given ranges
+        @param xyRange, zRange Axis ranges in mT (40 or 80)
+        @return Dict of configure() fields: angle, gain, gain_channel,
+         offset_1 and offset_2
+        """
+        ranges = _pairRanges(self.angle, xyRange, zRange)
+        offsets = []
+        for offset, rangeMT in zip(self.offsets, ranges):
+            code = round(offset * 32768 / rangeMT / TMAG5273_OFFSET_CODES_PER_LSB)
+            if not -128 <= code <= 127:
+                raise ValueError(f"Offset of {offset:.2f} mT exceeds the offset register at +-{rangeMT} mT")
+            offsets.append(code & 0xFF)
+        # The correction works on result codes; scale the channel with the larger swing down
+        swings = [amplitude * 32768 / rangeMT for amplitude, rangeMT in zip(self.amplitudes, ranges)]
+        gainChannel = TMAG5273_GAIN_ADJUST_CHANNEL_1 if swings[0] > swings[1] else TMAG5273_GAIN_ADJUST_CHANNEL_2
+        gain = round(256 * min(swings) / max(swings))
+        return {
+            "angle": self.angle,
+            "gain": 0 if gain >= 256 else max(gain, 1),
+            "gain_channel": gainChannel,
+            "offset_1": offsets[0],
+            "offset_2": offsets[1],
+        }
+
+    def apply(self, sensor):
+        """
+        @brief Programs the calibration and its angle pair into sensor with
+         one configure() call, for the sensor's current ranges.
+        """
+        xyRange, zRange = sensor.getSampleLayout()[3:5]
+        sensor.configure(**self.registers(xyRange, zRange))
+
+    def toDict(self):
+        return {
+            "version": TMAG5273_CALIBRATION_VERSION,
+            "angle": _ANGLE_NAMES[self.angle],
+            "offsets_mT": list(self.offsets),
+            "amplitudes_mT": list(self.amplitudes),
+            "samples": self.samples,
+            "residual": self.residual,
+            "created": self.created,
+        }
+
+    @classmethod
+    def fromDict(cls, values):
+        if values.get("version", 0) > TMAG5273_CALIBRATION_VERSION:
+            raise ValueError(f"Unsupported calibration version {values.get('version')}")
+        angles = {name: angle for angle, name in _ANGLE_NAMES.items()}
+        return cls(angles[values["angle"]], values["offsets_mT"], values["amplitudes_mT"],
+                   values.get("samples", 0), values.get("residual"), values.get("created"))
+
+    def save(self, path):
+        """Writes the calibration to a JSON file"""
+        with open(path, "w") as file:
+            json.dump(self.toDict(), file, indent=2)
+            file.write("\n")
+
+    @classmethod
+    def load(cls, path):
+        """Reads a calibration written by save()"""
+        with open(path) as file:
+            return cls.fromDict(json.load(file))
+
+    def __repr__(self):
+        return (f"TMAG5273Calibration({_ANGLE_NAMES[self.angle]}, offsets_mT=({self.offsets[0]:.3f}, {self.offsets[1]:.3f}), "
+                f"amplitudes_mT=({self.amplitudes[0]:.3f}, {self.amplitudes[1]:.3f}), samples={self.samples})")
+
+
+def fitEllipse(first, second):
+    """
+    @brief Least-squares fit of the conic A*u^2 + B*u*v + C*v^2 + D*u + E*v = 1
+     to the points (first, second), vectorized over all samples.
+    @param first, second Sequences of the two channel values
+    @return (centre1, centre2, extent1, extent2, residual): the centre of the
+     ellipse, its half-widths along each channel (the channel amplitudes) and
+     the RMS radial error relative to the mean radius
+    """
+    if np is None:
+        raise ImportError("fitEllipse needs NumPy")
+    first = np.asarray(first, dtype=np.float64)
+    second = np.asarray(second, dtype=np.float64)
+    # Centre and scale both channels alike for a well-conditioned system
+    mean1, mean2 = first.mean(), second.mean()
+    scale = max(first.std(), second.std())
+    if not scale:
+        raise ValueError("The sweep did not move the field")
+    u = (first - mean1) / scale
+    v = (second - mean2) / scale
+    design = np.column_stack((u * u, u * v, v * v, u, v))
+    (a, b, c, d, e), *unused = np.linalg.lstsq(design, np.ones_like(u), rcond=None)
+    determinant = 4 * a * c - b * b
+    if determinant <= 0:
+        raise ValueError("The sweep does not describe an ellipse")
+    u0, v0 = np.linalg.solve([[2 * a, b], [b, 2 * c]], [-d, -e])
+    level = 1 - (a * u0 * u0 + b * u0 * v0 + c * v0 * v0 + d * u0 + e * v0)
+    if level <= 0:
+        raise ValueError("The sweep does not describe an ellipse")
+    extent1 = math.sqrt(4 * c * level / determinant)
+    extent2 = math.sqrt(4 * a * level / determinant)
+    # Radial error after mapping the ellipse onto the unit circle by its axis-aligned extents
+    radius = np.hypot((u - u0) / extent1, (v - v0) / extent2)
+    residual = float(np.sqrt(np.mean((radius - radius.mean()) ** 2)) / radius.mean())
+    return (float(mean1 + u0 * scale), float(mean2 + v0 * scale), extent1 * scale, extent2 * scale, residual)
+
+
+def sweepCoverage(first, second, centre1, centre2):
+    """Fraction of the 12 sectors of 30 degrees around the centre that the sweep reached"""
+    angles = np.arctan2(np.asarray(second, dtype=np.float64) - centre2, np.asarray(first, dtype=np.float64) - centre1)
+    sectors = np.floor((angles + math.pi) / (math.pi / 6)).astype(int) % 12
+    return len(np.unique(sectors)) / 12
+
+
+def captureSweep(sensor, duration=5.0, maxSamples=1 << 16):
+    """
+    @brief Collects raw samples with a TMAG5273Stream while the magnet is
+     turned, reading the ring buffer straight into one preallocated array.
+    @param sensor TMAG5273 driver, configured and in continuous mode
+    @param duration Capture time in seconds
+    @param maxSamples Capture stops early when this many samples are in
+    @return int16 array of shape (samples, TMAG5273_STREAM_FIELDS) with the
+     raw values (t, x, y, z, convStatus, angle, magnitude)
+    """
+    if np is None:
+        raise ImportError("captureSweep needs NumPy")
+    samples = np.empty(maxSamples * TMAG5273_STREAM_FIELDS, dtype=np.int16)
+    timestamps = np.empty(maxSamples)
+    count = 0
+    with TMAG5273Stream(sensor) as stream:
+        end = time.monotonic() + duration
+        while count < maxSamples and time.monotonic() < end:
+            count += stream.readInto(samples[count * TMAG5273_STREAM_FIELDS:], timestamps[count:],
+                                     max(end - time.monotonic(), 0))
+    return samples[:count * TMAG5273_STREAM_FIELDS].reshape(count, TMAG5273_STREAM_FIELDS)
+
+
+def fitCalibration(rawSamples, angle, xyRange, zRange, minCoverage=TMAG5273_CALIBRATION_MIN_COVERAGE):
+    """
+    @brief Fits a calibration to a sweep from captureSweep().
+    @param rawSamples Array of raw samples, one row per sample
+    @param angle Angle pair (TMAG5273_XY_ANGLE_CALCULATION ..)
+    @param xyRange, zRange Axis ranges in mT the sweep was taken with
+    @param minCoverage Required fraction of 30 degree sectors covered
+    @return TMAG5273Calibration
+    """
+    if angle not in _ANGLE_PAIRS:
+        raise ValueError(f"Invalid angle pair: {hex(angle)}")
+    if len(rawSamples) < TMAG5273_CALIBRATION_MIN_SAMPLES:
+        raise ValueError(f"Only {len(rawSamples)} samples in the sweep, {TMAG5273_CALIBRATION_MIN_SAMPLES} needed")
+    index1, index2 = _ANGLE_PAIRS[angle]
+    first, second = rawSamples[:, index1], rawSamples[:, index2]
+    centre1, centre2, extent1, extent2, residual = fitEllipse(first, second)
+    coverage = sweepCoverage(first, second, centre1, centre2)
+    if coverage < minCoverage:
+        raise ValueError(f"The sweep covered only {coverage * 360:.0f} degrees; turn the magnet a full revolution")
+    range1, range2 = _pairRanges(angle, xyRange, zRange)
+    return TMAG5273Calibration(angle, (centre1 * range1 / 32768, centre2 * range2 / 32768),
+                               (extent1 * range1 / 32768, extent2 * range2 / 32768), len(rawSamples), residual)
+
+
+def calibrate(sensor, angle=None, duration=5.0, apply=True, **options):
+    """
+    @brief Runs a calibration: clears the gain and offset corrections,
+     captures a rotation sweep, fits it and programs the result. Turn the
+     magnet at least one full revolution during duration. If the sweep or
+     the fit fails, or apply is False, the previous configuration is
+     written back.
+    @param sensor TMAG5273 driver, configured with the channels of the angle
+     pair enabled
+    @param angle Angle pair, defaults to the one currently enabled
+    @param duration Sweep time in seconds
+    @param apply Program the calibration into the sensor
+    @param options Passed on to captureSweep()
+    @return TMAG5273Calibration
+    """
+    if angle is None:
+        angle = sensor.getAngleEn()
+    if angle not in _ANGLE_PAIRS:
+        raise ValueError("Select the angle pair to calibrate (setAngleEn or angle=)")
+    axes = TMAG5273_CHANNEL_MODE_AXES[sensor.getMagneticChannel()]
+    needed = {TMAG5273_XY_ANGLE_CALCULATION: TMAG5273_AXIS_X | TMAG5273_AXIS_Y,
+              TMAG5273_YZ_ANGLE_CALCULATION: TMAG5273_AXIS_Y | TMAG5273_AXIS_Z,
+              TMAG5273_XZ_ANGLE_CALCULATION: TMAG5273_AXIS_X | TMAG5273_AXIS_Z}[angle]
+    if axes & needed != needed:
+        raise ValueError("The channels of the angle pair are not enabled (setMagneticChannel)")
+    # Put back unless a calibration gets applied: a failed sweep or fit, or
+    # apply=False, leaves the user's corrections and angle pair as they were
+    previous = sensor.getConfigBlock()
+    applied = False
+    try:
+        sensor.configure(angle=angle, gain=0, offset_1=0, offset_2=0)
+        rawSamples = captureSweep(sensor, duration, **options)
+        xyRange, zRange = sensor.getSampleLayout()[3:5]
+        calibration = fitCalibration(rawSamples, angle, xyRange, zRange)
+        if apply:
+            calibration.apply(sensor)
+            applied = True
+    finally:
+        if not applied:
+            sensor.restoreConfig(previous)
+    return calibration
@@ -0,0 +1,133 @@
+# Batch conversion of raw TMAG5273 samples to physical units. With NumPy each
+# channel is converted in one vectorized pass to float32; without it the same
+# formulas run in pure Python and return array('f'). Both compute in double
+# precision and round once to float32, so their results are identical.
+from array import array
+from TMAG5273_RaspberryPi_Library_Defs import *
+from TMAG5273_RaspberryPi_Library import TMAG5273_RESULT_BLOCK
+from TMAG5273_RaspberryPi_Library_Stream import TMAG5273_STREAM_FIELDS
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+if np is not None:
+    # Result registers T_MSB_RESULT (0x10) .. MAGNITUDE_RESULT (0x1B) as laid out on the bus
+    TMAG5273_RESULT_DTYPE = np.dtype([("t", ">u2"), ("x", ">i2"), ("y", ">i2"), ("z", ">i2"),
+                                      ("convStatus", "u1"), ("angle", ">u2"), ("magnitude", "u1")])
+
+
+def fieldScale(rangeMT):
+    """
+    @brief mT per LSB of a magnetic result for the given range (datasheet eq 10)
+    @param rangeMT Axis range in mT (40 or 80)
+    """
+    return rangeMT / 32768
+
+
+def convertField(raw, rangeMT):
+    """
+    @brief Converts raw magnetic results to mT.
+    @param raw Raw results: NumPy int16/uint16 array, or a sequence of ints
+     (unsigned register values are sign extended)
+    @param rangeMT Axis range in mT (40 or 80)
+    @return float32 array
+    """
+    scale = fieldScale(rangeMT)
+    if np is not None and isinstance(raw, np.ndarray):
+        if raw.dtype.kind == "u":
+            raw = raw.astype(np.uint16, copy=False).view(np.int16)
+        return (raw.astype(np.float64) * scale).astype(np.float32)
+    return array("f", [((value - 0x10000) if value >= 0x8000 else value) * scale for value in raw])
+
+
+def convertTemperature(raw):
+    """
+    @brief Converts raw T-Channel results to degrees C.
+    @param raw NumPy integer array or sequence of ints
+    @return float32 array
+    """
+    if np is not None and isinstance(raw, np.ndarray):
+        return (TMAG5273_TSENSE_T0 + (raw.astype(np.float64) - TMAG5273_TADC_T0) / TMAG5273_TADC_RES).astype(np.float32)
+    return array("f", [TMAG5273_TSENSE_T0 + (value - TMAG5273_TADC_T0) / TMAG5273_TADC_RES for value in raw])
+
+
+def convertAngle(raw):
+    """
+    @brief Converts raw ANGLE_RESULT values (9 integer and 4 fractional
+     bits) to degrees.
+    @param raw NumPy integer array or sequence of ints
+    @return float32 array
+    """
+    if np is not None and isinstance(raw, np.ndarray):
+        return ((raw.astype(np.int32) & 0x1FFF) / 16.).astype(np.float32)
+    return array("f", [(value & 0x1FFF) / 16. for value in raw])
+
+
+def convertMagnitude(raw):
+    """
+    @brief Returns raw MAGNITUDE_RESULT values as float32.
+    @param raw NumPy integer array or sequence of ints
+    @return float32 array
+    """
+    if np is not None and isinstance(raw, np.ndarray):
+        return (raw.astype(np.int32) & 0xFF).astype(np.float32)
+    return array("f", [value & 0xFF for value in raw])
+
+
+def splitBlock(block):
+    """
+    @brief Splits a block of samples into raw per-channel columns.
+    @param block NumPy uint8 array of result register bytes (N x 12 or flat),
+     NumPy int16 array of records (N x 7 or flat), bytes-like register data,
+     a flat array('h') of records or a sequence of record tuples
+    @return Dict of raw columns: t, x, y, z, convStatus, angle, magnitude
+    """
+    names = ("t", "x", "y", "z", "convStatus", "angle", "magnitude")
+    if np is not None and isinstance(block, np.ndarray):
+        if block.dtype == np.uint8:
+            records = np.ascontiguousarray(block).reshape(-1).view(TMAG5273_RESULT_DTYPE)
+            return {name: records[name] for name in names}
+        if block.dtype.names is not None:
+            return {name: block[name] for name in names}
+        records = block.reshape(-1, TMAG5273_STREAM_FIELDS)
+        return {name: records[:, column] for column, name in enumerate(names)}
+
+    if isinstance(block, (bytes, bytearray, memoryview)):
+        records = list(TMAG5273_RESULT_BLOCK.iter_unpack(block))
+    elif len(block) and isinstance(block[0], int):
+        records = [tuple(block[offset:offset + TMAG5273_STREAM_FIELDS]) for offset in range(0, len(block), TMAG5273_STREAM_FIELDS)]
+    else:
+        records = block
+    columns = list(zip(*records)) if len(records) else [()] * TMAG5273_STREAM_FIELDS
+    return {name: list(column) for name, column in zip(names, columns)}
+
+
+def convertBlock(block, layout):
+    """
+    @brief Converts a block of raw samples to physical units in one pass per
+     channel, converting only the channels enabled by layout.
+    @param block Raw samples in any form accepted by splitBlock()
+    @param layout Decode configuration as returned by
+     TMAG5273.getSampleLayout(): (channelMode, temperatureEnabled,
+     angleEnabled, xyRange, zRange)
+    @return Dict of float32 arrays with the keys temperature (C), x, y, z (mT),
+     angle (degrees) and magnitude, for the enabled channels only
+    """
+    channelMode, temperatureEnabled, angleEnabled, xyRange, zRange = layout
+    axes = TMAG5273_CHANNEL_MODE_AXES[channelMode]
+    columns = splitBlock(block)
+    result = {}
+    if temperatureEnabled:
+        result["temperature"] = convertTemperature(columns["t"])
+    if axes & TMAG5273_AXIS_X:
+        result["x"] = convertField(columns["x"], xyRange)
+    if axes & TMAG5273_AXIS_Y:
+        result["y"] = convertField(columns["y"], xyRange)
+    if axes & TMAG5273_AXIS_Z:
+        result["z"] = convertField(columns["z"], zRange)
+    if angleEnabled:
+        result["angle"] = convertAngle(columns["angle"])
+        result["magnitude"] = convertMagnitude(columns["magnitude"])
+    return result
@@ -16,7 +16,7 @@ TMAG5273_MAG_TEMP_0P12PCT = 0x1  # 0.12%/deg C (NdBFe)
 TMAG5273_MAG_TEMP_RESERVED = 0x2 # Reserved
 TMAG5273_MAG_TEMP_0P2PCT = 0x3
 
-TMAG5273_CONV_AVG_BITS = 0x1A # Bits 4-2
+TMAG5273_CONV_AVG_BITS = 0x1C # Bits 4-2
 TMAG5273_CONV_AVG_LSB = 2
 TMAG5273_X1_CONVERSION = 0x0  # 1X Average
 TMAG5273_X2_CONVERSION = 0x1  # 2X Average
@@ -25,6 +25,10 @@ TMAG5273_X8_CONVERSION = 0x3  # 8X Average
 TMAG5273_X16_CONVERSION = 0x4 # 16X Average
 TMAG5273_X32_CONVERSION = 0x5 # 32X Average
 
+# Output data rate in kSPS for each conversion average (TMAG5273_X1_CONVERSION .. TMAG5273_X32_CONVERSION)
+TMAG5273_CONV_RATE_1AXIS_KSPS = (20.0, 13.3, 8.0, 4.4, 2.4, 1.2)
+TMAG5273_CONV_RATE_3AXIS_KSPS = (10.0, 5.7, 3.1, 1.6, 0.8, 0.4)
+
 TMAG5273_I2C_READ_MODE_BITS = 0x03 # Bits 1-0
 TMAG5273_I2C_READ_MODE_LSB = 0
 TMAG5273_I2C_MODE_3BYTE = 0x0       # Standard I2C 3-byte read command
@@ -50,6 +54,7 @@ TMAG5273_TRIGGER_MODE_BITS = 0x04 # Bit 2
 TMAG5273_TRIGGER_MODE_LSB = 2
 TMAG5273_TRIGGER_I2C_COMMAND = 0x0 # Triggered by I2C command
 TMAG5273_TRIGGER_INT_SIGNAL = 0x1  # Triggered by INT signal
+TMAG5273_I2C_CONV_TRIGGER_BIT = 0x80 # Register address bit 7: starts a conversion in stand-by mode (I2C command trigger)
 
 TMAG5273_OPERATING_MODE_BITS = 0x03 # Bits 1-0
 TMAG5273_OPERATING_MODE_LSB = 0
@@ -74,6 +79,13 @@ TMAG5273_YXY_ENABLE = 0x9   # YXY Channel enabled
 TMAG5273_YZY_ENABLE = 0xA   # YZY Channel enabled
 TMAG5273_XZX_ENABLE = 0xB   # XZX Channel enabled
 
+# Magnetic axes sampled by each channel mode (bit 0 = X, bit 1 = Y, bit 2 = Z).
+# The pseudo-simultaneous modes (XYX, YXY, YZY, XZX) only produce two axes.
+TMAG5273_AXIS_X = 0x1
+TMAG5273_AXIS_Y = 0x2
+TMAG5273_AXIS_Z = 0x4
+TMAG5273_CHANNEL_MODE_AXES = (0x0, 0x1, 0x2, 0x3, 0x4, 0x5, 0x6, 0x7, 0x3, 0x3, 0x6, 0x5)
+
 TMAG5273_SLEEP_MODE_BITS = 0x0F # Bits 3-0
 TMAG5273_SLEEP_MODE_LSB = 0
 TMAG5273_SLEEP_1MS = 0x0     # 1ms
@@ -90,6 +102,11 @@ TMAG5273_SLEEP_2000MS = 0xA  # 2000ms
 TMAG5273_SLEEP_5000MS = 0xB  # 5000ms
 TMAG5273_SLEEP_20000MS = 0xC # 20000ms
 
+# Sleep time in ms for each sleep setting (TMAG5273_SLEEP_1MS .. TMAG5273_SLEEP_20000MS)
+TMAG5273_SLEEP_TIME_MS = (1, 5, 10, 15, 20, 30, 50, 100, 500, 1000, 2000, 5000, 20000)
+
+TMAG5273_THRESHOLD_COUNT_BITS = 0x40 # Bit 6
+TMAG5273_THRESHOLD_COUNT_LSB = 6
 TMAG5273_THRESHOLD_1 = 0x0 # 1 Threshold crossing
 TMAG5273_THRESHOLD_4 = 0x1 # 4 Threshold crossing
 
@@ -138,6 +155,8 @@ TMAG5273_INTERRUPT_ASSERTED = 0x1     # Interrupt is asserted
 
 TMAG5273_INTERRUPT_PIN_STATE_BITS = 0x20 # Bit 5
 TMAG5273_INTERRUPT_PIN_STATE_LSB = 5
+TMAG5273_INTERRUPT_LATCHED = 0x0 # INT stays asserted until the device is addressed
+TMAG5273_INTERRUPT_PULSED = 0x1  # INT is a 10us pulse
 
 TMAG5273_INTERRUPT_MODE_BITS = 0x1C # Bits 4-2
 TMAG5273_INTERRUPT_MODE_LSB = 2
@@ -158,7 +177,7 @@ TMAG5273_INT_PIN_DISABLE = 0x1 # INT pin is disabled (for wake-up and trigger fu
 TMAG5273_I2C_ADDRESS_BITS = 0xFE # Bits 7-1
 TMAG5273_I2C_ADDRESS_LSB = 1
 
-TMAG5273_I2C_ADDRESS_CHANGE_BITS = 0x00 # Bit 0
+TMAG5273_I2C_ADDRESS_CHANGE_BITS = 0x01 # Bit 0
 TMAG5273_I2C_ADDRESS_CHANGE_LSB = 0
 TMAG5273_I2C_ADDRESS_CHANGE_DISABLE = 0x0 # Disable update of I2C address
 TMAG5273_I2C_ADDRESS_CHANGE_ENABLE = 0x1  # Enable update of I2C address
@@ -0,0 +1,254 @@
+# Rotary encoder on top of the sensor's angle calculation. A TMAG5273Stream
+# collects ANGLE_RESULT (and MAGNITUDE_RESULT) bursts on its reader thread;
+# process() turns each chunk into a continuous position, revolution count,
+# speed and acceleration in a few array operations, so the consumer keeps up
+# with the conversion rate. The per-sample work on the reader thread is one
+# short bus transaction.
+import math
+import time
+from array import array
+from collections import namedtuple
+from TMAG5273_RaspberryPi_Library_Defs import *
+from TMAG5273_RaspberryPi_Library_Stream import TMAG5273Stream, TMAG5273_STREAM_FIELDS
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Magnitudes below this, in mT, mark a sample unreliable by default
+TMAG5273_ENCODER_MIN_MAGNITUDE = 2.0
+
+# Samples spanned by the speed and acceleration estimates by default
+TMAG5273_ENCODER_WINDOW = 8
+
+# One processed chunk. Every field is an array with one entry per sample
+# (NumPy arrays, or array('d')/array('b') without NumPy):
+# timestamp     time.monotonic() of the read in seconds
+# angle         angle in degrees, 0 to 360
+# position      continuous angle in degrees since reset(); counts on over revolutions
+# revolutions   whole revolutions since reset(), negative when turning backwards
+# rpm           speed in revolutions per minute over the last window samples
+# acceleration  change of rpm per second over the last window samples
+# magnitude     magnitude in mT, NaN when not read
+# reliable      False where the magnitude is below minMagnitude; those angles
+#               are not used and the position holds its last reliable value
+TMAG5273EncoderData = namedtuple("TMAG5273EncoderData", ["timestamp", "angle", "position", "revolutions", "rpm",
+                                                         "acceleration", "magnitude", "reliable"])
+
+
+class TMAG5273Encoder:
+    """
+    Contactless shaft encoder. The sensor must have an angle calculation
+    enabled (setAngleEn) with the channels of the pair; a short conversion
+    averaging keeps the rate up (see planAcquisition()).
+
+    Without an interrupt line every read is one burst of CONV_STATUS,
+    ANGLE_RESULT and MAGNITUDE_RESULT (readAngleRawWhenReady), 3 or 4 bytes.
+    With a GpioEventLine on INT the sensor announces each conversion and the
+    read drops CONV_STATUS: 2 or 3 bytes (readAngleRaw).
+
+    Unwrapping assumes the shaft turns less than half a revolution between
+    two samples.
+    """
+
+    def __init__(self, sensor, magnitude=True, minMagnitude=TMAG5273_ENCODER_MIN_MAGNITUDE,
+                 window=TMAG5273_ENCODER_WINDOW, line=None, capacity=1 << 14, timeout=1.0):
+        """
+        @param sensor TMAG5273 driver with an angle calculation enabled
+        @param magnitude Read MAGNITUDE_RESULT and flag weak samples. The
+         axes of a YZ or XZ angle pair must then have the same range.
+        @param minMagnitude Magnitude in mT below which a sample is unreliable
+        @param window Samples spanned by the speed and acceleration estimates
+        @param line GpioEventLine on the INT pin; result interrupts are
+         enabled on the sensor (see TMAG5273InterruptReader)
+        @param capacity Samples the stream buffers between reads
+        @param timeout Wait for one conversion in seconds
+        """
+        angle = sensor.getAngleEn()
+        if angle == TMAG5273_NO_ANGLE_CALCULATION:
+            raise ValueError("The encoder needs an angle calculation (setAngleEn)")
+        if window < 1:
+            raise ValueError(f"Invalid window: {window}")
+        self.sensor = sensor
+        self.magnitude = magnitude
+        self.minMagnitude = minMagnitude
+        self.window = window
+        self.line = line
+        # MAGNITUDE_RESULT holds the upper 8 bits of the 16-bit magnitude code,
+        # in the range of the two axes of the angle pair
+        xyRange, zRange = sensor.getSampleLayout()[3:5]
+        pairRange = xyRange if angle == TMAG5273_XY_ANGLE_CALCULATION else zRange
+        if magnitude and pairRange != xyRange:
+            raise ValueError("The magnitude needs the same range on both axes of the angle pair (setXYAxisRange, setZAxisRange)")
+        self._magnitudeScale = 256 * pairRange / 32768
+        if line is not None:
+            sensor.enableInterrupt(result=True)
+            sensor.readAngleRaw(magnitude)
+            line.wait(0)
+        self.stream = TMAG5273Stream(sensor, capacity, timeout=timeout, reader=self._read)
+        self._samples = array("h", bytes(2 * TMAG5273_STREAM_FIELDS * capacity))
+        self._timestamps = array("d", bytes(8 * capacity))
+        self.reset()
+
+    def _read(self, timeout):
+        """Stream reader: one angle burst as a raw sample tuple"""
+        if self.line is None:
+            result = self.sensor.readAngleRawWhenReady(timeout, self.magnitude)
+            if result is None:
+                return None
+            return (0, 0, 0, 0) + result
+        if not self.line.wait(timeout):
+            return None
+        angle, magnitude = self.sensor.readAngleRaw(self.magnitude)
+        return (0, 0, 0, 0, 0, angle, magnitude)
+
+    def reset(self, position=0.0):
+        """
+        @brief Sets the current position in degrees and clears the speed history.
+        """
+        self._offset = position
+        self._lastAngle = None
+        self._unwrapped = 0.0
+        self._positions = []   # last window positions and their timestamps
+        self._times = []
+        self._speeds = []      # last window speeds (rpm) and their timestamps
+        self._speedTimes = []
+
+    @property
+    def position(self):
+        """Continuous position in degrees after the last processed sample"""
+        return self._offset + self._unwrapped
+
+    @property
+    def revolutions(self):
+        return math.floor(self.position / 360)
+
+    def start(self):
+        self.stream.start()
+
+    def stop(self):
+        self.stream.stop()
+
+    def close(self):
+        """
+        @brief Stops the stream and switches the result interrupt off if a
+         line was used.
+        """
+        self.stream.stop()
+        if self.line is not None:
+            self.sensor.disableInterrupt()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def read(self, n=1024, timeout=None):
+        """
+        @brief Takes up to n buffered samples from the stream and processes
+         them, waiting for at least one.
+        @param timeout Maximum wait in seconds, None waits while the stream runs
+        @return TMAG5273EncoderData, empty on timeout
+        """
+        n = min(n, len(self._timestamps))
+        count = self.stream.readInto(self._samples, memoryview(self._timestamps)[:n], timeout)
+        samples = self._samples[:count * TMAG5273_STREAM_FIELDS]
+        angles = samples[5::TMAG5273_STREAM_FIELDS]
+        magnitudes = samples[6::TMAG5273_STREAM_FIELDS] if self.magnitude else None
+        return self.process(angles, magnitudes, self._timestamps[:count])
+
+    def process(self, angles, magnitudes, timestamps):
+        """
+        @brief Processes a chunk of raw ANGLE_RESULT and MAGNITUDE_RESULT
+         values, continuing from the previous chunk. Works on any source of
+         raw values, e.g. a recording.
+        @param angles Raw angle register values (1/16 degree)
+        @param magnitudes Raw magnitude register values, or None
+        @param timestamps Sample times in seconds
+        @return TMAG5273EncoderData
+        """
+        if np is not None:
+            return self._processVectorized(angles, magnitudes, timestamps)
+        return self._processPython(angles, magnitudes, timestamps)
+
+    def _processVectorized(self, angles, magnitudes, timestamps):
+        angle = (np.asarray(angles, dtype=np.float64) % 5760) / 16
+        timestamp = np.asarray(timestamps, dtype=np.float64)
+        if magnitudes is not None:
+            magnitude = np.asarray(magnitudes, dtype=np.float64) * self._magnitudeScale
+            reliable = magnitude >= self.minMagnitude
+        else:
+            magnitude = np.full(len(angle), np.nan)
+            reliable = np.ones(len(angle), dtype=bool)
+
+        # Unreliable samples repeat the last reliable angle, so they do not move the position
+        held = np.where(reliable, angle, np.nan)
+        previous = np.nan if self._lastAngle is None else self._lastAngle
+        held = np.concatenate(([previous], held))
+        filled = np.where(np.isnan(held), 0, np.arange(len(held)))
+        held = held[np.maximum.accumulate(filled)]
+        steps = np.diff(held)
+        steps = (steps + 180) % 360 - 180
+        steps[np.isnan(steps)] = 0
+        unwrapped = self._unwrapped + np.cumsum(steps)
+        if len(held) > 1 and not np.isnan(held[-1]):
+            self._lastAngle = float(held[-1])
+        if len(unwrapped):
+            self._unwrapped = float(unwrapped[-1])
+        position = self._offset + unwrapped
+
+        rpm = self._difference(position, timestamp, self._positions, self._times) / 6
+        acceleration = self._difference(rpm, timestamp, self._speeds, self._speedTimes)
+        return TMAG5273EncoderData(timestamp, angle, position, np.floor(position / 360).astype(np.int64), rpm,
+                                   acceleration, magnitude, reliable)
+
+    def _difference(self, values, timestamps, historyValues, historyTimes):
+        """Rate of change of values over the last window samples, using and
+        updating the history carried over from the previous chunk"""
+        allValues = np.concatenate((historyValues, values))
+        allTimes = np.concatenate((historyTimes, timestamps))
+        current = np.arange(len(historyValues), len(allValues))
+        earlier = np.maximum(current - self.window, 0)
+        elapsed = allTimes[current] - allTimes[earlier]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rate = np.where(elapsed > 0, (allValues[current] - allValues[earlier]) / elapsed, np.nan)
+        historyValues[:] = allValues[-self.window:].tolist()
+        historyTimes[:] = allTimes[-self.window:].tolist()
+        return rate
+
+    def _processPython(self, angles, magnitudes, timestamps):
+        count = len(timestamps)
+        result = TMAG5273EncoderData(array("d", timestamps), array("d"), array("d"), array("q"), array("d"),
+                                     array("d"), array("d"), array("b"))
+        for index in range(count):
+            angle = (angles[index] % 5760) / 16
+            magnitude = magnitudes[index] * self._magnitudeScale if magnitudes is not None else math.nan
+            reliable = magnitudes is None or magnitude >= self.minMagnitude
+            if reliable:
+                if self._lastAngle is not None:
+                    self._unwrapped += (angle - self._lastAngle + 180) % 360 - 180
+                self._lastAngle = angle
+            position = self._offset + self._unwrapped
+            rpm = self._step(position, timestamps[index], self._positions, self._times) / 6
+            result.angle.append(angle)
+            result.position.append(position)
+            result.revolutions.append(math.floor(position / 360))
+            result.rpm.append(rpm)
+            result.acceleration.append(self._step(rpm, timestamps[index], self._speeds, self._speedTimes))
+            result.magnitude.append(magnitude)
+            result.reliable.append(reliable)
+        return result
+
+    def _step(self, value, timestamp, historyValues, historyTimes):
+        """_difference() for a single sample"""
+        historyValues.append(value)
+        historyTimes.append(timestamp)
+        earlier = max(len(historyValues) - 1 - self.window, 0)
+        elapsed = timestamp - historyTimes[earlier]
+        rate = (value - historyValues[earlier]) / elapsed if elapsed > 0 else math.nan
+        del historyValues[:-self.window]
+        del historyTimes[:-self.window]
+        return rate
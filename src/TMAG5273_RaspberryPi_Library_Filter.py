@@ -0,0 +1,324 @@
+# Chunked filter pipeline for TMAG5273 samples. A chunk is a dict of NumPy
+# arrays, one per channel ("x", "y", "z", "temperature", "angle",
+# "magnitude", "timestamp", ...), as produced by convertBlock(). Every stage
+# processes a whole chunk with array operations and keeps only the few
+# samples of history it needs between chunks, so a pipeline runs
+# continuously at the full sensor rate in bounded memory:
+#
+#   pipeline = TMAG5273Pipeline(ConvertStage(sensor.getSampleLayout()), EMAStage(0.1), DecimateStage(10))
+#   for chunk in pipeline.run(iterChunks(stream)):
+#       ...
+import math
+from TMAG5273_RaspberryPi_Library_Convert import convertBlock
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Channels the stages filter when no channels are given
+TMAG5273_FILTER_CHANNELS = ("x", "y", "z", "temperature", "angle", "magnitude")
+
+
+def iterChunks(stream, n=1024, timeout=None):
+    """
+    @brief Yields (samples, timestamps) chunks of up to n samples from a
+     TMAG5273Stream until it is stopped and drained.
+    """
+    while True:
+        samples, timestamps = stream.readChunk(n, timeout)
+        if not len(timestamps):
+            if not stream.running:
+                return
+            continue
+        yield samples, timestamps
+
+
+class TMAG5273FilterStage:
+    """
+    Base class of the pipeline stages. process() takes a chunk and returns
+    the processed chunk; reset() forgets the state carried between chunks.
+    """
+
+    def __init__(self, channels=None):
+        """
+        @param channels Names of the channels to process, None for every
+         channel of TMAG5273_FILTER_CHANNELS present in the chunk
+        """
+        if np is None:
+            raise ImportError("The filter stages need NumPy")
+        self.channels = channels
+        self.reset()
+
+    def _channels(self, chunk):
+        if self.channels is not None:
+            return [name for name in self.channels if name in chunk]
+        return [name for name in TMAG5273_FILTER_CHANNELS if name in chunk]
+
+    def reset(self):
+        pass
+
+    def process(self, chunk):
+        raise NotImplementedError
+
+    def __call__(self, chunk):
+        return self.process(chunk)
+
+
+class ConvertStage(TMAG5273FilterStage):
+    """
+    Converts raw sample blocks to a chunk of physical values with
+    convertBlock(). Accepts (samples, timestamps) tuples from
+    TMAG5273Stream.readChunk() or iterChunks(), NumPy raw or record arrays
+    and recording blocks; timestamps become the "timestamp" channel.
+    """
+
+    def __init__(self, layout):
+        """
+        @param layout Decode configuration from TMAG5273.getSampleLayout()
+        """
+        self.layout = layout
+        super().__init__()
+
+    def process(self, block):
+        timestamps = None
+        if isinstance(block, tuple):
+            block, timestamps = block
+        if not isinstance(block, np.ndarray):
+            # array('h') from the stream: view it instead of converting sample by sample
+            block = np.frombuffer(block, dtype=np.int16)
+        chunk = convertBlock(block, self.layout)
+        if timestamps is not None:
+            chunk["timestamp"] = np.frombuffer(timestamps, dtype=np.float64) if not isinstance(timestamps, np.ndarray) else timestamps
+        elif block.dtype.names is not None and "timestamp" in block.dtype.names:
+            chunk["timestamp"] = block["timestamp"] / 1e9
+        return chunk
+
+
+class DecimateStage(TMAG5273FilterStage):
+    """
+    Keeps one sample out of factor, or with average the mean of each group
+    of factor samples (a boxcar anti-alias filter). Groups continue across
+    chunks. Applies to every channel, timestamps included.
+    """
+
+    def __init__(self, factor, average=True):
+        if factor < 1:
+            raise ValueError(f"Invalid factor: {factor}")
+        self.factor = int(factor)
+        self.average = average
+        super().__init__()
+
+    def reset(self):
+        self._pending = {}  # channel -> samples of the incomplete group
+
+    def process(self, chunk):
+        result = {}
+        for name, values in chunk.items():
+            values = np.asarray(values)
+            pending = self._pending.get(name)
+            if pending is not None and len(pending):
+                values = np.concatenate((pending, values))
+            complete = len(values) - len(values) % self.factor
+            self._pending[name] = values[complete:].copy()
+            groups = values[:complete].reshape(-1, self.factor)
+            result[name] = groups.mean(axis=1).astype(values.dtype, copy=False) if self.average else groups[:, -1]
+        return result
+
+
+class EMAStage(TMAG5273FilterStage):
+    """
+    Exponential moving average y[n] = y[n-1] + alpha * (x[n] - y[n-1]),
+    evaluated in closed form over runs of samples instead of one sample at
+    a time. The average starts at the first sample.
+    """
+
+    def __init__(self, alpha, channels=None):
+        """
+        @param alpha Smoothing factor, 0 < alpha <= 1 (1 passes the input
+         through). For a time constant tau at sample rate fs use
+         alpha = 1 - exp(-1 / (tau * fs)).
+        """
+        if not 0 < alpha <= 1:
+            raise ValueError(f"Invalid alpha: {alpha}")
+        self.alpha = alpha
+        decay = 1 - alpha
+        # Runs are short enough that decay**-n stays below 1e6, keeping ten
+        # significant digits in the running sum
+        self._run = max(int(math.log(1e-6) / math.log(decay)), 1) if decay > 0 else 1
+        if decay > 0:
+            self._powers = decay ** np.arange(self._run + 1, dtype=np.float64)
+        super().__init__(channels)
+
+    def reset(self):
+        self._state = {}  # channel -> last output
+
+    def process(self, chunk):
+        result = dict(chunk)
+        if self.alpha == 1:
+            return result
+        for name in self._channels(chunk):
+            values = np.asarray(chunk[name], dtype=np.float64)
+            if not len(values):
+                continue
+            output = np.empty_like(values)
+            previous = self._state.get(name, values[0])
+            for start in range(0, len(values), self._run):
+                run = values[start:start + self._run]
+                powers = self._powers[:len(run)]
+                # y[j] = decay^(j+1) * y[-1] + alpha * decay^j * sum(x[k] / decay^k, k <= j)
+                output[start:start + len(run)] = (self._powers[1:len(run) + 1] * previous +
+                                                  self.alpha * powers * np.cumsum(run / powers))
+                previous = output[start + len(run) - 1]
+            self._state[name] = previous
+            result[name] = output.astype(np.asarray(chunk[name]).dtype, copy=False)
+        return result
+
+
+class MedianStage(TMAG5273FilterStage):
+    """
+    Sliding median over the last window samples, one output per input, for
+    removing spikes. The history before the first sample is filled with the
+    first sample.
+    """
+
+    def __init__(self, window, channels=None):
+        if window < 1:
+            raise ValueError(f"Invalid window: {window}")
+        self.window = int(window)
+        super().__init__(channels)
+
+    def reset(self):
+        self._history = {}  # channel -> last window - 1 samples
+
+    def process(self, chunk):
+        result = dict(chunk)
+        for name in self._channels(chunk):
+            values = np.asarray(chunk[name])
+            if not len(values) or self.window == 1:
+                continue
+            history = self._history.get(name)
+            if history is None:
+                history = np.full(self.window - 1, values[0], dtype=values.dtype)
+            extended = np.concatenate((history, values))
+            windows = np.lib.stride_tricks.sliding_window_view(extended, self.window)
+            result[name] = np.median(windows, axis=1).astype(values.dtype, copy=False)
+            self._history[name] = extended[-(self.window - 1):].copy()
+        return result
+
+
+class RMSStage(TMAG5273FilterStage):
+    """
+    Windowed RMS and peak (largest absolute value) over the last window
+    samples, added to the chunk as "<channel>_rms" and "<channel>_peak".
+    Outputs before window samples have been seen cover the samples so far.
+    An empty chunk gets empty "<channel>_rms" and "<channel>_peak" arrays,
+    so every output chunk has the same channels.
+    """
+
+    def __init__(self, window, channels=None, peak=True):
+        if window < 1:
+            raise ValueError(f"Invalid window: {window}")
+        self.window = int(window)
+        self.peak = peak
+        super().__init__(channels)
+
+    def reset(self):
+        self._history = {}  # channel -> last window - 1 samples
+
+    def process(self, chunk):
+        result = dict(chunk)
+        for name in self._channels(chunk):
+            values = np.asarray(chunk[name], dtype=np.float64)
+            if not len(values):
+                result[name + "_rms"] = values
+                if self.peak:
+                    result[name + "_peak"] = values
+                continue
+            history = self._history.get(name, np.empty(0))
+            extended = np.concatenate((history, values))
+            start = len(history)
+            squares = np.concatenate(([0.0], np.cumsum(extended * extended)))
+            ends = np.arange(start + 1, len(extended) + 1)
+            begins = np.maximum(ends - self.window, 0)
+            result[name + "_rms"] = np.sqrt(np.maximum(squares[ends] - squares[begins], 0) / (ends - begins))
+            if self.peak:
+                # Zeros stand in for the samples before the first one
+                padded = np.concatenate((np.zeros(self.window - 1 - start), np.abs(extended)))
+                result[name + "_peak"] = np.lib.stride_tricks.sliding_window_view(padded, self.window).max(axis=1)
+            self._history[name] = extended[-(self.window - 1):].copy() if self.window > 1 else np.empty(0)
+        return result
+
+
+class MagnitudeStage(TMAG5273FilterStage):
+    """
+    Field magnitude sqrt(x^2 + y^2 + z^2) of the axes present in the chunk,
+    added as the channel name (default "field").
+    """
+
+    def __init__(self, channels=("x", "y", "z"), name="field"):
+        self.name = name
+        super().__init__(channels)
+
+    def process(self, chunk):
+        result = dict(chunk)
+        axes = self._channels(chunk)
+        if axes:
+            total = sum(np.asarray(chunk[axis], dtype=np.float64) ** 2 for axis in axes)
+            result[self.name] = np.sqrt(total).astype(np.float32)
+        return result
+
+
+class AngleStage(TMAG5273FilterStage):
+    """
+    Host-side angle atan2(second, first) in degrees, 0 to 360, added as
+    the channel name (default "host_angle"). Works on filtered axes, where
+    the sensor's own ANGLE_RESULT cannot.
+    """
+
+    def __init__(self, first="x", second="y", name="host_angle"):
+        self.first = first
+        self.second = second
+        self.name = name
+        super().__init__((first, second))
+
+    def process(self, chunk):
+        result = dict(chunk)
+        if self.first in chunk and self.second in chunk:
+            angle = np.degrees(np.arctan2(np.asarray(chunk[self.second], dtype=np.float64),
+                                          np.asarray(chunk[self.first], dtype=np.float64))) % 360
+            result[self.name] = angle.astype(np.float32)
+        return result
+
+
+class TMAG5273Pipeline:
+    """
+    Runs stages one after the other on each chunk.
+    """
+
+    def __init__(self, *stages):
+        if np is None:
+            raise ImportError("The filter pipeline needs NumPy")
+        self.stages = list(stages)
+
+    def process(self, chunk):
+        for stage in self.stages:
+            chunk = stage.process(chunk)
+        return chunk
+
+    def run(self, chunks):
+        """
+        @brief Generator applying the pipeline to every chunk of chunks,
+         skipping chunks that come out empty (e.g. while decimating).
+        """
+        for chunk in chunks:
+            chunk = self.process(chunk)
+            if any(len(values) for values in chunk.values()):
+                yield chunk
+
+    def reset(self):
+        for stage in self.stages:
+            stage.reset()
+
+    def __call__(self, chunk):
+        return self.process(chunk)
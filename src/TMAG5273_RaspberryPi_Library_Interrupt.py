@@ -0,0 +1,202 @@
+import fcntl
+import os
+import select
+import struct
+import time
+from TMAG5273_RaspberryPi_Library_Defs import *
+
+# Linux GPIO character device uAPI v2 (linux/gpio.h)
+GPIO_V2_LINES_MAX = 64
+GPIO_V2_LINE_FLAG_ACTIVE_LOW = 1 << 1
+GPIO_V2_LINE_FLAG_INPUT = 1 << 2
+GPIO_V2_LINE_FLAG_EDGE_RISING = 1 << 4
+GPIO_V2_LINE_FLAG_EDGE_FALLING = 1 << 5
+GPIO_V2_LINE_FLAG_BIAS_PULL_UP = 1 << 8
+GPIO_V2_LINE_FLAG_BIAS_PULL_DOWN = 1 << 9
+GPIO_V2_LINE_FLAG_BIAS_DISABLED = 1 << 10
+GPIO_V2_LINE_EVENT_RISING_EDGE = 1
+GPIO_V2_LINE_EVENT_FALLING_EDGE = 2
+
+# struct gpio_v2_line_request: offsets[64], consumer[32], gpio_v2_line_config
+# (flags, num_attrs, padding[5], attrs[10] of 24 bytes), num_lines,
+# event_buffer_size, padding[5], fd
+_LINE_REQUEST = struct.Struct("=64I32sQI5I240xII5Ii")
+_LINE_REQUEST_FD_OFFSET = _LINE_REQUEST.size - 4
+# _IOWR(0xB4, 0x07, struct gpio_v2_line_request)
+GPIO_V2_GET_LINE_IOCTL = (3 << 30) | (_LINE_REQUEST.size << 16) | (0xB4 << 8) | 0x07
+
+# struct gpio_v2_line_event: timestamp_ns, id, offset, seqno, line_seqno, padding[6]
+_LINE_EVENT = struct.Struct("=QIIII24x")
+
+# Events read from the line per system call
+_EVENT_BATCH = 16
+
+
+class GpioEventLine:
+    """
+    Edge events from a file descriptor delivering struct gpio_v2_line_event
+    records, waited for with epoll. Subclasses provide the descriptor: a
+    real GPIO line (GpioChipLine) or a pipe for tests (FakeGpioLine).
+    """
+
+    def __init__(self, fd):
+        self._fd = fd
+        self._epoll = select.epoll()
+        self._epoll.register(fd, select.EPOLLIN)
+
+    def fileno(self):
+        return self._fd
+
+    def wait(self, timeout=None):
+        """
+        @brief Blocks in epoll until at least one edge arrives and returns all
+         pending events.
+        @param timeout Maximum wait in seconds, None waits forever
+        @return List of (timestamp_ns, event id) tuples, empty on timeout.
+         Timestamps are CLOCK_MONOTONIC nanoseconds (time.monotonic_ns()).
+        """
+        if not self._epoll.poll(-1 if timeout is None else max(timeout, 0)):
+            return []
+        data = os.read(self._fd, _LINE_EVENT.size * _EVENT_BATCH)
+        return [(timestampNs, eventId) for timestampNs, eventId, offset, seqno, lineSeqno in _LINE_EVENT.iter_unpack(data)]
+
+    def close(self):
+        if self._fd is not None:
+            self._epoll.close()
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class GpioChipLine(GpioEventLine):
+    """
+    One input line of a /dev/gpiochipN with edge detection, requested through
+    the GPIO uAPI v2 (GPIO_V2_GET_LINE_IOCTL). Works with gpio-sim lines too.
+    """
+
+    def __init__(self, chip="/dev/gpiochip0", offset=4, edge=GPIO_V2_LINE_FLAG_EDGE_FALLING,
+                 bias=GPIO_V2_LINE_FLAG_BIAS_PULL_UP, consumer="TMAG5273", eventBufferSize=0):
+        """
+        @param chip Path of the GPIO chip device
+        @param offset Line offset on the chip (the BCM GPIO number on a Raspberry Pi)
+        @param edge GPIO_V2_LINE_FLAG_EDGE_FALLING (INT is active low),
+         GPIO_V2_LINE_FLAG_EDGE_RISING or both
+        @param bias GPIO_V2_LINE_FLAG_BIAS_PULL_UP, _PULL_DOWN, _DISABLED or 0
+        @param consumer Label shown by gpioinfo
+        @param eventBufferSize Kernel event queue length, 0 for the default
+        """
+        offsets = [0] * GPIO_V2_LINES_MAX
+        offsets[0] = offset
+        request = bytearray(_LINE_REQUEST.pack(*offsets, consumer.encode()[:31], GPIO_V2_LINE_FLAG_INPUT | edge | bias,
+                                               0, 0, 0, 0, 0, 0, 1, eventBufferSize, 0, 0, 0, 0, 0, -1))
+        chipFd = os.open(chip, os.O_RDWR | os.O_CLOEXEC)
+        try:
+            fcntl.ioctl(chipFd, GPIO_V2_GET_LINE_IOCTL, request)
+        finally:
+            os.close(chipFd)
+        self.chip = chip
+        self.offset = offset
+        super().__init__(struct.unpack_from("=i", request, _LINE_REQUEST_FD_OFFSET)[0])
+
+
+class FakeGpioLine(GpioEventLine):
+    """
+    Line for tests without GPIO hardware: events written by trigger() go
+    through a pipe and are received with the same epoll path as a real line.
+    """
+
+    def __init__(self):
+        self._writeFd = None
+        readFd, self._writeFd = os.pipe()
+        super().__init__(readFd)
+
+    def trigger(self, eventId=GPIO_V2_LINE_EVENT_FALLING_EDGE, timestampNs=None):
+        """Queues one edge event"""
+        if timestampNs is None:
+            timestampNs = time.monotonic_ns()
+        os.write(self._writeFd, _LINE_EVENT.pack(timestampNs, eventId, 0, 0, 0))
+
+    def connect(self, device):
+        """
+        @brief Drives the line from the interrupts of a SimulatedTMAG5273.
+         Start the device (device.start()) so it converts in real time.
+        """
+        device.interruptHandlers.append(lambda source, t: self.trigger())
+
+    def close(self):
+        super().close()
+        if self._writeFd is not None:
+            os.close(self._writeFd)
+            self._writeFd = None
+
+
+class TMAG5273InterruptReader:
+    """
+    Interrupt driven acquisition: the sensor signals each new conversion
+    (or threshold crossing) on its INT pin, the reader sleeps in epoll on the
+    GPIO line and burst-reads the sensor only after an edge. There is no I2C
+    polling; every transaction returns new data.
+    """
+
+    def __init__(self, sensor, line, result=True, threshold=False, intMode=TMAG5273_INTERRUPT_THROUGH_INT):
+        """
+        @brief Configures INT_CONFIG_1 and clears a pending interrupt.
+        @param sensor TMAG5273 driver
+        @param line GpioEventLine connected to the sensor's INT pin
+        @param result Interrupt on every completed conversion
+        @param threshold Interrupt on threshold crossings (see armWakeUpAndSleep())
+        @param intMode TMAG5273_INTERRUPT_THROUGH_INT or TMAG5273_INTERRUPT_THROUGH_INT_I2C
+        """
+        self.sensor = sensor
+        self.line = line
+        sensor.enableInterrupt(result, threshold, intMode)
+        # INT is latched until the sensor is addressed: read once so the next
+        # conversion produces a fresh edge
+        sensor.readRawSample()
+        self.line.wait(0)
+
+    def readRaw(self, timeout=1.0):
+        """
+        @brief Waits for the next interrupt and burst-reads the sensor.
+        @param timeout Maximum wait in seconds, None waits forever
+        @return (timestamp_ns, raw sample tuple), the kernel timestamp of the
+         edge in time.monotonic_ns() time, or None on timeout
+        """
+        events = self.line.wait(timeout)
+        if not events:
+            return None
+        return events[-1][0], self.sensor.readRawSample()
+
+    def read(self, timeout=1.0):
+        """
+        @brief readRaw() decoded
+        @return (timestamp_ns, TMAG5273Sample), or None on timeout
+        """
+        result = self.readRaw(timeout)
+        if result is None:
+            return None
+        return result[0], self.sensor.decodeSample(result[1])
+
+    def __iter__(self):
+        """Yields (timestamp_ns, raw sample) for every interrupt"""
+        while True:
+            result = self.readRaw(None)
+            if result is not None:
+                yield result
+
+    def close(self):
+        """
+        @brief Switches the sensor's interrupt off. The line is left open.
+        """
+        self.sensor.disableInterrupt()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
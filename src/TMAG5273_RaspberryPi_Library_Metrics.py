@@ -0,0 +1,237 @@
+import bisect
+import math
+import threading
+import time
+from TMAG5273_RaspberryPi_Library_Transport import TMAG5273Transport
+
+# Upper bounds in seconds of the bus latency histogram buckets
+TMAG5273_METRICS_LATENCY_BUCKETS = (50e-6, 100e-6, 200e-6, 500e-6, 1e-3, 2e-3, 5e-3, 10e-3, 50e-3, math.inf)
+
+
+class TMAG5273Metrics:
+    """
+    Collects bus metrics for one or more TMAG5273 drivers: transactions and
+    errors per operation, accesses per register, bytes in each direction, a
+    latency histogram per operation, the CRC error and retry counters and
+    the time since the last fresh conversion.
+
+    Attach it with TMAG5273.enableMetrics(). Only the drivers it is attached
+    to pay for it; disableMetrics() restores the plain transport, so a
+    driver without metrics runs exactly the uninstrumented code.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sensors = []
+        self._hooks = []
+        self.reset()
+
+    def reset(self):
+        """Clears all counters and histograms"""
+        with self._lock:
+            self._operations = {}  # (address, op) -> [count, errors, latency sum, bucket counts]
+            self._registers = {}   # (address, op, register) -> count
+            self._bytes = {}       # (address, "read" or "written") -> count
+
+    def addSensor(self, sensor):
+        if sensor not in self._sensors:
+            self._sensors.append(sensor)
+
+    def removeSensor(self, sensor):
+        if sensor in self._sensors:
+            self._sensors.remove(sensor)
+
+    def addHook(self, hook):
+        """
+        @brief Calls hook(address, op, register, length, duration, error) after
+         every bus operation. register is None for reads without a register
+         address phase, error is the OSError raised or None. Hooks run on the
+         thread doing the I2C access and should return quickly.
+        """
+        self._hooks.append(hook)
+
+    def removeHook(self, hook):
+        self._hooks.remove(hook)
+
+    def record(self, address, op, register, written, read, duration, error=None):
+        """
+        @brief Accounts one bus operation.
+        @param written Bytes written, including the register address
+        @param read Bytes read
+        @param duration Time spent in the transport in seconds
+        @param error OSError raised by the transport, or None
+        """
+        with self._lock:
+            operation = self._operations.get((address, op))
+            if operation is None:
+                operation = self._operations[(address, op)] = [0, 0, 0.0, [0] * len(TMAG5273_METRICS_LATENCY_BUCKETS)]
+            operation[0] += 1
+            operation[2] += duration
+            operation[3][bisect.bisect_left(TMAG5273_METRICS_LATENCY_BUCKETS, duration)] += 1
+            if error is not None:
+                operation[1] += 1
+            else:
+                self._bytes[(address, "read")] = self._bytes.get((address, "read"), 0) + read
+                self._bytes[(address, "written")] = self._bytes.get((address, "written"), 0) + written
+            key = (address, op, register)
+            self._registers[key] = self._registers.get(key, 0) + 1
+        for hook in self._hooks:
+            hook(address, op, register, read if read else written, duration, error)
+
+    def snapshot(self):
+        """
+        @brief Returns the current metrics as a plain dict, keyed by sensor
+         address ("0x22"):
+            transactions, errors: {op: count}
+            bytes_read, bytes_written: byte counts
+            registers: {op: {"0x10": count}} ("direct" for plain reads)
+            latency: {op: {"count", "sum", "buckets": {upper bound: cumulative count}}}
+            crc_errors, crc_failures: CRC counters of the attached driver
+            seconds_since_fresh_conversion: None before the first new conversion
+        """
+        with self._lock:
+            operations = {key: (value[0], value[1], value[2], list(value[3])) for key, value in self._operations.items()}
+            registers = dict(self._registers)
+            byteCounts = dict(self._bytes)
+
+        result = {}
+
+        def entry(address):
+            name = hex(address)
+            if name not in result:
+                result[name] = {"transactions": {}, "errors": {}, "bytes_read": 0, "bytes_written": 0,
+                                "registers": {}, "latency": {}}
+            return result[name]
+
+        for (address, op), (count, errors, latencySum, buckets) in operations.items():
+            sensor = entry(address)
+            sensor["transactions"][op] = count
+            sensor["errors"][op] = errors
+            cumulative = 0
+            histogram = {}
+            for bound, bucketCount in zip(TMAG5273_METRICS_LATENCY_BUCKETS, buckets):
+                cumulative += bucketCount
+                histogram[bound] = cumulative
+            sensor["latency"][op] = {"count": count, "sum": latencySum, "buckets": histogram}
+        for (address, op, register), count in registers.items():
+            entry(address)["registers"].setdefault(op, {})["direct" if register is None else hex(register)] = count
+        for (address, direction), count in byteCounts.items():
+            entry(address)["bytes_" + direction] = count
+
+        for sensor in list(self._sensors):
+            values = entry(sensor.address)
+            values["crc_errors"] = sensor.crcErrorCount
+            values["crc_failures"] = sensor.crcFailureCount
+            values["por_recoveries"] = sensor.porRecoveryCount
+            values["seconds_since_fresh_conversion"] = sensor.secondsSinceFreshConversion()
+        return result
+
+    def prometheus(self, prefix="tmag5273"):
+        """
+        @brief Returns the metrics in the Prometheus text exposition format.
+        @param prefix Metric name prefix
+        """
+        snapshot = self.snapshot()
+        lines = []
+
+        def family(name, kind, description):
+            lines.append(f"# HELP {prefix}_{name} {description}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+
+        def sample(name, labels, value):
+            text = ",".join(f'{key}="{label}"' for key, label in labels.items())
+            lines.append(f"{prefix}_{name}{{{text}}} {_formatValue(value)}")
+
+        family("i2c_transactions_total", "counter", "Bus transactions per operation")
+        for address, values in snapshot.items():
+            for op, count in values["transactions"].items():
+                sample("i2c_transactions_total", {"address": address, "op": op}, count)
+        family("i2c_errors_total", "counter", "Bus operations that failed")
+        for address, values in snapshot.items():
+            for op, count in values["errors"].items():
+                sample("i2c_errors_total", {"address": address, "op": op}, count)
+        family("i2c_register_accesses_total", "counter", "Bus operations per start register")
+        for address, values in snapshot.items():
+            for op, registers in values["registers"].items():
+                for register, count in registers.items():
+                    sample("i2c_register_accesses_total", {"address": address, "op": op, "register": register}, count)
+        family("i2c_bytes_total", "counter", "Payload bytes transferred")
+        for address, values in snapshot.items():
+            sample("i2c_bytes_total", {"address": address, "direction": "read"}, values["bytes_read"])
+            sample("i2c_bytes_total", {"address": address, "direction": "write"}, values["bytes_written"])
+        family("i2c_latency_seconds", "histogram", "Time spent in each bus operation")
+        for address, values in snapshot.items():
+            for op, latency in values["latency"].items():
+                for bound, count in latency["buckets"].items():
+                    sample("i2c_latency_seconds_bucket", {"address": address, "op": op, "le": _formatValue(bound)}, count)
+                sample("i2c_latency_seconds_sum", {"address": address, "op": op}, latency["sum"])
+                sample("i2c_latency_seconds_count", {"address": address, "op": op}, latency["count"])
+        attached = [(address, values) for address, values in snapshot.items() if "crc_errors" in values]
+        family("crc_errors_total", "counter", "Read frames that failed the CRC check")
+        for address, values in attached:
+            sample("crc_errors_total", {"address": address}, values["crc_errors"])
+        family("crc_failures_total", "counter", "Reads that failed the CRC check after all retries")
+        for address, values in attached:
+            sample("crc_failures_total", {"address": address}, values["crc_failures"])
+        family("por_recoveries_total", "counter", "Power-on resets recovered from by restoring the configuration")
+        for address, values in attached:
+            sample("por_recoveries_total", {"address": address}, values["por_recoveries"])
+        family("seconds_since_fresh_conversion", "gauge", "Time since the last new conversion was read")
+        for address, values in attached:
+            age = values["seconds_since_fresh_conversion"]
+            sample("seconds_since_fresh_conversion", {"address": address}, math.nan if age is None else age)
+        return "\n".join(lines) + "\n"
+
+
+def _formatValue(value):
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and math.isnan(value):
+        return "NaN"
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class InstrumentedTransport(TMAG5273Transport):
+    """
+    Transport wrapper that times every operation of the wrapped transport
+    and reports it to a TMAG5273Metrics collector.
+    """
+
+    def __init__(self, transport, metrics):
+        self.transport = transport
+        self.metrics = metrics
+
+    def _run(self, address, op, register, written, read, function, *args):
+        start = time.perf_counter()
+        try:
+            result = function(*args)
+        except OSError as error:
+            self.metrics.record(address, op, register, written, read, time.perf_counter() - start, error)
+            raise
+        self.metrics.record(address, op, register, written, read, time.perf_counter() - start)
+        return result
+
+    def readByte(self, address, register):
+        return self._run(address, "readByte", register, 1, 1, self.transport.readByte, address, register)
+
+    def readBlock(self, address, register, length):
+        return self._run(address, "readBlock", register, 1, length, self.transport.readBlock, address, register, length)
+
+    def writeByte(self, address, register, value):
+        self._run(address, "writeByte", register, 2, 0, self.transport.writeByte, address, register, value)
+
+    def writeBlock(self, address, register, values):
+        values = bytes(values)
+        self._run(address, "writeBlock", register, 1 + len(values), 0, self.transport.writeBlock, address, register, values)
+
+    def read(self, address, length):
+        return self._run(address, "read", None, 0, length, self.transport.read, address, length)
+
+    def transfer(self, address, writeData, readLength):
+        writeData = bytes(writeData)
+        register = writeData[0] if writeData else None
+        return self._run(address, "transfer", register, len(writeData), readLength,
+                         self.transport.transfer, address, writeData, readLength)
+
+    def close(self):
+        self.transport.close()
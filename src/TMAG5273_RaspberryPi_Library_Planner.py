@@ -0,0 +1,137 @@
+# Acquisition planner. Picks the conversion averaging for a target output
+# rate: averaging lowers the noise but also the conversion rate (see
+# TMAG5273.setConvAvg()), and every sample also has to fit on the bus next to
+# the other sensors sharing it. The plan reports the expected bus utilisation
+# and holds the configure() fields that apply it.
+import math
+from collections import namedtuple
+from TMAG5273_RaspberryPi_Library_Defs import *
+from TMAG5273_RaspberryPi_Library import TMAG5273, TMAG5273_CRC_FRAME_DATA
+
+# Bus time allowed for sample reads by default; the rest is left for polls,
+# retries and other traffic on the bus
+TMAG5273_PLANNER_MAX_UTILISATION = 0.7
+
+# Typical time per I2C transaction on a Raspberry Pi spent outside the wire
+# (system call, driver, controller setup), in seconds
+TMAG5273_PLANNER_TRANSACTION_OVERHEAD = 50e-6
+
+# avg                conversion average setting (TMAG5273_X1_CONVERSION ..)
+# conversionRate     conversions per second of one sensor with that averaging
+# noiseFactor        expected noise relative to TMAG5273_X1_CONVERSION
+# transactionTime    bus time of one sample read in seconds
+# busUtilisation     fraction of the bus used by all sensors at the target rate
+# maxRate            highest output rate per sensor this configuration allows
+# fits               True if the target rate fits both the sensor and the bus
+# configuration      configure() fields that apply the plan
+TMAG5273Plan = namedtuple("TMAG5273Plan", ["rate", "avg", "conversionRate", "noiseFactor", "transactionTime",
+                                           "busUtilisation", "maxRate", "fits", "configuration"])
+
+
+def calculateTransactionTime(readMode, channelMode, temperatureEnabled, crc=False, busHz=400000,
+                             transactionOverhead=TMAG5273_PLANNER_TRANSACTION_OVERHEAD):
+    """
+    @brief Bus time of one sample read, as done by TMAG5273.readRawSample():
+     9 clocks per byte plus start and stop, plus transactionOverhead.
+    @param readMode TMAG5273_I2C_MODE_3BYTE (address, register, repeated
+     start, result block) or one of the 1-byte modes (address, data)
+    @param crc Reads are framed with a CRC byte per 4 data bytes
+    @return Seconds
+    """
+    length = TMAG5273.calculateReadLength(readMode, channelMode, temperatureEnabled)
+    if crc:
+        # Whole frames of 4 data bytes plus CRC, the last one padded
+        length = -(-length // TMAG5273_CRC_FRAME_DATA) * (TMAG5273_CRC_FRAME_DATA + 1)
+    header = 3 if readMode == TMAG5273_I2C_MODE_3BYTE else 1
+    return transactionOverhead + ((header + length) * 9 + 2) / busHz
+
+
+def planAcquisition(rate, channelMode=TMAG5273_X_Y_Z_ENABLE, temperatureEnabled=True, busHz=400000, sensors=1,
+                    readMode=TMAG5273_I2C_MODE_3BYTE, crc=False, transactionsPerSample=1.0,
+                    transactionOverhead=TMAG5273_PLANNER_TRANSACTION_OVERHEAD,
+                    maxUtilisation=TMAG5273_PLANNER_MAX_UTILISATION):
+    """
+    @brief Chooses the highest conversion averaging whose conversion rate
+     still reaches the target output rate, and checks that reading every
+     sensor on the bus at that rate fits into maxUtilisation of the bus.
+    @param rate Target output rate per sensor in samples per second
+    @param channelMode Enabled magnetic channels (TMAG5273_X_ENABLE ..)
+    @param temperatureEnabled Temperature channel enabled
+    @param busHz I2C clock in Hz
+    @param sensors Sensors read at this rate on the same bus
+    @param readMode I2C read mode (see TMAG5273.setReadMode())
+    @param crc I2C CRC mode enabled
+    @param transactionsPerSample Bus transactions per sample: 1 for
+     readRawWhenReady(), streams and interrupt driven reads, more when
+     CONV_STATUS is polled separately
+    @param transactionOverhead Time per transaction spent outside the wire
+    @param maxUtilisation Fraction of the bus the sample reads may use
+    @return TMAG5273Plan. If even 1x averaging or the bus cannot sustain the
+     rate, fits is False and the plan uses 1x averaging; maxRate tells what
+     is achievable.
+    """
+    if rate <= 0:
+        raise ValueError(f"Invalid rate: {rate}")
+    avg = TMAG5273_X1_CONVERSION
+    for candidate in range(TMAG5273_X32_CONVERSION, TMAG5273_X1_CONVERSION - 1, -1):
+        if 1 / TMAG5273.calculateConversionTime(candidate, channelMode, temperatureEnabled) >= rate:
+            avg = candidate
+            break
+    conversionRate = 1 / TMAG5273.calculateConversionTime(avg, channelMode, temperatureEnabled)
+    transactionTime = calculateTransactionTime(readMode, channelMode, temperatureEnabled, crc, busHz, transactionOverhead)
+    samplesTime = sensors * transactionsPerSample * transactionTime
+    busUtilisation = rate * samplesTime
+    maxRate = min(conversionRate, maxUtilisation / samplesTime)
+    configuration = {
+        "avg": avg,
+        "channel": channelMode,
+        "temperature": TMAG5273_TEMPERATURE_ENABLE if temperatureEnabled else TMAG5273_TEMPERATURE_DISABLE,
+        "read_mode": readMode,
+        "crc": TMAG5273_CRC_ENABLE if crc else TMAG5273_CRC_DISABLE,
+        "mode": TMAG5273_CONTINUOUS_MEASURE_MODE,
+    }
+    return TMAG5273Plan(rate, avg, conversionRate, 1 / math.sqrt(1 << avg), transactionTime, busUtilisation,
+                        maxRate, rate <= maxRate, configuration)
+
+
+def planForSensor(sensor, rate, busHz=400000, sensors=1, **options):
+    """
+    @brief planAcquisition() with the sensor's current channels, temperature
+     channel, read mode and CRC mode. Each of them can be overridden through
+     options, as can the other planAcquisition() parameters.
+    @param sensor TMAG5273 driver
+    @param rate Target output rate in samples per second
+    @param busHz I2C clock of the sensor's bus in Hz
+    @param sensors Sensors read at this rate on that bus, this one included
+    @return TMAG5273Plan
+    """
+    config = sensor.getConfigBlock()
+    current = {
+        "channelMode": TMAG5273.getBitFieldValue(config[TMAG5273_REG_SENSOR_CONFIG_1], TMAG5273_CHANNEL_MODE_BITS, TMAG5273_CHANNEL_MODE_LSB),
+        "temperatureEnabled": bool(config[TMAG5273_REG_T_CONFIG] & TMAG5273_TEMPERATURE_BITS),
+        "readMode": TMAG5273.getBitFieldValue(config[TMAG5273_REG_DEVICE_CONFIG_1], TMAG5273_I2C_READ_MODE_BITS, TMAG5273_I2C_READ_MODE_LSB),
+        "crc": bool(config[TMAG5273_REG_DEVICE_CONFIG_1] & TMAG5273_CRC_MODE_BITS),
+    }
+    current.update(options)
+    return planAcquisition(rate, busHz=busHz, sensors=sensors, **current)
+
+
+def checkPlan(plan, busHz, sensors):
+    """Raises ValueError if plan does not fit"""
+    if not plan.fits:
+        raise ValueError(f"{plan.rate} samples/s do not fit: at most {plan.maxRate:.0f} samples/s per sensor "
+                         f"({sensors} sensors at {busHz} Hz, {plan.busUtilisation:.0%} bus utilisation)")
+
+
+def configureForRate(sensor, rate, busHz=400000, sensors=1, force=False, **options):
+    """
+    @brief Plans the averaging for rate (see planForSensor()) and applies
+     the plan with a single configure() call.
+    @param force Apply the plan even if the rate does not fit
+    @return TMAG5273Plan that was applied
+    """
+    plan = planForSensor(sensor, rate, busHz, sensors, **options)
+    if not force:
+        checkPlan(plan, busHz, sensors)
+    sensor.configure(**plan.configuration)
+    return plan
@@ -0,0 +1,271 @@
+# Binary sample recordings. A recording is a 64-byte header followed by
+# fixed-size records of a little-endian int64 time.monotonic_ns() timestamp
+# and the 12 result register bytes T_MSB_RESULT (0x10) .. MAGNITUDE_RESULT
+# (0x1B) exactly as they come off the bus. The header holds the sensor's
+# configuration registers, so the records can be decoded later. Readers map
+# the file instead of loading it, so recordings of any size open instantly.
+import bisect
+import mmap
+import struct
+import time
+from TMAG5273_RaspberryPi_Library_Defs import *
+from TMAG5273_RaspberryPi_Library import TMAG5273, TMAG5273_CONFIG_BLOCK_LENGTH, TMAG5273_RESULT_BLOCK, TMAG5273_RESULT_BLOCK_LENGTH
+from TMAG5273_RaspberryPi_Library_Convert import convertBlock
+from TMAG5273_RaspberryPi_Library_Stream import TMAG5273_STREAM_FIELDS
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+TMAG5273_RECORDING_MAGIC = b"TMAG5273"
+TMAG5273_RECORDING_VERSION = 1
+
+# magic, version, header size, record size, I2C address, wall clock time and
+# monotonic time (ns) at creation, configuration registers 0x00 .. 0x0C
+_HEADER = struct.Struct(f"<8sHHHBxdq{TMAG5273_CONFIG_BLOCK_LENGTH}s19x")
+_TIMESTAMP = struct.Struct("<q")
+TMAG5273_RECORD_LENGTH = _TIMESTAMP.size + TMAG5273_RESULT_BLOCK_LENGTH
+
+if np is not None:
+    TMAG5273_RECORD_DTYPE = np.dtype([("timestamp", "<i8"), ("t", ">u2"), ("x", ">i2"), ("y", ">i2"), ("z", ">i2"),
+                                      ("convStatus", "u1"), ("angle", ">u2"), ("magnitude", "u1")])
+
+
+class TMAG5273Recorder:
+    """
+    Appends samples to a recording file. Writes are buffered; the file is
+    complete after close() or flush().
+    """
+
+    def __init__(self, path, sensor=None, config=None, address=TMAG5273_I2C_ADDRESS_INITIAL, bufferSize=1 << 16):
+        """
+        @brief Creates the recording and writes its header.
+        @param path File to create (an existing file is replaced)
+        @param sensor TMAG5273 whose configuration and address are stored
+        @param config Configuration block to store instead of the sensor's
+         (see TMAG5273.getConfigBlock())
+        @param address I2C address to store when no sensor is given
+        @param bufferSize Write buffer size in bytes
+        """
+        if sensor is not None:
+            config = sensor.getConfigBlock() if config is None else config
+            address = sensor.address
+        if config is None or len(config) != TMAG5273_CONFIG_BLOCK_LENGTH:
+            raise ValueError("A sensor or a configuration block is required")
+        self._file = open(path, "wb", buffering=bufferSize)
+        self._file.write(_HEADER.pack(TMAG5273_RECORDING_MAGIC, TMAG5273_RECORDING_VERSION, _HEADER.size,
+                                      TMAG5273_RECORD_LENGTH, address, time.time(), time.monotonic_ns(), bytes(config)))
+        self.count = 0
+
+    def write(self, rawSample, timestampNs=None):
+        """
+        @brief Appends one sample.
+        @param rawSample Raw sample tuple (t, x, y, z, convStatus, angle, magnitude)
+        @param timestampNs time.monotonic_ns() of the sample, defaults to now
+        """
+        if timestampNs is None:
+            timestampNs = time.monotonic_ns()
+        self._file.write(_TIMESTAMP.pack(timestampNs))
+        self._file.write(TMAG5273_RESULT_BLOCK.pack(*rawSample))
+        self.count += 1
+
+    def writeBlock(self, samples, timestamps):
+        """
+        @brief Appends a block of samples as returned by
+         TMAG5273Stream.readChunk().
+        @param samples Flat array('h') with TMAG5273_STREAM_FIELDS values per sample
+        @param timestamps time.monotonic() timestamps in seconds
+        """
+        record = bytearray(TMAG5273_RECORD_LENGTH * len(timestamps))
+        for index, timestamp in enumerate(timestamps):
+            offset = index * TMAG5273_RECORD_LENGTH
+            _TIMESTAMP.pack_into(record, offset, round(timestamp * 1e9))
+            rawSample = samples[index * TMAG5273_STREAM_FIELDS:(index + 1) * TMAG5273_STREAM_FIELDS]
+            # The stream stores every field as int16; undo that for the unsigned registers
+            TMAG5273_RESULT_BLOCK.pack_into(record, offset + _TIMESTAMP.size, rawSample[0] & 0xFFFF, rawSample[1], rawSample[2],
+                                    rawSample[3], rawSample[4] & 0xFF, rawSample[5] & 0xFFFF, rawSample[6] & 0xFF)
+        self._file.write(record)
+        self.count += len(timestamps)
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class TMAG5273Recording:
+    """
+    Memory-mapped, read-only view of a recording. Nothing is read until it
+    is used: with NumPy, records is a zero-copy structured array over the
+    file, timeSlice() finds a time range with a binary search and convert()
+    decodes only the records it is given. Without NumPy the same methods
+    work on tuples.
+    """
+
+    def __init__(self, path):
+        """
+        @param path Recording file
+        """
+        self._file = open(path, "rb")
+        size = self._file.seek(0, 2)
+        if size < _HEADER.size:
+            self._file.close()
+            raise ValueError(f"{path} is not a TMAG5273 recording")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, headerSize, recordSize, self.address, self.startTime, self.startNs, config = _HEADER.unpack_from(self._map)
+        if magic != TMAG5273_RECORDING_MAGIC or version > TMAG5273_RECORDING_VERSION or recordSize != TMAG5273_RECORD_LENGTH:
+            self.close()
+            raise ValueError(f"{path} is not a supported TMAG5273 recording")
+        self.config = config
+        self.layout = TMAG5273.calculateSampleLayout(config)
+        self._offset = headerSize
+        # A record cut short by a crash at the end of the file is ignored
+        self._count = (size - headerSize) // recordSize
+        self._records = None
+
+    @property
+    def averaging(self):
+        """Conversion averaging setting (TMAG5273_X1_CONVERSION ..)"""
+        return TMAG5273.getBitFieldValue(self.config[TMAG5273_REG_DEVICE_CONFIG_1], TMAG5273_CONV_AVG_BITS, TMAG5273_CONV_AVG_LSB)
+
+    @property
+    def channelMode(self):
+        return self.layout[0]
+
+    @property
+    def angleMode(self):
+        """Angle calculation setting (TMAG5273_NO_ANGLE_CALCULATION ..)"""
+        return TMAG5273.getBitFieldValue(self.config[TMAG5273_REG_SENSOR_CONFIG_2], TMAG5273_ANGLE_CALCULATION_BITS, TMAG5273_ANGLE_CALCULATION_LSB)
+
+    @property
+    def ranges(self):
+        """(xyRange, zRange) in mT"""
+        return self.layout[3], self.layout[4]
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def records(self):
+        """NumPy structured array (TMAG5273_RECORD_DTYPE) over the mapped file"""
+        if np is None:
+            raise ImportError("records needs NumPy; use recording[index] or iterate instead")
+        if self._records is None:
+            self._records = np.frombuffer(self._map, TMAG5273_RECORD_DTYPE, self._count, self._offset)
+        return self._records
+
+    def timestamp(self, index):
+        """time.monotonic_ns() timestamp of record index"""
+        return _TIMESTAMP.unpack_from(self._map, self._offset + index * TMAG5273_RECORD_LENGTH)[0]
+
+    def resultBytes(self, index):
+        """The 12 recorded result register bytes (0x10 .. 0x1B) of record index"""
+        offset = self._offset + index * TMAG5273_RECORD_LENGTH + _TIMESTAMP.size
+        return self._map[offset:offset + TMAG5273_RESULT_BLOCK_LENGTH]
+
+    def __getitem__(self, index):
+        """(timestamp_ns, raw sample tuple) of record index"""
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("record index out of range")
+        offset = self._offset + index * TMAG5273_RECORD_LENGTH
+        return _TIMESTAMP.unpack_from(self._map, offset)[0], TMAG5273_RESULT_BLOCK.unpack_from(self._map, offset + _TIMESTAMP.size)
+
+    def __iter__(self):
+        for index in range(self._count):
+            yield self[index]
+
+    def indexRange(self, start=None, end=None):
+        """
+        @brief Binary search for the records with start <= timestamp < end.
+        @param start, end Seconds since the first record, None for open ends
+        @return (first, last) record indices, last exclusive
+        """
+        if not self._count:
+            return 0, 0
+        origin = self.timestamp(0)
+        if np is not None:
+            timestamps = self.records["timestamp"]
+            search = lambda value: int(np.searchsorted(timestamps, value))
+        else:
+            search = lambda value: bisect.bisect_left(_TimestampSequence(self), value)
+        first = 0 if start is None else search(origin + round(start * 1e9))
+        last = self._count if end is None else search(origin + round(end * 1e9))
+        return first, max(first, last)
+
+    def timeSlice(self, start=None, end=None):
+        """
+        @brief Records with start <= time < end, in seconds since the first
+         record.
+        @return Zero-copy structured array view with NumPy, otherwise a list
+         of (timestamp_ns, raw sample) tuples
+        """
+        first, last = self.indexRange(start, end)
+        if np is not None:
+            return self.records[first:last]
+        return [self[index] for index in range(first, last)]
+
+    def convert(self, records=None):
+        """
+        @brief Converts records to physical units with the recorded
+         configuration (see TMAG5273_RaspberryPi_Library_Convert.convertBlock).
+        @param records Structured array or list from timeSlice(), None for all
+        @return Dict of float32 arrays (temperature, x, y, z, angle, magnitude
+         for the enabled channels) plus "timestamp" in seconds since the
+         first record
+        """
+        if records is None:
+            records = self.records if np is not None else list(self)
+        origin = self.timestamp(0) if self._count else 0
+        if np is not None and isinstance(records, np.ndarray):
+            result = convertBlock(records, self.layout)
+            result["timestamp"] = (records["timestamp"] - origin) / 1e9
+            return result
+        result = convertBlock([rawSample for timestampNs, rawSample in records], self.layout)
+        result["timestamp"] = [(timestampNs - origin) / 1e9 for timestampNs, rawSample in records]
+        return result
+
+    def close(self):
+        """
+        @brief Unmaps the file. Arrays obtained from records must not be used
+         afterwards.
+        """
+        self._records = None
+        if self._map is not None:
+            try:
+                self._map.close()
+            except BufferError:
+                # NumPy views are still alive; the mapping goes with them
+                pass
+            self._map = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class _TimestampSequence:
+    """Timestamps of a recording as a lazy sequence for bisect"""
+
+    def __init__(self, recording):
+        self._recording = recording
+
+    def __len__(self):
+        return len(self._recording)
+
+    def __getitem__(self, index):
+        return self._recording.timestamp(index)
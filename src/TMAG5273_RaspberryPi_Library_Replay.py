@@ -0,0 +1,201 @@
+import time
+from TMAG5273_RaspberryPi_Library_Defs import *
+from TMAG5273_RaspberryPi_Library import TMAG5273, TMAG5273_CONFIG_BLOCK_LENGTH, TMAG5273_RESULT_BLOCK_LENGTH
+from TMAG5273_RaspberryPi_Library_Recording import TMAG5273Recording
+from TMAG5273_RaspberryPi_Library_Sim import SimulatedTMAG5273, SimulatedBus
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Result registers T_MSB_RESULT (0x10) .. MAGNITUDE_RESULT (0x1B)
+_RESULT_REGISTERS = range(TMAG5273_REG_T_MSB_RESULT, TMAG5273_REG_T_MSB_RESULT + TMAG5273_RESULT_BLOCK_LENGTH)
+
+
+class ReplayedTMAG5273(SimulatedTMAG5273):
+    """
+    Simulated sensor whose results come from a recording instead of a field
+    model. The register map, read modes, CRC framing and writes behave like
+    SimulatedTMAG5273; the configuration registers start out as recorded.
+
+    In real-time mode record n becomes the current conversion when its
+    timestamp, relative to the first record and divided by speed, has
+    passed since the replay started. In max-speed mode every conversion is
+    handed out as soon as the previous one was read: a read of any result
+    register already read since the last advance moves to the next record,
+    so a burst read, a set of per-axis getters or a CONV_STATUS poll each
+    see one new conversion.
+
+    Configuration writes are accepted so begin() and configure() work, but
+    they do not change the recorded data, except that results are rescaled
+    when the X/Y or Z range is changed from the recorded one.
+    """
+
+    def __init__(self, recording, realTime=True, speed=1.0, loop=False, address=None, clock=time.monotonic):
+        """
+        @param recording TMAG5273Recording to replay
+        @param realTime Pace the records by their timestamps (True) or hand
+         them out as fast as they are read (False)
+        @param speed Replay speed factor in real-time mode
+        @param loop Start over after the last record instead of stopping there
+        @param address I2C address to answer on, defaults to the recorded one
+        @param clock Time source in seconds
+        """
+        self.recording = recording
+        self.realTime = realTime
+        self.speed = speed
+        self.loop = loop
+        self._index = -1
+        self._readSinceAdvance = set()
+        super().__init__(recording.address if address is None else address, clock=clock)
+
+    def powerOnReset(self):
+        super().powerOnReset()
+        self.registers[:TMAG5273_CONFIG_BLOCK_LENGTH] = self.recording.config
+        self.registers[TMAG5273_REG_CONV_STATUS] = 0
+        self.restart()
+
+    def restart(self):
+        """
+        @brief Starts the replay over at the first record.
+        """
+        self._startTime = self.clock()
+        self._index = -1
+        self._readSinceAdvance = set()
+        if not self.realTime:
+            self._load(0)
+
+    @property
+    def index(self):
+        """Index of the record currently in the result registers, -1 before the first"""
+        return self._index % len(self.recording) if self._index >= 0 else -1
+
+    @property
+    def finished(self):
+        """True once the last record has been handed out (never with loop)"""
+        return not self.loop and self._index >= len(self.recording) - 1
+
+    def _load(self, position):
+        """Puts the record at position into the result registers; positions
+        count on across loops"""
+        count = len(self.recording)
+        if not count or (position >= count and not self.loop):
+            return
+        self._index = position
+        data = bytearray(self.recording.resultBytes(position % count))
+        recordedXY, recordedZ = self.recording.ranges
+        xyRange = 80 if self._field(TMAG5273_REG_SENSOR_CONFIG_2, TMAG5273_XY_RANGE_BITS, TMAG5273_XY_RANGE_LSB) else 40
+        zRange = 80 if self._field(TMAG5273_REG_SENSOR_CONFIG_2, TMAG5273_Z_RANGE_BITS, TMAG5273_Z_RANGE_LSB) else 40
+        for offset, recordedRange, rangeMT in ((2, recordedXY, xyRange), (4, recordedXY, xyRange), (6, recordedZ, zRange)):
+            if recordedRange != rangeMT:
+                value = (data[offset] << 8) | data[offset + 1]
+                value -= 0x10000 if value & 0x8000 else 0
+                value = max(-32768, min(32767, round(value * recordedRange / rangeMT))) & 0xFFFF
+                data[offset:offset + 2] = bytes((value >> 8, value & 0xFF))
+        data[TMAG5273_REG_CONV_STATUS - TMAG5273_REG_T_MSB_RESULT] |= self.registers[TMAG5273_REG_CONV_STATUS] & TMAG5273_CONV_STATUS_POR_BITS
+        self.registers[TMAG5273_REG_T_MSB_RESULT:TMAG5273_REG_T_MSB_RESULT + TMAG5273_RESULT_BLOCK_LENGTH] = data
+        self.conversionCount += 1
+
+    def _update(self, now):
+        if not self.realTime or not len(self.recording):
+            return
+        elapsed = (now - self._startTime) * self.speed
+        count = len(self.recording)
+        duration = (self.recording.timestamp(count - 1) - self.recording.timestamp(0)) / 1e9
+        cycle = 0
+        if self.loop and duration > 0:
+            # Each pass lasts the recording's duration plus one mean sample interval
+            period = duration * count / max(count - 1, 1)
+            cycle, elapsed = divmod(elapsed, period)
+        first, last = self.recording.indexRange(None, elapsed + 1e-9)
+        index = int(cycle) * count + last - 1
+        if index > self._index:
+            self._load(index)
+
+    def _advance(self, register, length):
+        """Max-speed mode: moves to the next record when a result register is
+        read again"""
+        touched = set(range(register, register + length)).intersection(_RESULT_REGISTERS)
+        if touched & self._readSinceAdvance:
+            self._load(self._index + 1)
+            self._readSinceAdvance = set()
+        self._readSinceAdvance |= touched
+
+    def readRegisters(self, register, length):
+        with self.lock:
+            if not self.realTime:
+                self._advance(register & ~TMAG5273_I2C_CONV_TRIGGER_BIT, length)
+            return super().readRegisters(register, length)
+
+    def readDirect(self, length):
+        with self.lock:
+            if not self.realTime:
+                readMode = self._field(TMAG5273_REG_DEVICE_CONFIG_1, TMAG5273_I2C_READ_MODE_BITS, TMAG5273_I2C_READ_MODE_LSB)
+                if readMode == TMAG5273_I2C_MODE_3BYTE:
+                    self._advance(self._pointer, length)
+                else:
+                    self._advance(TMAG5273_REG_T_MSB_RESULT, TMAG5273_RESULT_BLOCK_LENGTH)
+            return super().readDirect(length)
+
+
+class ReplayTransport(SimulatedBus):
+    """
+    TMAG5273Transport that answers the driver from a recording, so the
+    unchanged driver API (getXData(), readSample(), TMAG5273Stream, ...)
+    runs on captured data. Bus timing is not simulated; the recording's
+    own timing applies in real-time mode.
+    """
+
+    def __init__(self, recording, realTime=True, speed=1.0, loop=False, address=None):
+        """
+        @param recording TMAG5273Recording or the path of a recording file
+        @param realTime, speed, loop, address See ReplayedTMAG5273
+        """
+        if not isinstance(recording, TMAG5273Recording):
+            recording = TMAG5273Recording(recording)
+            self._ownsRecording = True
+        else:
+            self._ownsRecording = False
+        self.device = ReplayedTMAG5273(recording, realTime, speed, loop, address)
+        super().__init__([self.device], simulateTiming=False)
+
+    @property
+    def recording(self):
+        return self.device.recording
+
+    def close(self):
+        if self._ownsRecording:
+            self.device.recording.close()
+            self._ownsRecording = False
+
+
+def replayBlocks(recording, blockSize=65536, realTime=False, speed=1.0, start=None, end=None):
+    """
+    @brief Iterates over a recording in blocks for offline processing at
+     full speed: each block is a zero-copy slice of the mapped file (a list of
+     (timestamp_ns, raw sample) tuples without NumPy), ready for
+     convertBlock() or recording.convert().
+    @param recording TMAG5273Recording
+    @param blockSize Records per block
+    @param realTime Release each block when its last record is due, scaled by speed
+    @param speed Replay speed factor in real-time mode
+    @param start, end Time range in seconds since the first record
+    @return Generator of record blocks
+    """
+    first, last = recording.indexRange(start, end)
+    if first >= last:
+        return
+    origin = recording.timestamp(first)
+    startTime = time.monotonic()
+    for index in range(first, last, blockSize):
+        stop = min(index + blockSize, last)
+        if realTime:
+            delay = startTime + (recording.timestamp(stop - 1) - origin) / 1e9 / speed - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        if np is not None:
+            yield recording.records[index:stop]
+        else:
+            yield [recording[position] for position in range(index, stop)]
+
@@ -0,0 +1,464 @@
+# Acquisition server. One process owns the sensor and publishes every new
+# conversion into a ring buffer in shared memory (multiprocessing
+# .shared_memory); any number of local processes attach to it by name and
+# read the samples without touching the bus. Configuration changes go
+# through a small control channel (multiprocessing.connection on a Unix
+# socket), so they are serialised with the acquisition loop:
+#
+#   python3 TMAG5273_RaspberryPi_Library_Server.py --bus 1 --address 0x22 --name tmag5273
+#
+# Shared memory layout: a 64-byte header, then capacity slots of 32 bytes.
+# A slot holds its sequence number (1 for the first sample, 0 while it is
+# being written), a time.monotonic_ns() timestamp, the 12 result register
+# bytes T_MSB_RESULT (0x10) .. MAGNITUDE_RESULT (0x1B) as read from the bus
+# and the configuration generation the sample was taken with. Readers check
+# the sequence number before and after copying a slot, so a slot that the
+# server overwrote meanwhile is detected and skipped.
+import argparse
+import os
+import struct
+import sys
+import tempfile
+import threading
+import time
+from multiprocessing import resource_tracker, shared_memory
+from multiprocessing.connection import Client, Listener
+from TMAG5273_RaspberryPi_Library_Defs import *
+from TMAG5273_RaspberryPi_Library import TMAG5273, TMAG5273_CONFIG_BLOCK_LENGTH, TMAG5273_RESULT_BLOCK
+from TMAG5273_RaspberryPi_Library_Convert import convertBlock
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+TMAG5273_SHARED_MAGIC = b"TMAG5273"
+TMAG5273_SHARED_VERSION = 1
+
+# magic, head (samples written), version, header size, slot size, I2C
+# address, capacity, configuration generation, configuration registers
+_HEADER = struct.Struct(f"<8sQHHHBxII{TMAG5273_CONFIG_BLOCK_LENGTH}s19x")
+_HEAD = struct.Struct("<Q")
+_HEAD_OFFSET = 8
+_GENERATION = struct.Struct(f"<I{TMAG5273_CONFIG_BLOCK_LENGTH}s")
+_GENERATION_OFFSET = 28
+_SLOT_START = struct.Struct("<Qq")
+_SLOT_GENERATION = struct.Struct("<I")
+TMAG5273_SHARED_SLOT_LENGTH = 32
+
+if np is not None:
+    TMAG5273_SHARED_DTYPE = np.dtype([("seq", "<u8"), ("timestamp", "<i8"), ("t", ">u2"), ("x", ">i2"), ("y", ">i2"),
+                                      ("z", ">i2"), ("convStatus", "u1"), ("angle", ">u2"), ("magnitude", "u1"),
+                                      ("generation", "<u4")])
+
+
+def controlAddress(name):
+    """Unix socket path of the control channel of the server called name"""
+    return os.path.join(tempfile.gettempdir(), name + ".sock")
+
+
+# Shared memory blocks created by servers in this process
+_created = set()
+
+
+def _attach(name):
+    """Opens an existing shared memory block without letting this process's
+    resource tracker remove it when the process exits"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Before Python 3.13 every attach is tracked. The tracker keeps one
+        # entry per name, so a block created by a server in this process must
+        # stay registered for the server's unlink().
+        memory = shared_memory.SharedMemory(name=name)
+        if name not in _created:
+            resource_tracker.unregister(memory._name, "shared_memory")
+        return memory
+
+
+class TMAG5273Server:
+    """
+    Owns one sensor: a thread reads every new conversion (readRawWhenReady,
+    one transaction per sample) and publishes it in the shared ring, a
+    second thread serves the control channel. The bus is read once no matter
+    how many readers there are.
+    """
+
+    def __init__(self, sensor, name="tmag5273", capacity=1 << 16, authkey=None, timeout=1.0):
+        """
+        @brief Creates the shared memory block and the control socket.
+        @param sensor TMAG5273 driver, already initialised with begin()
+        @param name Shared memory name; the control socket is controlAddress(name)
+        @param capacity Samples held in the ring
+        @param authkey Optional key control clients must present
+        @param timeout Wait for one conversion in seconds
+        """
+        if capacity <= 0:
+            raise ValueError(f"Invalid capacity: {capacity}")
+        self.sensor = sensor
+        self.name = name
+        self.capacity = capacity
+        self.timeout = timeout
+        self.errorCount = 0
+        self.timeoutCount = 0
+        self._lock = threading.Lock()
+        self._head = 0
+        self._generation = 0
+        self._memory = shared_memory.SharedMemory(name=name, create=True,
+                                                  size=_HEADER.size + capacity * TMAG5273_SHARED_SLOT_LENGTH)
+        _created.add(name)
+        self._buffer = self._memory.buf
+        _HEADER.pack_into(self._buffer, 0, TMAG5273_SHARED_MAGIC, 0, TMAG5273_SHARED_VERSION, _HEADER.size,
+                          TMAG5273_SHARED_SLOT_LENGTH, sensor.address, capacity, 0, sensor.getConfigBlock())
+        self.address = controlAddress(name)
+        if os.path.exists(self.address):
+            os.unlink(self.address)
+        self._authkey = authkey
+        self._listener = Listener(self.address, "AF_UNIX", authkey=authkey)
+        self._running = False
+        self._threads = []
+
+    def start(self):
+        """Starts the acquisition and control threads"""
+        if self._running:
+            return
+        self._running = True
+        self._threads = [threading.Thread(target=self._acquire, name="TMAG5273Server", daemon=True),
+                         threading.Thread(target=self._serve, name="TMAG5273Control", daemon=True)]
+        for thread in self._threads:
+            thread.start()
+
+    def _publish(self, rawSample, timestampNs):
+        offset = _HEADER.size + (self._head % self.capacity) * TMAG5273_SHARED_SLOT_LENGTH
+        buffer = self._buffer
+        _SLOT_START.pack_into(buffer, offset, 0, timestampNs)
+        TMAG5273_RESULT_BLOCK.pack_into(buffer, offset + _SLOT_START.size, *rawSample)
+        _SLOT_GENERATION.pack_into(buffer, offset + TMAG5273_SHARED_SLOT_LENGTH - _SLOT_GENERATION.size, self._generation)
+        self._head += 1
+        _HEAD.pack_into(buffer, offset, self._head)
+        _HEAD.pack_into(buffer, _HEAD_OFFSET, self._head)
+
+    def _acquire(self):
+        # The lock is held for one poll (readRawWhenReady with no wait) at a
+        # time and the waiting happens outside it, so configure() never
+        # waits longer than one bus transaction
+        sensor = self.sensor
+        lastSample = time.monotonic()
+        while self._running:
+            with self._lock:
+                try:
+                    rawSample = sensor.readRawWhenReady(0)
+                except OSError:
+                    self.errorCount += 1
+                    rawSample = None
+                if rawSample is not None:
+                    self._publish(rawSample, time.monotonic_ns())
+                conversionTime = sensor.getConversionTime()
+            now = time.monotonic()
+            interval = max(conversionTime / 8, 50e-6)
+            if rawSample is not None:
+                # Poll again shortly before the next conversion is due
+                lastSample = now
+                time.sleep(max(conversionTime - interval, 0))
+                continue
+            if now - lastSample > self.timeout:
+                self.timeoutCount += 1
+                lastSample = now
+            time.sleep(interval)
+
+    def _serve(self):
+        while self._running:
+            try:
+                connection = self._listener.accept()
+            except OSError:
+                # The listener was closed by close()
+                break
+            threading.Thread(target=self._handle, args=(connection,), name="TMAG5273Client", daemon=True).start()
+
+    def _handle(self, connection):
+        with connection:
+            while True:
+                try:
+                    request = connection.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    connection.send(("ok", self._execute(*request)))
+                except Exception as error:
+                    connection.send(("error", f"{type(error).__name__}: {error}"))
+
+    def _execute(self, command, *arguments):
+        """Runs one control request"""
+        if command == "configure":
+            return self.configure(**arguments[0])
+        if command == "config":
+            return self.sensor.getConfigBlock()
+        if command == "status":
+            return self.status()
+        raise ValueError(f"Unknown command {command!r}")
+
+    def configure(self, **fields):
+        """
+        @brief Changes the sensor configuration (see TMAG5273.configure())
+         between two reads and publishes it with a new generation number.
+        @return The new configuration block
+        """
+        with self._lock:
+            self.sensor.configure(**fields)
+            config = self.sensor.getConfigBlock()
+            self._generation += 1
+            _GENERATION.pack_into(self._buffer, _GENERATION_OFFSET, self._generation, config)
+        return config
+
+    def status(self):
+        return {"name": self.name, "samples": self._head, "capacity": self.capacity, "generation": self._generation,
+                "errors": self.errorCount, "timeouts": self.timeoutCount, "recoveries": self.sensor.porRecoveryCount,
+                "running": self._running}
+
+    def close(self):
+        """
+        @brief Stops the threads and removes the shared memory block and the
+         control socket. Attached readers keep their mapping until they close.
+        """
+        if self._running:
+            self._running = False
+            # accept() does not return when the listener is closed; wake it with a connection
+            try:
+                Client(self.address, "AF_UNIX", authkey=self._authkey).close()
+            except OSError:
+                pass
+        self._listener.close()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        if os.path.exists(self.address):
+            os.unlink(self.address)
+        if self._memory is not None:
+            self._buffer = None
+            self._memory.close()
+            self._memory.unlink()
+            _created.discard(self.name)
+            self._memory = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class TMAG5273SharedReader:
+    """
+    Attaches to the ring of a TMAG5273Server. Each reader has its own read
+    position; readers do not affect the server or each other. With NumPy,
+    records is a zero-copy structured array over the whole ring.
+    """
+
+    def __init__(self, name="tmag5273", latest=False):
+        """
+        @param name Name the server was started with
+        @param latest Start at the newest sample instead of the oldest one
+         still in the ring
+        """
+        self._memory = _attach(name)
+        self._buffer = self._memory.buf
+        magic, head, version, headerSize, slotSize, self.address, self.capacity, generation, config = \
+            _HEADER.unpack_from(self._buffer)
+        if magic != TMAG5273_SHARED_MAGIC or version > TMAG5273_SHARED_VERSION or slotSize != TMAG5273_SHARED_SLOT_LENGTH:
+            self.close()
+            raise ValueError(f"{name} is not a TMAG5273 server ring")
+        self._offset = headerSize
+        self._records = None
+        self.droppedCount = 0  # Samples overwritten before this reader got to them
+        self.position = head if latest else max(head - self.capacity, 0)
+
+    @property
+    def head(self):
+        """Number of samples the server has published"""
+        return _HEAD.unpack_from(self._buffer, _HEAD_OFFSET)[0]
+
+    @property
+    def generation(self):
+        """Configuration generation, incremented by every configure()"""
+        return _GENERATION.unpack_from(self._buffer, _GENERATION_OFFSET)[0]
+
+    @property
+    def config(self):
+        """Current configuration block of the sensor"""
+        return _GENERATION.unpack_from(self._buffer, _GENERATION_OFFSET)[1]
+
+    @property
+    def layout(self):
+        """Decode layout (see TMAG5273.getSampleLayout()) of the current configuration"""
+        return TMAG5273.calculateSampleLayout(self.config)
+
+    @property
+    def available(self):
+        return self.head - self.position
+
+    @property
+    def records(self):
+        """NumPy structured array (TMAG5273_SHARED_DTYPE) over the ring"""
+        if np is None:
+            raise ImportError("records needs NumPy; use read() instead")
+        if self._records is None:
+            self._records = np.frombuffer(self._buffer, TMAG5273_SHARED_DTYPE, self.capacity, self._offset)
+        return self._records
+
+    def read(self, n=4096, timeout=0.0, pollInterval=0.5e-3):
+        """
+        @brief Returns up to n samples published since the last read, oldest
+         first, waiting up to timeout for the first one.
+        @param pollInterval Sleep between checks while waiting, in seconds
+        @return With NumPy a structured array (TMAG5273_SHARED_DTYPE, a copy
+         that stays valid), otherwise a list of (timestamp_ns, raw sample)
+         tuples. convertBlock() accepts both; see convert().
+        """
+        deadline = time.monotonic() + timeout
+        head = self.head
+        while head == self.position and time.monotonic() < deadline:
+            time.sleep(pollInterval)
+            head = self.head
+        if head - self.position > self.capacity:
+            self.droppedCount += head - self.capacity - self.position
+            self.position = head - self.capacity
+        count = min(n, head - self.position)
+        if np is not None:
+            return self._readVectorized(count)
+        return self._readPython(count)
+
+    def _readVectorized(self, count):
+        expected = np.arange(self.position + 1, self.position + count + 1, dtype=np.uint64)
+        slots = (expected - 1) % self.capacity
+        records = self.records
+        before = records["seq"][slots]
+        block = records[slots]
+        after = records["seq"][slots]
+        valid = (before == expected) & (after == expected)
+        if not valid.all():
+            # Slots that were overwritten while copying; everything up to the last one is lost
+            lost = int(np.nonzero(~valid)[0][-1]) + 1
+            self.droppedCount += lost
+            block = block[lost:]
+        self.position += count
+        return block
+
+    def _readPython(self, count):
+        samples = []
+        for index in range(self.position, self.position + count):
+            offset = self._offset + (index % self.capacity) * TMAG5273_SHARED_SLOT_LENGTH
+            sequence, timestampNs = _SLOT_START.unpack_from(self._buffer, offset)
+            rawSample = TMAG5273_RESULT_BLOCK.unpack_from(self._buffer, offset + _SLOT_START.size)
+            if sequence != index + 1 or _SLOT_START.unpack_from(self._buffer, offset)[0] != sequence:
+                # Overwritten by the server while reading
+                self.droppedCount += 1
+                continue
+            samples.append((timestampNs, rawSample))
+        self.position += count
+        return samples
+
+    def convert(self, block):
+        """
+        @brief Converts a block from read() with the current configuration
+         (see TMAG5273_RaspberryPi_Library_Convert.convertBlock)
+        @return Dict of float32 arrays plus "timestamp" in seconds
+        """
+        if np is not None and isinstance(block, np.ndarray):
+            result = convertBlock(block, self.layout)
+            result["timestamp"] = block["timestamp"] / 1e9
+            return result
+        result = convertBlock([rawSample for timestampNs, rawSample in block], self.layout)
+        result["timestamp"] = [timestampNs / 1e9 for timestampNs, rawSample in block]
+        return result
+
+    def close(self):
+        self._records = None
+        self._buffer = None
+        if self._memory is not None:
+            try:
+                self._memory.close()
+            except BufferError:
+                # NumPy views of records are still alive; the mapping goes with them
+                pass
+            self._memory = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class TMAG5273ControlClient:
+    """
+    Control channel of a TMAG5273Server: configuration changes and status
+    from any process, serialised with the server's reads.
+    """
+
+    def __init__(self, name="tmag5273", authkey=None):
+        self._connection = Client(controlAddress(name), "AF_UNIX", authkey=authkey)
+
+    def _request(self, *request):
+        self._connection.send(request)
+        status, result = self._connection.recv()
+        if status != "ok":
+            raise RuntimeError(result)
+        return result
+
+    def configure(self, **fields):
+        """
+        @brief Applies configure() fields on the server (e.g. avg=TMAG5273_X8_CONVERSION)
+        @return The new configuration block
+        """
+        return self._request("configure", fields)
+
+    def config(self):
+        return self._request("config")
+
+    def status(self):
+        """Dict with samples published, ring capacity, generation, errors, timeouts
+        and power-on reset recoveries"""
+        return self._request("status")
+
+    def close(self):
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="TMAG5273 acquisition server")
+    parser.add_argument("--bus", type=int, default=1, help="I2C bus number")
+    parser.add_argument("--address", type=lambda text: int(text, 0), default=TMAG5273_I2C_ADDRESS_INITIAL, help="sensor address")
+    parser.add_argument("--name", default="tmag5273", help="shared memory name")
+    parser.add_argument("--capacity", type=int, default=1 << 16, help="samples in the ring")
+    parser.add_argument("--avg", type=int, default=TMAG5273_X1_CONVERSION, help="conversion averaging setting")
+    parser.add_argument("--sim", action="store_true", help="serve a simulated sensor instead of real hardware")
+    args = parser.parse_args(argv)
+
+    if args.sim:
+        from TMAG5273_RaspberryPi_Library_Sim import SimulatedTMAG5273, SimulatedBus
+        transport = SimulatedBus([SimulatedTMAG5273(args.address, noise=0.05)], simulateTiming=False)
+        sensor = TMAG5273(transport, args.address)
+    else:
+        sensor = TMAG5273(args.bus, args.address)
+    sensor.begin()
+    sensor.configure(avg=args.avg)
+    with TMAG5273Server(sensor, args.name, args.capacity) as server:
+        print(f"Serving {hex(args.address)} as {args.name}, control at {server.address}", flush=True)
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+    sensor.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,415 @@
+import errno
+import math
+import random
+import threading
+import time
+from TMAG5273_RaspberryPi_Library_Defs import *
+from TMAG5273_RaspberryPi_Library import TMAG5273, crc8, TMAG5273_CRC_FRAME_DATA
+from TMAG5273_RaspberryPi_Library_Transport import TMAG5273Transport
+
+# Registers DEVICE_CONFIG_1 (0x00) .. DEVICE_STATUS (0x1C)
+TMAG5273_REGISTER_COUNT = TMAG5273_REG_DEVICE_STATUS + 1
+
+# Error flags in DEVICE_STATUS that are cleared by writing 1
+_DEVICE_STATUS_CLEAR_BITS = (TMAG5273_DEVICE_STATUS_OSCILLATOR_ERROR_BITS | TMAG5273_DEVICE_STATUS_INT_ERROR_BITS |
+                             TMAG5273_DEVICE_STATUS_OTP_CRC_ERROR_BITS | TMAG5273_DEVICE_STATUS_VCC_UV_ERROR_BITS)
+
+
+class SimulatedTMAG5273:
+    """
+    Register-level model of a TMAG5273 for tests and benchmarks without
+    hardware. It implements the register map and bit fields of
+    TMAG5273_RaspberryPi_Library_Defs: channel, temperature and range
+    selection, conversion timing for the configured averaging (the same
+    model as TMAG5273.calculateConversionTime), the operating modes,
+    CONV_STATUS (SET_COUNT, RESULT_STATUS, POR), the angle/magnitude
+    calculation with gain and offset correction, the 1-byte read modes,
+    the I2C CRC mode, the I2C conversion trigger, result and threshold
+    interrupts and runtime address changes.
+
+    Conversions are computed lazily from the elapsed time whenever the
+    device is accessed, so the model costs nothing between transactions.
+    """
+
+    def __init__(self, address=TMAG5273_I2C_ADDRESS_INITIAL, field=None, noise=0.0, clock=time.monotonic):
+        """
+        @brief Creates a powered-up device.
+        @param address Factory default I2C address, restored by powerOnReset()
+        @param field Callable field(t) -> (bx, by, bz, temperature) giving the
+         flux density in mT and the die temperature in C at clock time t.
+         Defaults to no field at 25 C.
+        @param noise RMS noise in mT of one conversion at 1x averaging; it is
+         reduced by the square root of the averaging factor
+        @param clock Time source in seconds
+        """
+        self.initialAddress = address
+        self.field = field if field is not None else (lambda t: (0.0, 0.0, 0.0, 25.0))
+        self.noise = noise
+        self.clock = clock
+        self.lock = threading.RLock()
+        # Callables handler(device, t) run when the device asserts its interrupt
+        self.interruptHandlers = []
+        self._runner = None
+        self._running = False
+        self.powerOnReset()
+
+    def powerOnReset(self):
+        """
+        @brief Returns every register to its power-up value, like a brown-out
+         would. CONV_STATUS reports the POR until it is cleared.
+        """
+        self.registers = bytearray(TMAG5273_REGISTER_COUNT)
+        self.address = self.initialAddress
+        self.registers[TMAG5273_REG_I2C_ADDRESS] = self.initialAddress << TMAG5273_I2C_ADDRESS_LSB
+        self.registers[TMAG5273_REG_DEVICE_ID] = 0x01
+        self.registers[TMAG5273_REG_MANUFACTURER_ID_LSB] = TMAG5273_DEVICE_ID_VALUE & 0xFF
+        self.registers[TMAG5273_REG_MANUFACTURER_ID_MSB] = TMAG5273_DEVICE_ID_VALUE >> 8
+        self.registers[TMAG5273_REG_CONV_STATUS] = TMAG5273_CONV_STATUS_POR_BITS
+        self._pointer = 0
+        self._setCount = 0
+        self._cycleStart = self.clock()
+        self._pendingConversion = None
+        self.conversionCount = 0
+        self.interruptCount = 0
+        self._crossings = 0
+
+    def _field(self, register, bits, lsb):
+        return TMAG5273.getBitFieldValue(self.registers[register], bits, lsb)
+
+    def conversionTime(self):
+        """Conversion time in seconds for the current configuration"""
+        return TMAG5273.calculateConversionTime(
+            self._field(TMAG5273_REG_DEVICE_CONFIG_1, TMAG5273_CONV_AVG_BITS, TMAG5273_CONV_AVG_LSB),
+            self._field(TMAG5273_REG_SENSOR_CONFIG_1, TMAG5273_CHANNEL_MODE_BITS, TMAG5273_CHANNEL_MODE_LSB),
+            self._field(TMAG5273_REG_T_CONFIG, TMAG5273_TEMPERATURE_BITS, TMAG5273_TEMPERATURE_LSB) == TMAG5273_TEMPERATURE_ENABLE)
+
+    def _cyclePeriod(self):
+        """Time between result updates in the free-running modes"""
+        period = self.conversionTime()
+        if self._field(TMAG5273_REG_DEVICE_CONFIG_2, TMAG5273_OPERATING_MODE_BITS, TMAG5273_OPERATING_MODE_LSB) == TMAG5273_WAKE_UP_AND_SLEEP_MODE:
+            sleepMode = min(self._field(TMAG5273_REG_SENSOR_CONFIG_1, TMAG5273_SLEEP_MODE_BITS, TMAG5273_SLEEP_MODE_LSB), TMAG5273_SLEEP_20000MS)
+            period += TMAG5273_SLEEP_TIME_MS[sleepMode] / 1000
+        return period
+
+    def _update(self, now):
+        """Completes every conversion that finished up to now"""
+        mode = self._field(TMAG5273_REG_DEVICE_CONFIG_2, TMAG5273_OPERATING_MODE_BITS, TMAG5273_OPERATING_MODE_LSB)
+        if mode in (TMAG5273_CONTINUOUS_MEASURE_MODE, TMAG5273_WAKE_UP_AND_SLEEP_MODE):
+            period = self._cyclePeriod()
+            count = int((now - self._cycleStart) / period)
+            if count > 0:
+                self._cycleStart += count * period
+                self._complete(self._cycleStart, count)
+        elif self._pendingConversion is not None and now >= self._pendingConversion:
+            self._complete(self._pendingConversion, 1)
+            self._pendingConversion = None
+
+    def _complete(self, t, count):
+        """Writes the results of the conversion finished at time t; count
+        conversions completed since the previous update"""
+        self._computeResults(t)
+        self._setCount = (self._setCount + count) & 0x7
+        self.conversionCount += count
+        status = self.registers[TMAG5273_REG_CONV_STATUS] & (TMAG5273_CONV_STATUS_POR_BITS | TMAG5273_CONV_STATUS_DIAG_STATUS_BITS)
+        status |= (self._setCount << TMAG5273_CONV_STATUS_SET_COUNT_LSB) | TMAG5273_CONV_STATUS_RESULT_STATUS_BITS
+        self.registers[TMAG5273_REG_CONV_STATUS] = status
+
+        intConfig = self.registers[TMAG5273_REG_INT_CONFIG_1]
+        if self._thresholdCrossed():
+            self._crossings += count
+        else:
+            self._crossings = 0
+        crossingsNeeded = 4 if self._field(TMAG5273_REG_SENSOR_CONFIG_2, TMAG5273_THRESHOLD_COUNT_BITS, TMAG5273_THRESHOLD_COUNT_LSB) else 1
+        if intConfig & TMAG5273_INTERRUPT_RESULT_BITS or (intConfig & TMAG5273_INTERRUPT_THRESHOLD_BITS and self._crossings >= crossingsNeeded):
+            self._interrupt(t)
+
+    def _thresholdCrossed(self):
+        """True if an enabled axis is beyond its threshold in the latest results"""
+        registers = self.registers
+        axes = TMAG5273_CHANNEL_MODE_AXES[min(self._field(TMAG5273_REG_SENSOR_CONFIG_1, TMAG5273_CHANNEL_MODE_BITS, TMAG5273_CHANNEL_MODE_LSB), TMAG5273_XZX_ENABLE)]
+        symmetric = self._field(TMAG5273_REG_DEVICE_CONFIG_2, TMAG5273_THR_HYST_BITS, TMAG5273_THR_HYST_LSB) == TMAG5273_THRESHOLD_HYST_7LSB
+        below = self._field(TMAG5273_REG_SENSOR_CONFIG_2, TMAG5273_THRESHOLD_INT_BITS, TMAG5273_THRESHOLD_INT_LSB) == TMAG5273_THRESHOLD_INT_BELOW
+        for axis, thresholdRegister, resultRegister in ((TMAG5273_AXIS_X, TMAG5273_REG_X_THR_CONFIG, TMAG5273_REG_X_MSB_RESULT),
+                                                        (TMAG5273_AXIS_Y, TMAG5273_REG_Y_THR_CONFIG, TMAG5273_REG_Y_MSB_RESULT),
+                                                        (TMAG5273_AXIS_Z, TMAG5273_REG_Z_THR_CONFIG, TMAG5273_REG_Z_MSB_RESULT)):
+            if not axes & axis:
+                continue
+            value = (registers[resultRegister] << 8) | registers[resultRegister + 1]
+            value -= 0x10000 if value & 0x8000 else 0
+            code = registers[thresholdRegister]
+            if symmetric:
+                if abs(value) > (code & 0x7F) << 8:
+                    return True
+            elif (value < (_signed8(code) << 8)) if below else (value > (_signed8(code) << 8)):
+                return True
+        return False
+
+    def _interrupt(self, t):
+        """Asserts the interrupt unless masked or routed nowhere"""
+        intConfig = self.registers[TMAG5273_REG_INT_CONFIG_1]
+        if intConfig & TMAG5273_INTERRUPT_MASK_BITS or not intConfig & TMAG5273_INTERRUPT_MODE_BITS:
+            return
+        self.interruptCount += 1
+        for handler in self.interruptHandlers:
+            handler(self, t)
+
+    def update(self):
+        """
+        @brief Completes the conversions that are due by now. Bus accesses do
+         this implicitly; call it (or start()) to get interrupts while the bus
+         is idle.
+        """
+        with self.lock:
+            self._update(self.clock())
+
+    def start(self, interval=None):
+        """
+        @brief Runs the device in real time on a background thread so that
+         interrupt handlers fire without bus traffic.
+        @param interval Update interval in seconds, defaults to a quarter of
+         the current conversion time
+        """
+        if self._runner is not None:
+            return
+        self._running = True
+
+        def run():
+            while self._running:
+                self.update()
+                time.sleep(interval if interval is not None else self.conversionTime() / 4)
+        self._runner = threading.Thread(target=run, name="SimulatedTMAG5273", daemon=True)
+        self._runner.start()
+
+    def stop(self):
+        """Stops the background thread started by start()"""
+        self._running = False
+        if self._runner is not None:
+            self._runner.join()
+            self._runner = None
+
+    def _computeResults(self, t):
+        bx, by, bz, temperature = self.field(t)
+        if self.noise:
+            average = 1 << min(self._field(TMAG5273_REG_DEVICE_CONFIG_1, TMAG5273_CONV_AVG_BITS, TMAG5273_CONV_AVG_LSB), TMAG5273_X32_CONVERSION)
+            sigma = self.noise / math.sqrt(average)
+            bx += random.gauss(0.0, sigma)
+            by += random.gauss(0.0, sigma)
+            bz += random.gauss(0.0, sigma)
+        xyRange = 80 if self._field(TMAG5273_REG_SENSOR_CONFIG_2, TMAG5273_XY_RANGE_BITS, TMAG5273_XY_RANGE_LSB) else 40
+        zRange = 80 if self._field(TMAG5273_REG_SENSOR_CONFIG_2, TMAG5273_Z_RANGE_BITS, TMAG5273_Z_RANGE_LSB) else 40
+        channelMode = self._field(TMAG5273_REG_SENSOR_CONFIG_1, TMAG5273_CHANNEL_MODE_BITS, TMAG5273_CHANNEL_MODE_LSB)
+        axes = TMAG5273_CHANNEL_MODE_AXES[min(channelMode, TMAG5273_XZX_ENABLE)]
+        codes = {
+            TMAG5273_AXIS_X: _fieldCode(bx, xyRange) if axes & TMAG5273_AXIS_X else 0,
+            TMAG5273_AXIS_Y: _fieldCode(by, xyRange) if axes & TMAG5273_AXIS_Y else 0,
+            TMAG5273_AXIS_Z: _fieldCode(bz, zRange) if axes & TMAG5273_AXIS_Z else 0,
+        }
+        registers = self.registers
+        if self._field(TMAG5273_REG_T_CONFIG, TMAG5273_TEMPERATURE_BITS, TMAG5273_TEMPERATURE_LSB):
+            tCode = int(round(TMAG5273_TADC_T0 + (temperature - TMAG5273_TSENSE_T0) * TMAG5273_TADC_RES)) & 0xFFFF
+            registers[TMAG5273_REG_T_MSB_RESULT] = tCode >> 8
+            registers[TMAG5273_REG_T_LSB_RESULT] = tCode & 0xFF
+        for axis, register in ((TMAG5273_AXIS_X, TMAG5273_REG_X_MSB_RESULT), (TMAG5273_AXIS_Y, TMAG5273_REG_Y_MSB_RESULT),
+                               (TMAG5273_AXIS_Z, TMAG5273_REG_Z_MSB_RESULT)):
+            code = codes[axis] & 0xFFFF
+            registers[register] = code >> 8
+            registers[register + 1] = code & 0xFF
+
+        angleMode = self._field(TMAG5273_REG_SENSOR_CONFIG_2, TMAG5273_ANGLE_CALCULATION_BITS, TMAG5273_ANGLE_CALCULATION_LSB)
+        if angleMode != TMAG5273_NO_ANGLE_CALCULATION:
+            first, second = ((TMAG5273_AXIS_X, TMAG5273_AXIS_Y), (TMAG5273_AXIS_Y, TMAG5273_AXIS_Z),
+                             (TMAG5273_AXIS_X, TMAG5273_AXIS_Z))[angleMode - 1]
+            # Offsets are 8-bit two's complement in units of 2*|range|/2^12, i.e. 16 result codes
+            values = [codes[first] - 16 * _signed8(registers[TMAG5273_REG_MAG_OFFSET_CONFIG_1]),
+                      codes[second] - 16 * _signed8(registers[TMAG5273_REG_MAG_OFFSET_CONFIG_2])]
+            gain = registers[TMAG5273_REG_MAG_GAIN_CONFIG]
+            values[self._field(TMAG5273_REG_SENSOR_CONFIG_2, TMAG5273_GAIN_ADJUST_BITS, TMAG5273_GAIN_ADJUST_LSB)] *= (gain / 256) if gain else 1.0
+            angle = int(round(math.degrees(math.atan2(values[1], values[0])) % 360 * 16)) % (360 * 16)
+            magnitude = min(int(round(math.hypot(values[0], values[1]) / 256)), 0xFF)
+            registers[TMAG5273_REG_ANGLE_RESULT_MSB] = angle >> 8
+            registers[TMAG5273_REG_ANGLE_RESULT_LSB] = angle & 0xFF
+            registers[TMAG5273_REG_MAGNITUDE_RESULT] = magnitude
+
+    def _crcFramed(self, payload, length):
+        """Splits payload into frames of 4 data bytes plus CRC when the CRC
+        mode is enabled and returns the first length bytes"""
+        if not self.registers[TMAG5273_REG_DEVICE_CONFIG_1] & TMAG5273_CRC_MODE_BITS:
+            return bytes(payload[:length])
+        framed = bytearray()
+        for offset in range(0, len(payload), TMAG5273_CRC_FRAME_DATA):
+            frame = payload[offset:offset + TMAG5273_CRC_FRAME_DATA]
+            framed += frame
+            framed.append(crc8(frame))
+        return bytes(framed[:length])
+
+    def _registerData(self, register, length):
+        """length bytes of register data from register on, zero past the map"""
+        data = bytes(self.registers[register:register + length])
+        return data + bytes(length - len(data))
+
+    def _addressPhase(self, register, now):
+        """Handles the register address byte: bit 7 triggers a conversion in
+        stand-by mode with I2C command triggering. Returns the register."""
+        if register & TMAG5273_I2C_CONV_TRIGGER_BIT:
+            register &= ~TMAG5273_I2C_CONV_TRIGGER_BIT
+            mode = self._field(TMAG5273_REG_DEVICE_CONFIG_2, TMAG5273_OPERATING_MODE_BITS, TMAG5273_OPERATING_MODE_LSB)
+            triggerMode = self._field(TMAG5273_REG_DEVICE_CONFIG_2, TMAG5273_TRIGGER_MODE_BITS, TMAG5273_TRIGGER_MODE_LSB)
+            if mode == TMAG5273_STANDBY_BY_MODE and triggerMode == TMAG5273_TRIGGER_I2C_COMMAND and self._pendingConversion is None:
+                self._pendingConversion = now + self.conversionTime()
+        self._pointer = register
+        return register
+
+    def readRegisters(self, register, length):
+        """Register-addressed read of length bytes (as seen on the bus). The
+        data is read out before a conversion triggered by the address byte
+        completes, so it holds the previous results."""
+        with self.lock:
+            now = self.clock()
+            self._update(now)
+            register = self._addressPhase(register, now)
+            return self._crcFramed(self._registerData(register, length), length)
+
+    def readDirect(self, length):
+        """Read without a register address phase. In the 1-byte read modes it
+        returns the enabled channels followed by CONV_STATUS; in the 3-byte
+        mode it continues from the last register address."""
+        with self.lock:
+            self._update(self.clock())
+            readMode = self._field(TMAG5273_REG_DEVICE_CONFIG_1, TMAG5273_I2C_READ_MODE_BITS, TMAG5273_I2C_READ_MODE_LSB)
+            if readMode == TMAG5273_I2C_MODE_3BYTE:
+                return self._crcFramed(self._registerData(self._pointer, length), length)
+            width = 2 if readMode == TMAG5273_I2C_MODE_1BYTE_16BIT else 1
+            channelMode = self._field(TMAG5273_REG_SENSOR_CONFIG_1, TMAG5273_CHANNEL_MODE_BITS, TMAG5273_CHANNEL_MODE_LSB)
+            axes = TMAG5273_CHANNEL_MODE_AXES[min(channelMode, TMAG5273_XZX_ENABLE)]
+            payload = bytearray()
+            if self._field(TMAG5273_REG_T_CONFIG, TMAG5273_TEMPERATURE_BITS, TMAG5273_TEMPERATURE_LSB):
+                payload += self.registers[TMAG5273_REG_T_MSB_RESULT:TMAG5273_REG_T_MSB_RESULT + width]
+            for axis, register in ((TMAG5273_AXIS_X, TMAG5273_REG_X_MSB_RESULT), (TMAG5273_AXIS_Y, TMAG5273_REG_Y_MSB_RESULT),
+                                   (TMAG5273_AXIS_Z, TMAG5273_REG_Z_MSB_RESULT)):
+                if axes & axis:
+                    payload += self.registers[register:register + width]
+            payload.append(self.registers[TMAG5273_REG_CONV_STATUS])
+            payload += bytes(max(length - len(payload), 0))
+            return self._crcFramed(payload, length)
+
+    def writeRegisters(self, register, values):
+        """Register-addressed write, applying the side effects of each register"""
+        with self.lock:
+            now = self.clock()
+            self._update(now)
+            register = self._addressPhase(register, now)
+            for offset, value in enumerate(values):
+                self._writeRegister(register + offset, value & 0xFF, now)
+
+    def _writeRegister(self, register, value, now):
+        registers = self.registers
+        if register <= TMAG5273_REG_MAG_OFFSET_CONFIG_2:
+            previousMode = self._field(TMAG5273_REG_DEVICE_CONFIG_2, TMAG5273_OPERATING_MODE_BITS, TMAG5273_OPERATING_MODE_LSB)
+            registers[register] = value
+            mode = self._field(TMAG5273_REG_DEVICE_CONFIG_2, TMAG5273_OPERATING_MODE_BITS, TMAG5273_OPERATING_MODE_LSB)
+            if mode != previousMode:
+                self._cycleStart = now
+                self._pendingConversion = None
+        elif register == TMAG5273_REG_I2C_ADDRESS:
+            registers[register] = value
+            if value & TMAG5273_I2C_ADDRESS_CHANGE_BITS:
+                self.address = TMAG5273.getBitFieldValue(value, TMAG5273_I2C_ADDRESS_BITS, TMAG5273_I2C_ADDRESS_LSB)
+        elif register == TMAG5273_REG_CONV_STATUS:
+            if value & TMAG5273_CONV_STATUS_POR_BITS:
+                registers[register] &= ~TMAG5273_CONV_STATUS_POR_BITS
+        elif register == TMAG5273_REG_DEVICE_STATUS:
+            registers[register] &= ~(value & _DEVICE_STATUS_CLEAR_BITS)
+
+
+def _fieldCode(flux, rangeMT):
+    """Result register code for flux in mT (datasheet eq 10), saturated to 16 bits"""
+    return max(-32768, min(32767, int(round(flux * 32768 / rangeMT))))
+
+
+def _signed8(value):
+    return value - 0x100 if value & 0x80 else value
+
+
+class SimulatedBus(TMAG5273Transport):
+    """
+    TMAG5273Transport connecting the driver to SimulatedTMAG5273 devices.
+    Each transaction takes the time the bytes need on the wire at busHz
+    (9 clocks per byte plus start/stop) plus a fixed transactionOverhead for
+    the kernel round trip. The wait is a sleep, so like a real I2C ioctl it
+    does not use CPU. Transactions on one bus are serialised.
+    """
+
+    def __init__(self, devices=(), busHz=400000, transactionOverhead=0.0, simulateTiming=True):
+        """
+        @param devices SimulatedTMAG5273 instances on the bus
+        @param busHz I2C clock in Hz
+        @param transactionOverhead Extra time per transaction in seconds
+        @param simulateTiming False runs transactions as fast as possible
+         while still accounting for the bus time
+        """
+        self.devices = list(devices)
+        self.busHz = busHz
+        self.transactionOverhead = transactionOverhead
+        self.simulateTiming = simulateTiming
+        self._lock = threading.Lock()
+        self.resetCounters()
+
+    def resetCounters(self):
+        """Clears the transaction, byte and bus time counters"""
+        self.transactions = 0
+        self.bytesRead = 0
+        self.bytesWritten = 0
+        self.busTime = 0.0
+
+    def addDevice(self, device):
+        self.devices.append(device)
+        return device
+
+    def _device(self, address):
+        for device in self.devices:
+            if device.address == address:
+                return device
+        raise OSError(errno.EREMOTEIO, f"No device at I2C address {hex(address)}")
+
+    def _transaction(self, address, written, read, action):
+        """Runs action(device) as one bus transaction. written and read are
+        the payload bytes in each direction, excluding address bytes."""
+        with self._lock:
+            device = self._device(address)
+            result = action(device)
+            addressBytes = 1 + (1 if written and read else 0)
+            duration = self.transactionOverhead + ((addressBytes + written + read) * 9 + 2) / self.busHz
+            self.transactions += 1
+            self.bytesWritten += written
+            self.bytesRead += read
+            self.busTime += duration
+            if self.simulateTiming:
+                time.sleep(duration)
+            return result
+
+    def readByte(self, address, register):
+        return self._transaction(address, 1, 1, lambda device: device.readRegisters(register, 1)[0])
+
+    def readBlock(self, address, register, length):
+        return list(self._transaction(address, 1, length, lambda device: device.readRegisters(register, length)))
+
+    def writeByte(self, address, register, value):
+        self._transaction(address, 2, 0, lambda device: device.writeRegisters(register, (value,)))
+
+    def writeBlock(self, address, register, values):
+        values = bytes(values)
+        self._transaction(address, 1 + len(values), 0, lambda device: device.writeRegisters(register, values))
+
+    def read(self, address, length):
+        return self._transaction(address, 0, length, lambda device: device.readDirect(length))
+
+    def transfer(self, address, writeData, readLength):
+        writeData = bytes(writeData)
+
+        def action(device):
+            if len(writeData) == 1 and readLength:
+                return device.readRegisters(writeData[0], readLength)
+            if writeData:
+                device.writeRegisters(writeData[0], writeData[1:])
+            return device.readDirect(readLength) if readLength else b""
+        return self._transaction(address, len(writeData), readLength, action)
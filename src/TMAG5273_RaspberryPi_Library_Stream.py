@@ -0,0 +1,198 @@
+import threading
+import time
+from array import array
+
+# Back-pressure policy when the ring buffer is full
+TMAG5273_STREAM_DROP_OLDEST = 0 # Overwrite the oldest unread sample
+TMAG5273_STREAM_BLOCK = 1       # Stop reading the sensor until the consumer catches up
+
+# Raw values stored per sample: t, x, y, z, convStatus, angle, magnitude
+TMAG5273_STREAM_FIELDS = 7
+
+
+class TMAG5273Stream:
+    """
+    Continuous acquisition from a TMAG5273 on a dedicated reader thread.
+    Every fresh conversion (see TMAG5273.readRawWhenReady) is stored as raw
+    int16 values plus a time.monotonic() timestamp in a fixed-size ring
+    buffer that is allocated once, up front.
+
+    While the stream runs it is the only user of the sensor's bus handle;
+    change the configuration before start() or after stop().
+    """
+
+    def __init__(self, sensor, capacity=4096, overflow=TMAG5273_STREAM_DROP_OLDEST, timeout=1.0, reader=None):
+        """
+        @brief Creates the stream and preallocates its ring buffer.
+        @param sensor TMAG5273 instance, already initialised with begin()
+        @param capacity Number of samples the ring buffer holds
+        @param overflow TMAG5273_STREAM_DROP_OLDEST or TMAG5273_STREAM_BLOCK
+        @param timeout Maximum wait for one conversion before the reader
+         thread counts a timeout and tries again, in seconds
+        @param reader Callable reader(timeout) returning the next raw sample
+         tuple or None on timeout, instead of sensor.readRawWhenReady
+        """
+        if capacity <= 0:
+            raise ValueError(f"Invalid capacity: {capacity}")
+        if overflow not in (TMAG5273_STREAM_DROP_OLDEST, TMAG5273_STREAM_BLOCK):
+            raise ValueError(f"Invalid overflow policy: {overflow}")
+        self.sensor = sensor
+        self.capacity = capacity
+        self.overflow = overflow
+        self.timeout = timeout
+        self._reader = reader if reader is not None else sensor.readRawWhenReady
+        self._samples = array("h", bytes(2 * TMAG5273_STREAM_FIELDS * capacity))
+        self._timestamps = array("d", bytes(8 * capacity))
+        # Total number of samples written and consumed since start()
+        self._head = 0
+        self._tail = 0
+        self._condition = threading.Condition()
+        self._thread = None
+        self._running = False
+        self.droppedCount = 0  # Unread samples overwritten (drop-oldest)
+        self.blockedCount = 0  # Times the reader had to wait for the consumer (block)
+        self.timeoutCount = 0  # Waits for a conversion that timed out
+        self.errorCount = 0    # Bus errors raised while reading
+
+    def start(self):
+        """
+        @brief Starts the reader thread. Unread samples from a previous run are
+         discarded and the counters are reset.
+        """
+        if self._running:
+            return
+        self._head = 0
+        self._tail = 0
+        self.droppedCount = 0
+        self.blockedCount = 0
+        self.timeoutCount = 0
+        self.errorCount = 0
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="TMAG5273Stream", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        @brief Stops the reader thread and waits for it to finish. Samples
+         already in the buffer can still be read.
+        """
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    @property
+    def running(self):
+        return self._running
+
+    @property
+    def available(self):
+        """Number of samples waiting to be read"""
+        return self._head - self._tail
+
+    def _run(self):
+        reader = self._reader
+        samples = self._samples
+        timestamps = self._timestamps
+        capacity = self.capacity
+        condition = self._condition
+        while self._running:
+            try:
+                rawSample = reader(self.timeout)
+            except OSError:
+                self.errorCount += 1
+                continue
+            if rawSample is None:
+                self.timeoutCount += 1
+                continue
+            timestamp = time.monotonic()
+            with condition:
+                if self._head - self._tail >= capacity:
+                    if self.overflow == TMAG5273_STREAM_BLOCK:
+                        self.blockedCount += 1
+                        while self._running and self._head - self._tail >= capacity:
+                            condition.wait()
+                        if not self._running:
+                            break
+                    else:
+                        self._tail += 1
+                        self.droppedCount += 1
+                index = self._head % capacity
+                offset = index * TMAG5273_STREAM_FIELDS
+                (samples[offset], samples[offset + 1], samples[offset + 2], samples[offset + 3],
+                 samples[offset + 4], samples[offset + 5], samples[offset + 6]) = rawSample
+                timestamps[index] = timestamp
+                self._head += 1
+                condition.notify_all()
+
+    def readInto(self, samples, timestamps, timeout=None):
+        """
+        @brief Copies up to len(timestamps) unread samples into caller-owned
+         buffers, waiting for at least one sample to arrive.
+        @param samples Writable int16 buffer (array('h'), NumPy array, ...)
+         with room for TMAG5273_STREAM_FIELDS values per sample
+        @param timestamps Writable float64 buffer, one entry per sample
+        @param timeout Maximum wait in seconds, None waits while the stream runs
+        @return Number of samples copied (0 on timeout or when stopped and empty)
+        """
+        n = len(timestamps)
+        if len(samples) < n * TMAG5273_STREAM_FIELDS:
+            raise ValueError("samples buffer is too small")
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._head > self._tail or not self._running, timeout):
+                return 0
+            count = min(n, self._head - self._tail)
+            copied = 0
+            while copied < count:
+                index = (self._tail + copied) % self.capacity
+                run = min(count - copied, self.capacity - index)
+                offset = index * TMAG5273_STREAM_FIELDS
+                samples[copied * TMAG5273_STREAM_FIELDS:(copied + run) * TMAG5273_STREAM_FIELDS] = \
+                    self._samples[offset:offset + run * TMAG5273_STREAM_FIELDS]
+                timestamps[copied:copied + run] = self._timestamps[index:index + run]
+                copied += run
+            self._tail += count
+            self._condition.notify_all()
+        return count
+
+    def readChunk(self, n, timeout=None):
+        """
+        @brief Returns up to n unread samples, waiting for at least one.
+        @param n Maximum number of samples to return
+        @param timeout Maximum wait in seconds, None waits while the stream runs
+        @return (samples, timestamps): array('h') with TMAG5273_STREAM_FIELDS
+         raw values per sample (t, x, y, z, convStatus, angle, magnitude) and
+         array('d') of time.monotonic() timestamps
+        """
+        samples = array("h", bytes(2 * TMAG5273_STREAM_FIELDS * n))
+        timestamps = array("d", bytes(8 * n))
+        count = self.readInto(samples, timestamps, timeout)
+        del samples[count * TMAG5273_STREAM_FIELDS:]
+        del timestamps[count:]
+        return samples, timestamps
+
+    def __iter__(self):
+        """
+        @brief Yields (timestamp, rawSample) tuples until the stream is
+         stopped and drained. Use sensor.decodeSample() for physical units.
+        """
+        samples = array("h", bytes(2 * TMAG5273_STREAM_FIELDS * 256))
+        timestamps = array("d", bytes(8 * 256))
+        while True:
+            count = self.readInto(samples, timestamps)
+            if count == 0:
+                if not self._running:
+                    return
+                continue
+            for i in range(count):
+                offset = i * TMAG5273_STREAM_FIELDS
+                yield timestamps[i], tuple(samples[offset:offset + TMAG5273_STREAM_FIELDS])
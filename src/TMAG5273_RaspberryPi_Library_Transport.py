@@ -0,0 +1,99 @@
+try:
+    from smbus2 import SMBus, i2c_msg
+except ImportError:
+    SMBus = None
+    i2c_msg = None
+
+
+class TMAG5273Transport:
+    """
+    Interface between the TMAG5273 driver and an I2C bus. Every method is one
+    bus transaction. Implementations raise OSError when a transfer fails,
+    like smbus2 does.
+    """
+
+    def readByte(self, address, register):
+        """Reads one register"""
+        raise NotImplementedError
+
+    def readBlock(self, address, register, length):
+        """Reads length consecutive registers starting at register, returns a list of ints"""
+        raise NotImplementedError
+
+    def writeByte(self, address, register, value):
+        """Writes one register"""
+        raise NotImplementedError
+
+    def writeBlock(self, address, register, values):
+        """Writes consecutive registers starting at register"""
+        raise NotImplementedError
+
+    def read(self, address, length):
+        """Plain read without a register address phase, returns bytes"""
+        raise NotImplementedError
+
+    def transfer(self, address, writeData, readLength):
+        """Combined transfer: writes writeData, then (after a repeated start)
+        reads readLength bytes. Returns bytes."""
+        raise NotImplementedError
+
+    def close(self):
+        """Releases the bus"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class SMBusTransport(TMAG5273Transport):
+    """
+    Transport over a Linux I2C adapter (/dev/i2c-N) using smbus2.
+    """
+
+    def __init__(self, bus=1):
+        """
+        @brief Opens /dev/i2c-<bus>, or wraps an already opened SMBus object.
+         A wrapped SMBus is not closed by close().
+        @param bus I2C bus number or smbus2.SMBus instance
+        """
+        if isinstance(bus, int):
+            if SMBus is None:
+                raise ImportError("smbus2 is required to access an I2C bus: pip3 install smbus2")
+            self.bus = SMBus(bus)
+            self._ownsBus = True
+        else:
+            self.bus = bus
+            self._ownsBus = False
+
+    def readByte(self, address, register):
+        return self.bus.read_byte_data(address, register)
+
+    def readBlock(self, address, register, length):
+        return self.bus.read_i2c_block_data(address, register, length)
+
+    def writeByte(self, address, register, value):
+        self.bus.write_byte_data(address, register, value)
+
+    def writeBlock(self, address, register, values):
+        self.bus.write_i2c_block_data(address, register, list(values))
+
+    def read(self, address, length):
+        message = i2c_msg.read(address, length)
+        self.bus.i2c_rdwr(message)
+        return bytes(message)
+
+    def transfer(self, address, writeData, readLength):
+        write = i2c_msg.write(address, list(writeData))
+        if not readLength:
+            self.bus.i2c_rdwr(write)
+            return b""
+        read = i2c_msg.read(address, readLength)
+        self.bus.i2c_rdwr(write, read)
+        return bytes(read)
+
+    def close(self):
+        if self._ownsBus and self.bus is not None:
+            self.bus.close()
+        self.bus = None
@@ -0,0 +1,36 @@
+import os
+import sys
+
+import pytest
+
+# The library modules live in src/ and import each other by module name
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from TMAG5273_RaspberryPi_Library import TMAG5273
+from TMAG5273_RaspberryPi_Library_Sim import SimulatedBus, SimulatedTMAG5273
+
+
+@pytest.fixture
+def field():
+    """Constant field of the simulated sensor: (bx, by, bz) in mT and C"""
+    return (10.0, -5.0, 3.0, 25.0)
+
+
+@pytest.fixture
+def device(field):
+    return SimulatedTMAG5273(field=lambda t: field)
+
+
+@pytest.fixture
+def bus(device):
+    """Simulated bus that counts bus time without sleeping"""
+    return SimulatedBus([device], simulateTiming=False)
+
+
+@pytest.fixture
+def sensor(bus):
+    """Driver on the simulated bus, initialised with begin()"""
+    sensor = TMAG5273(bus)
+    sensor.begin()
+    yield sensor
+    sensor.close()
@@ -0,0 +1,71 @@
+# Sensor arrays over several simulated buses: discovery, runtime address
+# assignment, per-bus reads and continuous acquisition that survives a
+# sensor dropping off its bus.
+import threading
+import time
+
+import pytest
+
+from TMAG5273_RaspberryPi_Library_Defs import *
+from TMAG5273_RaspberryPi_Library_Array import SensorArray
+from TMAG5273_RaspberryPi_Library_Sim import SimulatedBus, SimulatedTMAG5273
+
+
+def makeDevice(address):
+    # The X field identifies the sensor
+    return SimulatedTMAG5273(address, field=lambda t: (address / 10, 0.0, 0.0, 25.0))
+
+
+def makeArray():
+    buses = {1: SimulatedBus([makeDevice(0x22), makeDevice(0x35)], simulateTiming=False),
+             3: SimulatedBus([makeDevice(0x40)], simulateTiming=False)}
+    return SensorArray.scan(buses, addresses=range(0x20, 0x48)), buses
+
+
+def test_scan_and_read_all():
+    with makeArray()[0] as sensorArray:
+        assert len(sensorArray) == 3
+        sensorArray.beginAll(channel=TMAG5273_X_Y_Z_ENABLE)
+        samples = sensorArray.readAll()
+        assert sorted(samples) == [(1, 0x22), (1, 0x35), (3, 0x40)]
+        for (busNumber, address), sample in samples.items():
+            assert sample.x == pytest.approx(address / 10, abs=0.01)
+
+
+def test_assign_addresses():
+    devices = [makeDevice(TMAG5273_I2C_ADDRESS_INITIAL) for _ in range(3)]
+    bus = SimulatedBus(simulateTiming=False)
+    with SensorArray() as sensorArray:
+        sensorArray.addBus(1, bus)
+        sensors = sensorArray.assignAddresses(1, (0x30, 0x31, 0x32), lambda index: bus.addDevice(devices[index]))
+        assert [sensor.address for sensor in sensors] == [0x30, 0x31, 0x32]
+        assert [device.address for device in devices] == [0x30, 0x31, 0x32]
+        with pytest.raises(RuntimeError):
+            sensorArray.assignAddresses(1, (0x33,), lambda index: None)
+
+
+def test_acquisition_survives_a_failing_sensor():
+    sensorArray, buses = makeArray()
+    sensorArray.beginAll()
+    counts = {}
+    lock = threading.Lock()
+
+    def callback(busNumber, address, timestamp, rawSample):
+        with lock:
+            counts[(busNumber, address)] = counts.get((busNumber, address), 0) + 1
+
+    with sensorArray:
+        sensorArray.start(callback)
+        time.sleep(0.05)
+        # The sensor at 0x22 stops answering
+        buses[1].devices.pop(0)
+        with lock:
+            before = dict(counts)
+        time.sleep(0.05)
+        assert all(thread.is_alive() for thread in sensorArray._threads)
+        sensorArray.stop()
+    assert sensorArray.errorCounts[(1, 0x22)] > 0
+    assert sensorArray.errorCounts[(1, 0x35)] == 0
+    assert sensorArray.errorCounts[(3, 0x40)] == 0
+    assert counts[(1, 0x35)] > before[(1, 0x35)]
+    assert counts[(3, 0x40)] > before[(3, 0x40)]
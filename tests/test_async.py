@@ -0,0 +1,63 @@
+# asyncio front end on the simulated bus: mirrored coroutines, the methods
+# that stay synchronous and drivers sharing one executor and lock.
+import asyncio
+import inspect
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from TMAG5273_RaspberryPi_Library_Async import AsyncTMAG5273, _SYNC_METHODS
+from TMAG5273_RaspberryPi_Library_Sim import SimulatedBus, SimulatedTMAG5273
+
+
+def test_bus_methods_are_coroutines_and_local_ones_are_not(bus, field):
+    async def main():
+        async with AsyncTMAG5273(bus) as sensor:
+            assert inspect.iscoroutinefunction(AsyncTMAG5273.getXData)
+            await sensor.begin()
+            assert await sensor.getXData() == pytest.approx(field[0], abs=0.01)
+            sample = await sensor.readWhenReady()
+            assert sensor.decodeSample(await sensor.readRawSample()).y == pytest.approx(field[1], abs=0.01)
+            assert isinstance(sensor.secondsSinceFreshConversion(), float)
+            assert AsyncTMAG5273.calculateTemperature(17508) == pytest.approx(25.0, abs=0.1)
+            return sample
+
+    assert asyncio.run(main()).z == pytest.approx(field[2], abs=0.01)
+    for name in _SYNC_METHODS:
+        assert not inspect.iscoroutinefunction(getattr(AsyncTMAG5273, name)), name
+
+
+def test_address_and_shared_executor():
+    devices = [SimulatedTMAG5273(address, field=lambda t, b=address: (b / 10, 0.0, 0.0, 25.0)) for address in (0x22, 0x35)]
+    bus = SimulatedBus(devices, simulateTiming=False)
+    executor = ThreadPoolExecutor(max_workers=1)
+
+    async def main():
+        lock = asyncio.Lock()
+        sensors = [AsyncTMAG5273(bus, address, executor=executor, lock=lock) for address in (0x22, 0x35)]
+        for sensor in sensors:
+            await sensor.begin()
+        values = await asyncio.gather(*(sensor.getXData() for sensor in sensors))
+        for sensor in sensors:
+            sensor.close()
+        return values
+
+    try:
+        assert asyncio.run(main()) == [pytest.approx(0x22 / 10, abs=0.01), pytest.approx(0x35 / 10, abs=0.01)]
+    finally:
+        executor.shutdown()
+
+
+def test_stream_yields_conversions(bus, field):
+    async def main():
+        async with AsyncTMAG5273(bus) as sensor:
+            await sensor.begin()
+            samples = []
+            async for sample in sensor.stream():
+                samples.append(sample)
+                if len(samples) == 3:
+                    break
+            return samples
+
+    samples = asyncio.run(main())
+    assert [sample.x for sample in samples] == [pytest.approx(field[0], abs=0.01)] * 3
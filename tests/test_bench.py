@@ -0,0 +1,35 @@
+# Benchmark runner on simulated sensors: report layout and the transaction
+# counts that separate the access patterns.
+import json
+
+import pytest
+
+from TMAG5273_RaspberryPi_Library_Bench import TMAG5273_BENCH_VERSION, main, runBenchmarks, simulatedBuses
+
+
+def test_report_from_the_command_line(tmp_path):
+    output = tmp_path / "bench.json"
+    assert main(["--duration", "0.05", "--buses", "2", "--sensors", "2", "--overhead-us", "0",
+                 "--output", str(output)]) == 0
+    report = json.loads(output.read_text())
+    assert report["version"] == TMAG5273_BENCH_VERSION
+    assert report["backend"]["type"] == "sim"
+    results = report["results"]
+    # No recording, no decode pattern
+    assert sorted(results) == ["begin", "burst", "getters", "multi", "stream"]
+    assert results["multi"]["sensors"] == 4
+    for pattern in ("burst", "getters", "multi"):
+        assert results[pattern]["samples"] > 0
+
+
+def test_burst_read_is_one_transaction_per_sample():
+    results = runBenchmarks(simulatedBuses(1, 1, 1000000, 0.0), ("getters", "burst"), duration=0.05)
+    assert results["burst"]["transactions_per_sample"] == 1
+    assert results["getters"]["transactions_per_sample"] >= 4
+    # A configured sensor is only refreshed and verified
+    assert results["begin"]["transactions"] < results["begin"]["cold_transactions"]
+
+
+def test_unknown_pattern_is_rejected():
+    with pytest.raises(SystemExit):
+        main(["--patterns", "burst,teleport"])
@@ -0,0 +1,29 @@
+# All result registers in one burst read.
+import pytest
+
+from TMAG5273_RaspberryPi_Library_Defs import *
+from TMAG5273_RaspberryPi_Library import TMAG5273_RESULT_BLOCK_LENGTH
+
+
+def test_sample_is_one_transaction(sensor, bus):
+    sensor.getSampleLayout()
+    bus.resetCounters()
+    sensor.readRawSample()
+    assert bus.transactions == 1
+    assert bus.bytesRead == TMAG5273_RESULT_BLOCK_LENGTH
+
+
+def test_sample_matches_per_channel_getters(sensor, field):
+    sample = sensor.readWhenReady()
+    assert sample.x == pytest.approx(field[0], abs=0.01)
+    assert sample.y == pytest.approx(field[1], abs=0.01)
+    assert sample.z == pytest.approx(field[2], abs=0.01)
+    assert sample.temperature == pytest.approx(field[3], abs=0.1)
+    assert (sample.x, sample.y, sample.z) == (sensor.getXData(), sensor.getYData(), sensor.getZData())
+
+
+def test_disabled_channels_are_none(sensor):
+    sensor.configure(channel=TMAG5273_X_Y_ENABLE, temperature=TMAG5273_TEMPERATURE_DISABLE)
+    sample = sensor.readSample()
+    assert sample.x is not None and sample.y is not None
+    assert sample.z is None and sample.temperature is None and sample.angle is None
@@ -0,0 +1,69 @@
+# One persistent bus handle per driver instead of an SMBus per register access.
+import pytest
+
+import TMAG5273_RaspberryPi_Library_Transport as Transport
+from TMAG5273_RaspberryPi_Library import TMAG5273
+from TMAG5273_RaspberryPi_Library_Sim import SimulatedTMAG5273
+
+
+class FakeSMBus:
+    """smbus2.SMBus stand-in backed by a simulated sensor"""
+    opened = []
+
+    def __init__(self, bus=1):
+        self.bus = bus
+        self.closed = False
+        self.device = SimulatedTMAG5273()
+        FakeSMBus.opened.append(self)
+
+    def read_byte_data(self, address, register):
+        return self.device.readRegisters(register, 1)[0]
+
+    def read_i2c_block_data(self, address, register, length):
+        return list(self.device.readRegisters(register, length))
+
+    def write_byte_data(self, address, register, value):
+        self.device.writeRegisters(register, (value,))
+
+    def write_i2c_block_data(self, address, register, values):
+        self.device.writeRegisters(register, values)
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def fakeSMBus(monkeypatch):
+    FakeSMBus.opened = []
+    monkeypatch.setattr(Transport, "SMBus", FakeSMBus)
+    return FakeSMBus
+
+
+def test_bus_is_opened_once(fakeSMBus):
+    sensor = TMAG5273(1)
+    sensor.begin()
+    for _ in range(10):
+        sensor.getXData()
+        sensor.getTemp()
+    assert len(fakeSMBus.opened) == 1
+    assert fakeSMBus.opened[0].bus == 1
+    sensor.close()
+    assert fakeSMBus.opened[0].closed
+    # Closing twice is harmless
+    sensor.close()
+
+
+def test_shared_smbus_is_left_open(fakeSMBus):
+    smbus = FakeSMBus(3)
+    with TMAG5273(smbus) as first, TMAG5273(smbus) as second:
+        first.begin()
+        second.getXData()
+    assert len(fakeSMBus.opened) == 1
+    assert not smbus.closed
+
+
+def test_context_manager_closes_its_bus(fakeSMBus):
+    with TMAG5273(1) as sensor:
+        sensor.begin()
+    assert fakeSMBus.opened[0].closed
+    assert sensor.transport is None
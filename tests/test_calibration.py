@@ -0,0 +1,93 @@
+# Ellipse fit and calibration of the angle calculation against a simulated
+# rotation sweep with known offsets and amplitudes.
+import math
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from TMAG5273_RaspberryPi_Library import TMAG5273
+from TMAG5273_RaspberryPi_Library_Defs import *
+from TMAG5273_RaspberryPi_Library_Calibration import calibrate, fitCalibration, fitEllipse
+from TMAG5273_RaspberryPi_Library_Sim import SimulatedBus, SimulatedTMAG5273
+
+OFFSETS = (1.5, -1.0)      # mT
+AMPLITUDES = (20.0, 14.0)  # mT
+REVOLUTIONS_PER_SECOND = 5
+
+
+def sweep(t):
+    phase = 2 * math.pi * REVOLUTIONS_PER_SECOND * t
+    return (OFFSETS[0] + AMPLITUDES[0] * math.cos(phase), OFFSETS[1] + AMPLITUDES[1] * math.sin(phase), 5.0, 25.0)
+
+
+def makeSensor(field, noise=0.0):
+    device = SimulatedTMAG5273(field=field, noise=noise)
+    sensor = TMAG5273(SimulatedBus([device], simulateTiming=False))
+    sensor.begin()
+    sensor.configure(angle=TMAG5273_XY_ANGLE_CALCULATION, avg=TMAG5273_X4_CONVERSION)
+    return device, sensor
+
+
+def test_fit_ellipse_recovers_centre_and_extents():
+    phase = np.linspace(0, 2 * np.pi, 500, endpoint=False)
+    first = 300 + 4000 * np.cos(phase)
+    second = -200 + 2500 * np.sin(phase)
+    centre1, centre2, extent1, extent2, residual = fitEllipse(first, second)
+    assert (centre1, centre2) == pytest.approx((300, -200), abs=1e-6)
+    assert (extent1, extent2) == pytest.approx((4000, 2500), rel=1e-9)
+    assert residual < 1e-9
+
+
+def test_fit_calibration_from_raw_codes():
+    phase = np.linspace(0, 2 * np.pi, 400, endpoint=False)
+    rawSamples = np.zeros((len(phase), 7), dtype=np.int16)
+    rawSamples[:, 1] = np.round((OFFSETS[0] + AMPLITUDES[0] * np.cos(phase)) * 32768 / 40)
+    rawSamples[:, 2] = np.round((OFFSETS[1] + AMPLITUDES[1] * np.sin(phase)) * 32768 / 40)
+    calibration = fitCalibration(rawSamples, TMAG5273_XY_ANGLE_CALCULATION, 40, 40)
+    assert calibration.offsets == pytest.approx(OFFSETS, abs=0.01)
+    assert calibration.amplitudes == pytest.approx(AMPLITUDES, abs=0.01)
+    registers = calibration.registers(40, 40)
+    assert registers["gain_channel"] == TMAG5273_GAIN_ADJUST_CHANNEL_1
+    assert registers["gain"] == round(256 * AMPLITUDES[1] / AMPLITUDES[0])
+
+
+def test_half_sweep_is_rejected():
+    phase = np.linspace(0, np.pi, 200)
+    rawSamples = np.zeros((len(phase), 7), dtype=np.int16)
+    rawSamples[:, 1] = np.round(16000 * np.cos(phase))
+    rawSamples[:, 2] = np.round(16000 * np.sin(phase))
+    with pytest.raises(ValueError):
+        fitCalibration(rawSamples, TMAG5273_XY_ANGLE_CALCULATION, 40, 40)
+
+
+def angleErrors(sensor, count=200):
+    # The first result may have been converted before the last configuration write
+    sensor.readWhenReady(0.1)
+    errors = []
+    for _ in range(count):
+        sample = sensor.readWhenReady(0.1)
+        ideal = math.degrees(math.atan2((sample.y - OFFSETS[1]) / AMPLITUDES[1], (sample.x - OFFSETS[0]) / AMPLITUDES[0]))
+        errors.append(abs((sample.angle - ideal + 180) % 360 - 180))
+    return max(errors)
+
+
+def test_calibrate_simulated_sweep():
+    device, sensor = makeSensor(sweep, noise=0.02)
+    assert angleErrors(sensor) > 5
+    calibration = calibrate(sensor, duration=0.5)
+    assert calibration.offsets == pytest.approx(OFFSETS, abs=0.1)
+    assert calibration.amplitudes == pytest.approx(AMPLITUDES, abs=0.1)
+    assert sensor.getMagneticOffset() != (0, 0)
+    assert angleErrors(sensor) < 0.5
+
+
+def test_failed_calibration_restores_the_configuration():
+    # An offset of 9 mT does not fit the offset register at 40 mT
+    device, sensor = makeSensor(lambda t: (sweep(t)[0] + 7.5,) + sweep(t)[1:])
+    sensor.configure(angle=TMAG5273_XZ_ANGLE_CALCULATION, gain=100, offset_1=5)
+    before = sensor.getConfigBlock()
+    with pytest.raises(ValueError):
+        calibrate(sensor, angle=TMAG5273_XY_ANGLE_CALCULATION, duration=0.3)
+    assert sensor.getConfigBlock() == before
+    assert bytes(device.registers[:len(before) - 1]) == before[:-1]
@@ -0,0 +1,46 @@
+# Configuration getters served from the write-through shadow of the
+# configuration registers instead of bus reads.
+from TMAG5273_RaspberryPi_Library_Defs import *
+from TMAG5273_RaspberryPi_Library import TMAG5273, TMAG5273_CONFIG_BLOCK_LENGTH
+
+
+def test_getters_make_no_bus_traffic(sensor, bus):
+    bus.resetCounters()
+    sensor.getOperatingMode()
+    sensor.getMagneticChannel()
+    sensor.getXYAxisRange()
+    sensor.getZAxisRange()
+    sensor.getTemperatureEN()
+    sensor.getAngleEn()
+    sensor.getSleepTime()
+    assert bus.transactions == 0
+
+
+def test_setter_writes_through(sensor, bus):
+    bus.resetCounters()
+    sensor.setXYAxisRange(TMAG5273_RANGE_80MT)
+    assert bus.bytesWritten > 0 and bus.bytesRead == 0
+    bus.resetCounters()
+    assert sensor.getXYAxisRange() == TMAG5273_RANGE_80MT
+    assert bus.transactions == 0
+
+
+def test_invalidate_reloads_with_one_block_read(sensor, bus, device):
+    # Changed behind the driver's back
+    device.registers[TMAG5273_REG_SENSOR_CONFIG_1] = TMAG5273.setBitFieldValue(
+        device.registers[TMAG5273_REG_SENSOR_CONFIG_1], TMAG5273_X_ENABLE,
+        TMAG5273_CHANNEL_MODE_BITS, TMAG5273_CHANNEL_MODE_LSB)
+    assert sensor.getMagneticChannel() != TMAG5273_X_ENABLE
+    sensor.invalidate()
+    bus.resetCounters()
+    assert sensor.getMagneticChannel() == TMAG5273_X_ENABLE
+    assert sensor.getOperatingMode() == TMAG5273_CONTINUOUS_MEASURE_MODE
+    assert bus.transactions == 1
+    assert bus.bytesRead == TMAG5273_CONFIG_BLOCK_LENGTH
+
+
+def test_refresh_matches_device(sensor, device):
+    device.registers[TMAG5273_REG_T_CONFIG] = 0
+    sensor.refresh()
+    assert sensor.getTemperatureEN() == TMAG5273_TEMPERATURE_DISABLE
+    assert sensor.getConfigBlock() == bytes(device.registers[:TMAG5273_CONFIG_BLOCK_LENGTH])
@@ -0,0 +1,42 @@
+# Batched configure(): one block write of the changed registers verified with
+# one block read-back.
+import pytest
+
+from TMAG5273_RaspberryPi_Library_Defs import *
+from TMAG5273_RaspberryPi_Library import TMAG5273_CONFIG_BLOCK_LENGTH
+
+
+def test_configure_is_one_write_and_one_read_back(sensor, bus, device):
+    bus.resetCounters()
+    sensor.configure(avg=TMAG5273_X8_CONVERSION, channel=TMAG5273_X_Y_ENABLE,
+                     range_xy=TMAG5273_RANGE_80MT, range_z=TMAG5273_RANGE_80MT)
+    assert bus.transactions == 2
+    # DEVICE_CONFIG_1 through SENSOR_CONFIG_2 read back
+    assert bus.bytesRead == TMAG5273_REG_SENSOR_CONFIG_2 - TMAG5273_REG_DEVICE_CONFIG_1 + 1
+    assert sensor.getMagneticChannel() == TMAG5273_X_Y_ENABLE
+    assert sensor.getXYAxisRange() == TMAG5273_RANGE_80MT
+    assert sensor.getConfigBlock() == bytes(device.registers[:TMAG5273_CONFIG_BLOCK_LENGTH])
+
+
+def test_unchanged_configuration_makes_no_bus_traffic(sensor, bus):
+    channel = sensor.getMagneticChannel()
+    bus.resetCounters()
+    sensor.configure(channel=channel)
+    assert bus.transactions == 0
+
+
+def test_invalid_fields_are_rejected_before_writing(sensor, bus):
+    bus.resetCounters()
+    with pytest.raises(ValueError):
+        sensor.configure(avg=TMAG5273_X2_CONVERSION, colour=1)
+    with pytest.raises(ValueError):
+        sensor.configure(mode=TMAG5273_WAKE_UP_AND_SLEEP_MODE + 1)
+    assert bus.transactions == 0
+
+
+def test_failed_read_back_invalidates_the_shadow(sensor, device, monkeypatch):
+    # A device that ignores the write
+    monkeypatch.setattr(device, "writeRegisters", lambda register, values: None)
+    with pytest.raises(RuntimeError):
+        sensor.configure(avg=TMAG5273_X32_CONVERSION)
+    assert sensor.getConfigBlock() == bytes(device.registers[:TMAG5273_CONFIG_BLOCK_LENGTH])
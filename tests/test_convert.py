@@ -0,0 +1,74 @@
+# Block conversion: the NumPy and the pure-Python paths must give identical
+# float32 results, including the extreme codes, and both must agree with
+# the per-sample conversion of the driver.
+import random
+
+import pytest
+
+import TMAG5273_RaspberryPi_Library_Convert as Convert
+from TMAG5273_RaspberryPi_Library_Defs import *
+from TMAG5273_RaspberryPi_Library import TMAG5273_RESULT_BLOCK
+from TMAG5273_RaspberryPi_Library_Convert import convertBlock, convertField
+
+# Unsigned register values of the extremes and around zero
+FIELD_CODES = (0x0000, 0x0001, 0x7FFF, 0x8000, 0x8001, 0xFFFF)
+LAYOUTS = [(TMAG5273_X_Y_Z_ENABLE, True, True, 40, 80),
+           (TMAG5273_X_Y_ENABLE, False, False, 80, 40),
+           (TMAG5273_Z_ENABLE, True, False, 40, 40)]
+
+
+def makeBlock(count=200, seed=1):
+    """Result register bytes: every extreme code on every axis, then random samples"""
+    random.seed(seed)
+    records = [(17508, code, (code + 1) & 0xFFFF, code ^ 0xFFFF, 0x21, 0x1FFF, 0xFF) for code in FIELD_CODES]
+    for _ in range(count):
+        records.append((random.randrange(0x10000), random.randrange(0x10000), random.randrange(0x10000),
+                        random.randrange(0x10000), random.randrange(0x100), random.randrange(0x10000),
+                        random.randrange(0x100)))
+    # Pack as unsigned, the way the registers are read from the bus
+    return b"".join(TMAG5273_RESULT_BLOCK.pack(t, *(value - 0x10000 if value >= 0x8000 else value for value in (x, y, z)),
+                                               status, angle, magnitude)
+                    for t, x, y, z, status, angle, magnitude in records)
+
+
+@pytest.mark.parametrize("layout", LAYOUTS)
+def test_numpy_and_python_paths_are_identical(layout, monkeypatch):
+    np = pytest.importorskip("numpy")
+    block = makeBlock()
+    vectorized = convertBlock(np.frombuffer(block, dtype=np.uint8), layout)
+    monkeypatch.setattr(Convert, "np", None)
+    python = convertBlock(block, layout)
+    assert sorted(vectorized) == sorted(python)
+    for name, values in vectorized.items():
+        assert values.dtype == np.float32
+        assert python[name].typecode == "f"
+        np.testing.assert_array_equal(values, np.array(python[name], dtype=np.float32), err_msg=name)
+
+
+def test_convert_field_sign_extends_unsigned_codes(monkeypatch):
+    np = pytest.importorskip("numpy")
+    expected = [0.0, 40 / 32768, 40 * 0x7FFF / 32768, -40.0, -40 * 0x7FFF / 32768, -40 / 32768]
+    unsigned = np.array(FIELD_CODES, dtype=np.uint16)
+    np.testing.assert_array_equal(convertField(unsigned, 40), np.float32(expected))
+    np.testing.assert_array_equal(convertField(unsigned.view(np.int16), 40), np.float32(expected))
+    monkeypatch.setattr(Convert, "np", None)
+    assert list(convertField(list(FIELD_CODES), 40)) == list(np.float32(expected))
+
+
+def test_block_matches_per_sample_decoding(sensor, monkeypatch):
+    monkeypatch.setattr(Convert, "np", None)
+    layout = sensor.getSampleLayout()
+    block = makeBlock(20)
+    converted = convertBlock(block, layout)
+    for index, rawSample in enumerate(TMAG5273_RESULT_BLOCK.iter_unpack(block)):
+        sample = sensor.decodeSample(rawSample)
+        for name in converted:
+            assert converted[name][index] == pytest.approx(getattr(sample, name), rel=1e-6, abs=1e-6), name
+
+
+@pytest.mark.parametrize("code, signed", [(0x0000, 0), (0x0001, 1), (0x7FFF, 0x7FFF), (0x8000, -0x8000), (0xFFFF, -1)])
+def test_calculate_magnetic_field_sign_extension(sensor, code, signed):
+    for rangeMT in (40, 80):
+        assert sensor.calculateMagneticField(code, rangeMT) == rangeMT * signed / 32768
+        assert sensor.calculateMagneticField(signed, rangeMT) == rangeMT * signed / 32768
+    assert sensor.calculateMagneticField(0x8000, 40) == -40.0
@@ -0,0 +1,102 @@
+# I2C CRC mode: frames of 4 data bytes plus CRC-8 are checked, a corrupted
+# read is repeated and a read that keeps failing raises OSError.
+import pytest
+
+from TMAG5273_RaspberryPi_Library_Defs import *
+from TMAG5273_RaspberryPi_Library import TMAG5273, TMAG5273_RESULT_BLOCK_LENGTH, crc8
+from TMAG5273_RaspberryPi_Library_Sim import SimulatedBus, SimulatedTMAG5273
+from TMAG5273_RaspberryPi_Library_Transport import TMAG5273Transport
+
+
+class CorruptingBus(TMAG5273Transport):
+    """Transport that flips one bit in the data of the next `corrupt` reads"""
+
+    def __init__(self, transport):
+        self.transport = transport
+        self.corrupt = 0
+
+    def _damage(self, data):
+        if self.corrupt and len(data):
+            self.corrupt -= 1
+            data = bytes(data)
+            return bytes((data[0] ^ 0x01,)) + data[1:]
+        return data
+
+    def readByte(self, address, register):
+        return self.transport.readByte(address, register)
+
+    def readBlock(self, address, register, length):
+        return list(self._damage(self.transport.readBlock(address, register, length)))
+
+    def writeByte(self, address, register, value):
+        self.transport.writeByte(address, register, value)
+
+    def writeBlock(self, address, register, values):
+        self.transport.writeBlock(address, register, values)
+
+    def read(self, address, length):
+        return self._damage(self.transport.read(address, length))
+
+    def transfer(self, address, writeData, readLength):
+        return self._damage(self.transport.transfer(address, writeData, readLength))
+
+
+@pytest.fixture
+def crcSensor(field):
+    bus = SimulatedBus([SimulatedTMAG5273(field=lambda t: field)], simulateTiming=False)
+    corrupting = CorruptingBus(bus)
+    sensor = TMAG5273(corrupting)
+    sensor.begin()
+    sensor.setCrcEnabled(TMAG5273_CRC_ENABLE)
+    return sensor, corrupting, bus
+
+
+def referenceCrc8(data):
+    """Bitwise CRC-8, polynomial x^8 + x^2 + x + 1, initial value 0xFF"""
+    crc = 0xFF
+    for byte in data:
+        crc ^= byte
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x07) & 0xFF if crc & 0x80 else (crc << 1) & 0xFF
+    return crc
+
+
+def test_table_driven_crc_matches_bitwise_reference():
+    for data in (b"", b"\x00", b"\xff\xff\xff\xff", bytes(range(4)), bytes(range(200, 256))):
+        assert crc8(data) == referenceCrc8(data)
+
+
+def test_reads_are_framed_and_checked(crcSensor, field):
+    sensor, corrupting, bus = crcSensor
+    sensor.readRawWhenReady()
+    bus.resetCounters()
+    sample = sensor.readSample()
+    assert bus.transactions == 1
+    # 12 data bytes in 3 frames of 4 data bytes plus CRC
+    assert bus.bytesRead == TMAG5273_RESULT_BLOCK_LENGTH // 4 * 5
+    assert sample.x == pytest.approx(field[0], abs=0.01)
+    assert sensor.crcErrorCount == 0
+
+
+@pytest.mark.parametrize("readMode", (TMAG5273_I2C_MODE_3BYTE, TMAG5273_I2C_MODE_1BYTE_16BIT))
+def test_corrupted_frames_are_retried(crcSensor, field, readMode):
+    sensor, corrupting, bus = crcSensor
+    sensor.setReadMode(readMode)
+    sensor.readRawWhenReady()
+    corrupting.corrupt = sensor.crcRetries
+    sample = sensor.readSample()
+    assert sample.x == pytest.approx(field[0], abs=0.01)
+    assert sensor.crcErrorCount == sensor.crcRetries
+    assert sensor.crcFailureCount == 0
+
+
+def test_read_fails_after_all_retries(crcSensor):
+    sensor, corrupting, bus = crcSensor
+    corrupting.corrupt = sensor.crcRetries + 1
+    with pytest.raises(OSError):
+        sensor.readRawSample()
+    assert sensor.crcErrorCount == sensor.crcRetries + 1
+    assert sensor.crcFailureCount == 1
+    # The next read is clean again
+    sensor.readRawSample()
+    assert sensor.crcFailureCount == 1
@@ -0,0 +1,52 @@
+# Data-ready aware acquisition: every conversion is returned exactly once,
+# using the CONV_STATUS byte of the result block as the poll.
+from TMAG5273_RaspberryPi_Library_Defs import *
+from TMAG5273_RaspberryPi_Library import TMAG5273
+from TMAG5273_RaspberryPi_Library_Sim import SimulatedBus, SimulatedTMAG5273
+
+
+class ManualClock:
+    """Time source of the simulated sensor, advanced by the test"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def makeSensor(clock):
+    device = SimulatedTMAG5273(field=lambda t: (1.0, 2.0, 3.0, 25.0), clock=clock)
+    bus = SimulatedBus([device], simulateTiming=False)
+    sensor = TMAG5273(bus)
+    sensor.begin()
+    return sensor, bus, device
+
+
+def test_each_conversion_is_returned_once():
+    clock = ManualClock()
+    sensor, bus, device = makeSensor(clock)
+    setCounts = []
+    for _ in range(10):
+        clock.now += device.conversionTime()
+        bus.resetCounters()
+        rawSample = sensor.readRawWhenReady(0)
+        assert rawSample is not None
+        # The burst read is the poll
+        assert bus.transactions == 1
+        setCounts.append(rawSample[4] >> TMAG5273_CONV_STATUS_SET_COUNT_LSB)
+        assert sensor.readRawWhenReady(0) is None
+    # No conversion skipped or repeated
+    assert all((b - a) % 8 == 1 for a, b in zip(setCounts, setCounts[1:]))
+
+
+def test_wait_for_data_times_out_without_conversions():
+    clock = ManualClock()
+    sensor, bus, device = makeSensor(clock)
+    sensor.readRawWhenReady(0)
+    assert not sensor.waitForData(0.01)
+    assert sensor.readWhenReady(0.01) is None
+    clock.now += device.conversionTime()
+    assert sensor.waitForData(0.01)
+    sample = sensor.readWhenReady(0.01)
+    assert sample is not None and abs(sample.z - 3.0) < 0.01
@@ -0,0 +1,80 @@
+# Angle unwrapping and speed estimation of TMAG5273Encoder.process() on raw
+# angle codes of a known motion, in uneven chunks, for both code paths.
+import math
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from TMAG5273_RaspberryPi_Library import TMAG5273
+from TMAG5273_RaspberryPi_Library_Defs import *
+from TMAG5273_RaspberryPi_Library_Encoder import TMAG5273Encoder
+from TMAG5273_RaspberryPi_Library_Sim import SimulatedBus, SimulatedTMAG5273
+
+SPLITS = (1, 40, 0, 333, 2, 1000, 124)
+RATE = 1000.0
+
+
+def makeEncoder(**options):
+    bus = SimulatedBus([SimulatedTMAG5273()], simulateTiming=False)
+    sensor = TMAG5273(bus)
+    sensor.begin()
+    sensor.configure(angle=TMAG5273_XY_ANGLE_CALCULATION)
+    return TMAG5273Encoder(sensor, **options)
+
+
+def motion():
+    """Positions in degrees of a shaft that speeds up forwards, then turns
+    back, with steps of up to 170 degrees per sample"""
+    count = sum(SPLITS)
+    steps = np.concatenate((np.linspace(0, 170, count // 2), np.full(count - count // 2, -90.0)))
+    position = np.cumsum(steps)
+    angles = np.round((position % 360) * 16).astype(np.int64) % 5760
+    timestamps = np.arange(count) / RATE
+    return position, angles, timestamps
+
+
+def runChunked(process, angles, magnitudes, timestamps):
+    results = []
+    start = 0
+    for size in SPLITS:
+        results.append(process(angles[start:start + size], None if magnitudes is None else magnitudes[start:start + size],
+                               timestamps[start:start + size]))
+        start += size
+    return {field: np.concatenate([np.asarray(getattr(result, field), dtype=np.float64) for result in results])
+            for field in ("position", "revolutions", "rpm", "acceleration", "reliable")}
+
+
+def test_unwrapping_follows_the_motion():
+    encoder = makeEncoder(magnitude=False)
+    position, angles, timestamps = motion()
+    result = runChunked(encoder._processVectorized, angles, None, timestamps)
+    # Angles are quantised to 1/16 degree
+    np.testing.assert_allclose(result["position"], angles[0] / 16 + position - position[0], atol=1 / 32)
+    np.testing.assert_array_equal(result["revolutions"], np.floor(result["position"] / 360))
+    assert encoder.position == pytest.approx(result["position"][-1])
+
+
+def test_speed_of_a_constant_rotation():
+    encoder = makeEncoder(magnitude=False, window=8)
+    count = sum(SPLITS)
+    angles = (np.arange(count) * 16 * 36) % 5760   # 36 degrees per sample
+    result = runChunked(encoder._processVectorized, angles, None, np.arange(count) / RATE)
+    rpm = 36 * RATE * 60 / 360
+    np.testing.assert_allclose(result["rpm"][1:], rpm)
+    np.testing.assert_allclose(result["acceleration"][9:], 0, atol=1e-6)
+
+
+def test_vectorized_and_python_paths_agree():
+    position, angles, timestamps = motion()
+    # Every fourth sample is too weak to be used
+    magnitudes = np.where(np.arange(len(angles)) % 4 == 3, 0, 100)
+    vectorized = makeEncoder()
+    python = makeEncoder()
+    expected = runChunked(vectorized._processVectorized, angles, magnitudes, timestamps)
+    result = runChunked(python._processPython, angles.tolist(), magnitudes.tolist(), timestamps.tolist())
+    for field in expected:
+        np.testing.assert_allclose(result[field], expected[field], equal_nan=True, err_msg=field)
+    assert not expected["reliable"][3::4].any()
+    # Weak samples hold the position
+    np.testing.assert_array_equal(expected["position"][3::4], expected["position"][2::4][:len(expected["position"][3::4])])
@@ -0,0 +1,86 @@
+# Chunked filter stages against per-sample reference loops over the whole
+# signal: the state carried between chunks must make any split of the input
+# give the same output as one chunk.
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from TMAG5273_RaspberryPi_Library_Filter import (TMAG5273Pipeline, DecimateStage, EMAStage, MedianStage,
+                                                 RMSStage)
+
+SAMPLES = 6000
+# Uneven splits, including single samples, an empty chunk and a chunk longer
+# than an EMA run at the smallest alpha
+SPLITS = (1, 7, 0, 2500, 3, 64, 1, 3424)
+
+
+@pytest.fixture
+def signal():
+    rng = np.random.default_rng(1)
+    return np.sin(np.arange(SAMPLES) / 50) * 10 + rng.normal(0, 1, SAMPLES)
+
+
+def runChunked(stage, values):
+    assert sum(SPLITS) == len(values)
+    outputs = []
+    start = 0
+    for size in SPLITS:
+        outputs.append(stage.process({"x": values[start:start + size]}))
+        start += size
+    return {name: np.concatenate([output[name] for output in outputs]) for name in outputs[-1]}
+
+
+def referenceEma(values, alpha):
+    output = np.empty(len(values))
+    previous = values[0]
+    for index, value in enumerate(values):
+        previous = previous + alpha * (value - previous)
+        output[index] = previous
+    return output
+
+
+@pytest.mark.parametrize("alpha", [0.001, 0.05, 0.9, 1.0])
+def test_ema_matches_per_sample_loop(signal, alpha):
+    result = runChunked(EMAStage(alpha), signal)
+    np.testing.assert_allclose(result["x"], referenceEma(signal, alpha), rtol=1e-9, atol=1e-9)
+
+
+@pytest.mark.parametrize("window", [1, 2, 5])
+def test_median_matches_per_sample_loop(signal, window):
+    history = [signal[0]] * (window - 1)
+    expected = []
+    for value in signal:
+        history.append(value)
+        expected.append(np.median(history[-window:]))
+    result = runChunked(MedianStage(window), signal)
+    np.testing.assert_allclose(result["x"], expected)
+
+
+@pytest.mark.parametrize("window", [1, 16])
+def test_rms_and_peak_match_per_sample_loop(signal, window):
+    rms = []
+    peak = []
+    for index in range(len(signal)):
+        recent = signal[max(index - window + 1, 0):index + 1]
+        rms.append(np.sqrt(np.mean(recent * recent)))
+        peak.append(np.max(np.abs(recent)))
+    result = runChunked(RMSStage(window), signal)
+    # The window sums come from a running sum: absolute, not relative, error
+    np.testing.assert_allclose(result["x_rms"], rms, rtol=1e-7, atol=1e-6)
+    np.testing.assert_allclose(result["x_peak"], peak)
+
+
+@pytest.mark.parametrize("average", [True, False])
+def test_decimate_groups_continue_across_chunks(signal, average):
+    groups = signal[:len(signal) - len(signal) % 7].reshape(-1, 7)
+    expected = groups.mean(axis=1) if average else groups[:, -1]
+    result = runChunked(DecimateStage(7, average), signal)
+    np.testing.assert_allclose(result["x"], expected)
+
+
+def test_pipeline_reset_forgets_state(signal):
+    pipeline = TMAG5273Pipeline(MedianStage(5), EMAStage(0.1))
+    first = pipeline.process({"x": signal})
+    pipeline.process({"x": signal[::-1]})
+    pipeline.reset()
+    np.testing.assert_allclose(pipeline.process({"x": signal})["x"], first["x"])
@@ -0,0 +1,53 @@
+# Interrupt driven acquisition with a FakeGpioLine: the reader touches the
+# bus only after an edge, with one burst read per edge.
+import pytest
+
+from TMAG5273_RaspberryPi_Library_Defs import *
+from TMAG5273_RaspberryPi_Library_Interrupt import FakeGpioLine, TMAG5273InterruptReader
+
+
+@pytest.fixture
+def line():
+    line = FakeGpioLine()
+    yield line
+    line.close()
+
+
+def test_edge_gives_one_burst_read(sensor, bus, line, field):
+    reader = TMAG5273InterruptReader(sensor, line)
+    assert sensor.getConfigBlock()[TMAG5273_REG_INT_CONFIG_1] & TMAG5273_INTERRUPT_RESULT_BITS
+    bus.resetCounters()
+    line.trigger(timestampNs=123456789)
+    timestampNs, sample = reader.read(1.0)
+    assert timestampNs == 123456789
+    assert sample.x == pytest.approx(field[0], abs=0.01)
+    assert bus.transactions == 1
+    reader.close()
+    assert sensor.getConfigBlock()[TMAG5273_REG_INT_CONFIG_1] & TMAG5273_INTERRUPT_MODE_BITS == 0
+
+
+def test_timeout_makes_no_bus_traffic(sensor, bus, line):
+    reader = TMAG5273InterruptReader(sensor, line)
+    bus.resetCounters()
+    assert reader.readRaw(0.02) is None
+    assert reader.read(0) is None
+    assert bus.transactions == 0
+
+
+def test_simulated_sensor_drives_the_line(sensor, bus, device, line):
+    sensor.configure(avg=TMAG5273_X8_CONVERSION)
+    line.connect(device)
+    with TMAG5273InterruptReader(sensor, line) as reader:
+        device.start()
+        try:
+            bus.resetCounters()
+            setCounts = []
+            for _ in range(5):
+                timestampNs, rawSample = reader.readRaw(1.0)
+                setCounts.append(rawSample[4] >> TMAG5273_CONV_STATUS_SET_COUNT_LSB)
+            transactions = bus.transactions
+        finally:
+            device.stop()
+    # One transaction per interrupt, each one a new conversion
+    assert transactions == 5
+    assert all(a != b for a, b in zip(setCounts, setCounts[1:]))
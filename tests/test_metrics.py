@@ -0,0 +1,64 @@
+# Bus metrics: InstrumentedTransport counts against the simulated bus's own
+# accounting, errors, hooks and the Prometheus export.
+import math
+
+import pytest
+
+from TMAG5273_RaspberryPi_Library_Defs import *
+from TMAG5273_RaspberryPi_Library import TMAG5273, TMAG5273_RESULT_BLOCK_LENGTH
+from TMAG5273_RaspberryPi_Library_Metrics import InstrumentedTransport, TMAG5273Metrics
+
+
+def test_counters_match_the_bus(sensor, bus):
+    metrics = sensor.enableMetrics()
+    assert isinstance(sensor.transport, InstrumentedTransport)
+    bus.resetCounters()
+    for _ in range(5):
+        sensor.readRawSample()
+    sensor.configure(avg=TMAG5273_X2_CONVERSION)
+    values = metrics.snapshot()[hex(sensor.address)]
+    assert values["transactions"] == {"readBlock": 6, "writeBlock": 1}
+    assert values["registers"]["readBlock"][hex(TMAG5273_REG_T_MSB_RESULT)] == 5
+    assert values["bytes_read"] == bus.bytesRead == 5 * TMAG5273_RESULT_BLOCK_LENGTH + 1
+    assert values["bytes_written"] == bus.bytesWritten
+    assert values["latency"]["readBlock"]["count"] == 6
+    assert values["latency"]["readBlock"]["buckets"][math.inf] == 6
+    assert values["crc_errors"] == values["crc_failures"] == values["por_recoveries"] == 0
+
+
+def test_errors_and_hooks(bus):
+    metrics = TMAG5273Metrics()
+    calls = []
+    metrics.addHook(lambda *args: calls.append(args))
+    missing = TMAG5273(bus, 0x40)
+    missing.enableMetrics(metrics)
+    assert not missing.isConnected()
+    values = metrics.snapshot()["0x40"]
+    assert values["errors"]["readBlock"] == values["transactions"]["readBlock"] == 1
+    assert values["bytes_read"] == 0
+    address, op, register, length, duration, error = calls[0]
+    assert (address, op, register) == (0x40, "readBlock", TMAG5273_REG_MANUFACTURER_ID_LSB)
+    assert isinstance(error, OSError)
+
+
+def test_disable_restores_the_plain_transport(sensor, bus):
+    metrics = sensor.enableMetrics()
+    sensor.readRawSample()
+    sensor.disableMetrics()
+    assert sensor.transport is bus and sensor.metrics is None
+    sensor.readRawSample()
+    assert metrics.snapshot()[hex(sensor.address)]["transactions"]["readBlock"] == 1
+    assert "crc_errors" not in metrics.snapshot()[hex(sensor.address)]
+
+
+def test_prometheus_export(sensor):
+    metrics = sensor.enableMetrics()
+    sensor.readRawWhenReady()
+    text = metrics.prometheus()
+    address = hex(sensor.address)
+    assert "# TYPE tmag5273_i2c_transactions_total counter" in text
+    assert f'tmag5273_i2c_latency_seconds_bucket{{address="{address}",op="readBlock",le="+Inf"}}' in text
+    assert f'tmag5273_crc_errors_total{{address="{address}"}} 0' in text
+    age = [line for line in text.splitlines() if line.startswith("tmag5273_seconds_since_fresh_conversion{")]
+    assert len(age) == 1 and float(age[0].split()[-1]) >= 0
+    assert text.endswith("\n")
@@ -0,0 +1,57 @@
+# Acquisition planner: the read lengths and bus times it plans with must be
+# what the driver really transfers, measured on the simulated bus.
+import pytest
+
+from TMAG5273_RaspberryPi_Library_Defs import *
+from TMAG5273_RaspberryPi_Library import TMAG5273, TMAG5273_RESULT_BLOCK_LENGTH
+from TMAG5273_RaspberryPi_Library_Planner import calculateTransactionTime, configureForRate, planAcquisition
+from TMAG5273_RaspberryPi_Library_Sim import SimulatedBus, SimulatedTMAG5273
+
+READ_MODES = (TMAG5273_I2C_MODE_3BYTE, TMAG5273_I2C_MODE_1BYTE_16BIT, TMAG5273_I2C_MODE_1BYTE_8BIT)
+
+
+def test_read_length():
+    assert TMAG5273.calculateReadLength(TMAG5273_I2C_MODE_3BYTE, TMAG5273_X_ENABLE, False) == TMAG5273_RESULT_BLOCK_LENGTH
+    # Channels plus CONV_STATUS
+    assert TMAG5273.calculateReadLength(TMAG5273_I2C_MODE_1BYTE_16BIT, TMAG5273_X_Y_Z_ENABLE, True) == 9
+    assert TMAG5273.calculateReadLength(TMAG5273_I2C_MODE_1BYTE_8BIT, TMAG5273_X_Y_ENABLE, False) == 3
+
+
+@pytest.mark.parametrize("readMode", READ_MODES)
+@pytest.mark.parametrize("crc", (False, True))
+@pytest.mark.parametrize("channelMode, temperature", ((TMAG5273_X_Y_Z_ENABLE, True), (TMAG5273_Y_Z_ENABLE, False)))
+def test_transaction_time_matches_the_bus(readMode, crc, channelMode, temperature):
+    bus = SimulatedBus([SimulatedTMAG5273()], busHz=1000000, transactionOverhead=20e-6, simulateTiming=False)
+    sensor = TMAG5273(bus)
+    sensor.begin()
+    sensor.configure(channel=channelMode, read_mode=readMode, crc=TMAG5273_CRC_ENABLE if crc else TMAG5273_CRC_DISABLE,
+                     temperature=TMAG5273_TEMPERATURE_ENABLE if temperature else TMAG5273_TEMPERATURE_DISABLE)
+    bus.resetCounters()
+    sensor.readRawSample()
+    assert bus.transactions == 1
+    assert calculateTransactionTime(readMode, channelMode, temperature, crc, 1000000, 20e-6) == pytest.approx(bus.busTime)
+    if not crc:
+        assert bus.bytesRead == TMAG5273.calculateReadLength(readMode, channelMode, temperature)
+
+
+def test_plan_picks_the_highest_averaging_that_keeps_up():
+    for rate in (10, 100, 1000):
+        plan = planAcquisition(rate)
+        assert plan.fits and plan.conversionRate >= rate
+        if plan.avg < TMAG5273_X32_CONVERSION:
+            assert 1 / TMAG5273.calculateConversionTime(plan.avg + 1, TMAG5273_X_Y_Z_ENABLE, True) < rate
+        assert plan.busUtilisation == pytest.approx(rate * plan.transactionTime)
+    assert planAcquisition(100).noiseFactor < planAcquisition(1000).noiseFactor
+    crowded = planAcquisition(1000, sensors=64)
+    assert not crowded.fits and crowded.maxRate < 1000
+    with pytest.raises(ValueError):
+        planAcquisition(0)
+
+
+def test_configure_for_rate(sensor, bus):
+    plan = configureForRate(sensor, 200)
+    assert sensor.getConfigBlock()[TMAG5273_REG_DEVICE_CONFIG_1] & TMAG5273_CONV_AVG_BITS == plan.avg << TMAG5273_CONV_AVG_LSB
+    bus.resetCounters()
+    with pytest.raises(ValueError):
+        configureForRate(sensor, 1000, sensors=64)
+    assert bus.transactions == 0
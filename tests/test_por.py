@@ -0,0 +1,69 @@
+# Power-on reset recovery: a simulated brown-out returns the sensor to its
+# defaults, and the next read restores the configuration snapshot, in every
+# read mode and in triggered acquisition.
+import pytest
+
+from TMAG5273_RaspberryPi_Library_Defs import *
+from TMAG5273_RaspberryPi_Library import TMAG5273, TMAG5273_CONFIG_BLOCK_LENGTH
+
+CONFIGURATION = dict(avg=TMAG5273_X4_CONVERSION, channel=TMAG5273_X_Y_Z_ENABLE, range_xy=TMAG5273_RANGE_80MT)
+
+
+def deviceConfig(device):
+    return bytes(device.registers[:TMAG5273_REG_I2C_ADDRESS])
+
+
+def assertRecovered(sensor, device, field, rawSample):
+    assert sensor.porRecoveryCount == 1
+    assert deviceConfig(device) == sensor.getConfigBlock()[:TMAG5273_REG_I2C_ADDRESS]
+    assert not device.registers[TMAG5273_REG_CONV_STATUS] & TMAG5273_CONV_STATUS_POR_BITS
+    assert rawSample is not None
+    assert sensor.decodeSample(rawSample).x == pytest.approx(field[0], abs=0.01)
+
+
+def test_snapshot_follows_configuration_writes(sensor, device):
+    snapshot = sensor.snapshotConfig()
+    assert snapshot == sensor.getConfigBlock()
+    sensor.configure(**CONFIGURATION)
+    device.powerOnReset()
+    assert deviceConfig(device) != sensor.getConfigBlock()[:TMAG5273_REG_I2C_ADDRESS]
+    sensor.restoreConfig()
+    assert deviceConfig(device) == sensor.getConfigBlock()[:TMAG5273_REG_I2C_ADDRESS]
+    # An older snapshot can be restored explicitly
+    sensor.restoreConfig(snapshot)
+    assert deviceConfig(device) == snapshot[:TMAG5273_REG_I2C_ADDRESS]
+
+
+@pytest.mark.parametrize("crc", (TMAG5273_CRC_DISABLE, TMAG5273_CRC_ENABLE))
+@pytest.mark.parametrize("readMode", (TMAG5273_I2C_MODE_3BYTE, TMAG5273_I2C_MODE_1BYTE_16BIT, TMAG5273_I2C_MODE_1BYTE_8BIT))
+def test_polling_read_recovers(sensor, device, field, crc, readMode):
+    sensor.configure(crc=crc, read_mode=readMode, **CONFIGURATION)
+    assert sensor.readRawWhenReady() is not None
+    device.powerOnReset()
+    rawSample = sensor.readRawWhenReady()
+    assertRecovered(sensor, device, field, rawSample)
+    assert sensor.crcFailureCount == 0
+
+
+@pytest.mark.parametrize("crc", (TMAG5273_CRC_DISABLE, TMAG5273_CRC_ENABLE))
+def test_triggered_read_recovers(sensor, device, field, crc):
+    sensor.configure(crc=crc, **CONFIGURATION)
+    assert sensor.triggerAndReadRaw() is not None
+    device.powerOnReset()
+    rawSample = sensor.triggerAndReadRaw()
+    assertRecovered(sensor, device, field, rawSample)
+    assert sensor.getOperatingMode() == TMAG5273_STANDBY_BY_MODE
+
+
+def test_recovery_can_be_switched_off(sensor, device):
+    sensor.porRecovery = False
+    device.powerOnReset()
+    rawSample = sensor.readRawSample()
+    assert rawSample[4] & TMAG5273_CONV_STATUS_POR_BITS
+    assert sensor.porRecoveryCount == 0
+
+
+def test_restore_needs_a_snapshot(bus):
+    sensor = TMAG5273(bus)
+    with pytest.raises(RuntimeError):
+        sensor.restoreConfig()
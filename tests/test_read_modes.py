@@ -0,0 +1,56 @@
+# 1-byte I2C read modes: only the enabled channels and CONV_STATUS are
+# transferred, without a register address phase, and decode to the same
+# values as the standard 3-byte read (to the MSB in the 8-bit mode).
+import pytest
+
+from TMAG5273_RaspberryPi_Library_Defs import *
+
+CHANNEL_MODES = (TMAG5273_X_ENABLE, TMAG5273_X_Y_ENABLE, TMAG5273_Y_Z_ENABLE, TMAG5273_X_Y_Z_ENABLE)
+
+
+def readFresh(sensor):
+    rawSample = sensor.readRawWhenReady()
+    assert rawSample is not None
+    return rawSample
+
+
+@pytest.mark.parametrize("channelMode", CHANNEL_MODES)
+@pytest.mark.parametrize("temperature", (TMAG5273_TEMPERATURE_DISABLE, TMAG5273_TEMPERATURE_ENABLE))
+def test_one_byte_modes_match_standard_read(sensor, bus, channelMode, temperature):
+    sensor.configure(channel=channelMode, temperature=temperature)
+    reference = readFresh(sensor)
+    axes = TMAG5273_CHANNEL_MODE_AXES[channelMode]
+    slots = ([0] if temperature else []) + [slot for axis, slot in ((TMAG5273_AXIS_X, 1), (TMAG5273_AXIS_Y, 2), (TMAG5273_AXIS_Z, 3)) if axes & axis]
+
+    sensor.setReadMode(TMAG5273_I2C_MODE_1BYTE_16BIT)
+    readFresh(sensor)
+    bus.resetCounters()
+    rawSample = sensor.readRawSample()
+    assert (bus.transactions, bus.bytesWritten) == (1, 0)
+    assert bus.bytesRead == 2 * len(slots) + 1
+    assert [rawSample[slot] for slot in slots] == [reference[slot] for slot in slots]
+    assert all(rawSample[slot] == 0 for slot in (0, 1, 2, 3, 5, 6) if slot not in slots)
+
+    sensor.setReadMode(TMAG5273_I2C_MODE_1BYTE_8BIT)
+    readFresh(sensor)
+    bus.resetCounters()
+    rawSample = sensor.readRawSample()
+    assert bus.bytesRead == len(slots) + 1
+    # MSB only, sign kept for the axes
+    assert [rawSample[slot] for slot in slots] == [(reference[slot] >> 8) << 8 for slot in slots]
+    assert rawSample[4] & TMAG5273_CONV_STATUS_RESULT_STATUS_BITS
+
+
+def test_decoded_values_in_eight_bit_mode(sensor, field):
+    sensor.configure(channel=TMAG5273_X_Y_Z_ENABLE, range_xy=TMAG5273_RANGE_40MT, range_z=TMAG5273_RANGE_40MT)
+    sensor.setReadMode(TMAG5273_I2C_MODE_1BYTE_8BIT)
+    sample = sensor.decodeSample(readFresh(sensor))
+    # One MSB step of the 40 mT range
+    step = 40 * 256 / 32768
+    for value, expected in zip((sample.x, sample.y, sample.z), field):
+        assert expected - step < value <= expected
+
+
+def test_invalid_read_mode(sensor):
+    with pytest.raises(ValueError):
+        sensor.setReadMode(TMAG5273_I2C_MODE_1BYTE_8BIT + 1)
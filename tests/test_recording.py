@@ -0,0 +1,90 @@
+# Binary recordings: the recorded configuration and samples read back
+# unchanged, with and without NumPy, and time slices find the right records.
+from array import array
+
+import pytest
+
+import TMAG5273_RaspberryPi_Library_Recording as Recording
+from TMAG5273_RaspberryPi_Library_Defs import *
+from TMAG5273_RaspberryPi_Library_Recording import TMAG5273Recorder, TMAG5273Recording
+
+# 1 ms between records, starting at an arbitrary monotonic time
+START_NS = 5_000_000_000
+PERIOD_NS = 1_000_000
+
+
+def rawSamples(count):
+    """Raw samples covering the unsigned registers' upper halves"""
+    return [(0x8000 + index, index - 50, -index, 0x7FFF - index, ((index % 8) << 5) | 0x01, 0x1680 + index, 0x80 + index % 100)
+            for index in range(count)]
+
+
+@pytest.fixture(params=("numpy", "python"))
+def numpyMode(request, monkeypatch):
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(Recording, "np", None)
+    return request.param
+
+
+def writeRecording(path, sensor, samples):
+    with TMAG5273Recorder(path, sensor) as recorder:
+        for index, rawSample in enumerate(samples):
+            recorder.write(rawSample, START_NS + index * PERIOD_NS)
+    return path
+
+
+def test_round_trip(tmp_path, sensor, numpyMode):
+    samples = rawSamples(100)
+    with TMAG5273Recording(writeRecording(tmp_path / "capture.bin", sensor, samples)) as recording:
+        assert len(recording) == 100
+        assert recording.address == sensor.address
+        assert recording.config == sensor.getConfigBlock()
+        assert recording.layout == sensor.getSampleLayout()
+        assert [rawSample for timestampNs, rawSample in recording] == samples
+        assert recording[-1] == (START_NS + 99 * PERIOD_NS, samples[-1])
+        converted = recording.convert()
+        for name, values in converted.items():
+            if name == "timestamp":
+                assert list(values) == pytest.approx([index / 1000 for index in range(100)])
+                continue
+            decoded = [getattr(sensor.decodeSample(rawSample), name) for rawSample in samples]
+            assert list(values) == pytest.approx(decoded, rel=1e-6, abs=1e-6)
+
+
+def test_time_slice(tmp_path, sensor, numpyMode):
+    with TMAG5273Recording(writeRecording(tmp_path / "capture.bin", sensor, rawSamples(100))) as recording:
+        assert recording.indexRange(0.010, 0.0205) == (10, 21)
+        assert recording.indexRange(None, 0.005) == (0, 5)
+        assert recording.indexRange(0.5, None) == (100, 100)
+        records = recording.timeSlice(0.010, 0.013)
+        assert len(records) == 3
+        assert list(recording.convert(records)["timestamp"]) == pytest.approx([0.010, 0.011, 0.012])
+
+
+def test_block_from_a_stream_matches_single_writes(tmp_path, sensor):
+    samples = rawSamples(20)
+    # A stream stores every field as int16
+    flat = array("h", [value - 0x10000 if value >= 0x8000 else value for rawSample in samples for value in rawSample])
+    timestamps = [(START_NS + index * PERIOD_NS) / 1e9 for index in range(20)]
+    with TMAG5273Recorder(tmp_path / "block.bin", sensor) as recorder:
+        recorder.writeBlock(flat, timestamps)
+        assert recorder.count == 20
+    single = writeRecording(tmp_path / "single.bin", sensor, samples)
+    with TMAG5273Recording(tmp_path / "block.bin") as block, TMAG5273Recording(single) as reference:
+        assert list(block) == list(reference)
+
+
+def test_truncated_and_foreign_files(tmp_path, sensor):
+    path = writeRecording(tmp_path / "capture.bin", sensor, rawSamples(10))
+    with open(path, "ab") as file:
+        file.write(b"\x01\x02\x03")
+    with TMAG5273Recording(path) as recording:
+        assert len(recording) == 10
+    foreign = tmp_path / "foreign.bin"
+    foreign.write_bytes(bytes(200))
+    with pytest.raises(ValueError):
+        TMAG5273Recording(foreign)
+    with pytest.raises(ValueError):
+        TMAG5273Recorder(tmp_path / "none.bin")
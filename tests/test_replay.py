@@ -0,0 +1,103 @@
+# Replay of recordings through the unchanged driver: a recording of the
+# simulated sensor replays to the same samples, paced by its timestamps or
+# at full speed.
+import pytest
+
+import TMAG5273_RaspberryPi_Library_Replay as Replay
+from TMAG5273_RaspberryPi_Library_Defs import *
+from TMAG5273_RaspberryPi_Library import TMAG5273
+from TMAG5273_RaspberryPi_Library_Recording import TMAG5273Recorder, TMAG5273Recording
+from TMAG5273_RaspberryPi_Library_Replay import ReplayTransport, ReplayedTMAG5273, replayBlocks
+from TMAG5273_RaspberryPi_Library_Sim import SimulatedBus, SimulatedTMAG5273
+
+COUNT = 50
+PERIOD_NS = 10_000_000
+
+
+class ManualClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def recorded(tmp_path):
+    """Recording of COUNT conversions of a changing field, 10 ms apart"""
+    device = SimulatedTMAG5273(field=lambda t: (10.0 * (t % 1), -5.0, 3.0 * (t % 1), 25.0), noise=0.5)
+    sensor = TMAG5273(SimulatedBus([device], simulateTiming=False))
+    sensor.begin()
+    sensor.configure(channel=TMAG5273_X_Y_Z_ENABLE, range_xy=TMAG5273_RANGE_40MT)
+    samples = []
+    path = tmp_path / "capture.bin"
+    with TMAG5273Recorder(path, sensor) as recorder:
+        for index in range(COUNT):
+            rawSample = sensor.readRawWhenReady()
+            recorder.write(rawSample, index * PERIOD_NS)
+            samples.append(rawSample)
+    return path, samples
+
+
+def test_full_speed_replay_returns_every_record_once(recorded):
+    path, samples = recorded
+    with ReplayTransport(path, realTime=False) as transport:
+        sensor = TMAG5273(transport, transport.recording.address)
+        sensor.begin()
+        replayed = [sensor.readRawSample() for _ in range(COUNT)]
+        assert transport.device.finished
+    assert replayed == samples
+
+
+def test_loop_starts_over(recorded):
+    path, samples = recorded
+    with ReplayTransport(path, realTime=False, loop=True) as transport:
+        sensor = TMAG5273(transport, transport.recording.address)
+        replayed = [sensor.readRawSample() for _ in range(COUNT + 2)]
+        assert not transport.device.finished
+    assert replayed[COUNT][1:4] == samples[0][1:4]
+    assert replayed[COUNT + 1][1:4] == samples[1][1:4]
+
+
+def test_real_time_replay_follows_the_timestamps(recorded):
+    path, samples = recorded
+    clock = ManualClock()
+    with TMAG5273Recording(path) as recording:
+        device = ReplayedTMAG5273(recording, realTime=True, speed=2.0, clock=clock)
+        assert device.index == -1
+        for index in (0, 7, 31, COUNT - 1):
+            clock.now = index * PERIOD_NS / 1e9 / 2.0
+            device.update()
+            assert device.index == index
+            assert bytes(device.registers[TMAG5273_REG_X_MSB_RESULT:TMAG5273_REG_X_MSB_RESULT + 2]) == \
+                bytes(recording.resultBytes(index)[2:4])
+        assert device.finished
+
+
+def test_changed_range_is_rescaled(recorded):
+    path, samples = recorded
+    with ReplayTransport(path, realTime=False) as transport:
+        sensor = TMAG5273(transport, transport.recording.address)
+        sensor.begin()
+        sensor.configure(range_xy=TMAG5273_RANGE_80MT)
+        transport.device.restart()
+        sample = sensor.readSample()
+    x = TMAG5273.calculateMagneticField(sensor, samples[0][1], 40)
+    assert sample.x == pytest.approx(x, abs=80 / 32768)
+
+
+@pytest.mark.parametrize("withNumpy", (True, False))
+def test_blocks_cover_the_recording(recorded, monkeypatch, withNumpy):
+    if withNumpy:
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(Replay, "np", None)
+        monkeypatch.setattr("TMAG5273_RaspberryPi_Library_Recording.np", None)
+    path, samples = recorded
+    with TMAG5273Recording(path) as recording:
+        blocks = list(replayBlocks(recording, blockSize=16))
+        assert [len(block) for block in blocks] == [16, 16, 16, 2]
+        x = [value for block in blocks for value in recording.convert(block)["x"]]
+        assert x == pytest.approx(list(recording.convert()["x"]))
+        sliced = list(replayBlocks(recording, blockSize=16, start=0.1, end=0.2))
+        assert sum(len(block) for block in sliced) == 10
@@ -0,0 +1,106 @@
+# Acquisition server: an in-process server on the simulated sensor publishes
+# into the shared ring; readers see the samples in order, count the ones
+# overwritten before they got to them, and control clients reconfigure the
+# sensor between reads.
+import os
+import time
+
+import pytest
+
+import TMAG5273_RaspberryPi_Library_Server as Server
+from TMAG5273_RaspberryPi_Library_Defs import *
+from TMAG5273_RaspberryPi_Library_Server import TMAG5273ControlClient, TMAG5273Server, TMAG5273SharedReader
+
+
+@pytest.fixture
+def name(request):
+    """Shared memory name unique to the test"""
+    return f"tmag5273-test-{os.getpid()}-{request.node.name}".replace("[", "-").replace("]", "")
+
+
+@pytest.fixture(params=("numpy", "python"))
+def numpyMode(request, monkeypatch):
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(Server, "np", None)
+    return request.param
+
+
+def waitForHead(reader, head, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while reader.head < head:
+        assert time.monotonic() < deadline, "server stopped publishing"
+        time.sleep(0.001)
+
+
+def timestampsOf(block):
+    if Server.np is not None:
+        return [int(timestamp) for timestamp in block["timestamp"]]
+    return [timestampNs for timestampNs, rawSample in block]
+
+
+def test_readers_get_the_samples_in_order(sensor, name, field, numpyMode):
+    with TMAG5273Server(sensor, name, capacity=1024) as server:
+        with TMAG5273SharedReader(name) as first:
+            assert first.address == sensor.address
+            assert first.layout == sensor.getSampleLayout()
+            waitForHead(first, 20)
+            with TMAG5273SharedReader(name, latest=True) as second:
+                assert second.position >= 20
+                block = first.read(10)
+                assert len(block) == 10 and first.position == 10
+                if numpyMode == "numpy":
+                    assert list(block["seq"]) == list(range(1, 11))
+                block = first.read(timeout=1.0)
+                converted = first.convert(block)
+                assert list(converted["x"]) == pytest.approx([field[0]] * len(block), abs=0.01)
+                assert timestampsOf(block) == sorted(timestampsOf(block))
+                # Independent read positions
+                assert len(second.read(timeout=1.0)) >= 1
+                assert first.droppedCount == second.droppedCount == 0
+        assert server.status()["samples"] >= 20
+
+
+def test_overwritten_samples_are_counted(sensor, name, numpyMode):
+    with TMAG5273Server(sensor, name, capacity=8):
+        with TMAG5273SharedReader(name) as reader:
+            waitForHead(reader, 40)
+            block = reader.read(100)
+            assert 0 < len(block) <= 8
+            assert reader.droppedCount >= 40 - 8
+            # Every sample passed was either returned or counted
+            assert reader.position == len(block) + reader.droppedCount
+            if numpyMode == "numpy":
+                assert list(block["seq"]) == list(range(int(block["seq"][0]), int(block["seq"][0]) + len(block)))
+
+
+def test_control_channel(sensor, name):
+    with TMAG5273Server(sensor, name) as server:
+        with TMAG5273SharedReader(name) as reader, TMAG5273ControlClient(name) as client:
+            assert reader.generation == 0
+            config = client.configure(avg=TMAG5273_X4_CONVERSION, channel=TMAG5273_X_Y_ENABLE)
+            assert config == sensor.getConfigBlock() == client.config() == reader.config
+            assert reader.generation == 1
+            assert reader.layout[0] == TMAG5273_X_Y_ENABLE
+            status = client.status()
+            assert status["name"] == name and status["generation"] == 1 and status["running"]
+            with pytest.raises(RuntimeError):
+                client.configure(colour=1)
+            with pytest.raises(RuntimeError):
+                client._request("reboot")
+            # Samples taken after the change carry the new generation
+            head = reader.head
+            waitForHead(reader, head + 2)
+            if Server.np is not None:
+                reader.position = head
+                assert reader.read()["generation"][-1] == 1
+        assert server.errorCount == 0
+    assert not os.path.exists(Server.controlAddress(name))
+    with pytest.raises(FileNotFoundError):
+        TMAG5273SharedReader(name)
+
+
+def test_invalid_capacity(sensor, name):
+    with pytest.raises(ValueError):
+        TMAG5273Server(sensor, name, capacity=0)
@@ -0,0 +1,83 @@
+# Simulated TMAG5273 and bus: register map, conversion timing, address
+# changes and the transaction accounting that tests and benchmarks rely on.
+import errno
+import time
+
+import pytest
+
+import TMAG5273_RaspberryPi_Library_Transport as Transport
+from TMAG5273_RaspberryPi_Library_Defs import *
+from TMAG5273_RaspberryPi_Library import TMAG5273
+from TMAG5273_RaspberryPi_Library_Sim import SimulatedBus, SimulatedTMAG5273
+from TMAG5273_RaspberryPi_Library_Transport import SMBusTransport
+
+
+class ManualClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_unknown_address_is_not_acknowledged(bus):
+    with pytest.raises(OSError) as error:
+        bus.readByte(0x40, TMAG5273_REG_DEVICE_ID)
+    assert error.value.errno == errno.EREMOTEIO
+    assert not TMAG5273(bus, 0x40).isConnected()
+    assert TMAG5273(bus).isConnected()
+
+
+def test_transaction_accounting(bus):
+    bus.readBlock(TMAG5273_I2C_ADDRESS_INITIAL, TMAG5273_REG_T_MSB_RESULT, 12)
+    bus.writeBlock(TMAG5273_I2C_ADDRESS_INITIAL, TMAG5273_REG_X_THR_CONFIG, (1, 2, 3))
+    bus.read(TMAG5273_I2C_ADDRESS_INITIAL, 4)
+    assert bus.transactions == 3
+    assert bus.bytesRead == 12 + 4
+    assert bus.bytesWritten == 1 + 4
+    # Address bytes, payload and start/stop at 9 clocks per byte
+    assert bus.busTime == pytest.approx(((2 + 1 + 12) * 9 + 2 + (1 + 4) * 9 + 2 + (1 + 4) * 9 + 2) / 400000)
+    bus.resetCounters()
+    assert (bus.transactions, bus.bytesRead, bus.bytesWritten, bus.busTime) == (0, 0, 0, 0.0)
+
+
+def test_simulated_timing_takes_the_bus_time(device):
+    bus = SimulatedBus([device], busHz=100000, transactionOverhead=0.002)
+    start = time.monotonic()
+    for _ in range(5):
+        bus.readByte(TMAG5273_I2C_ADDRESS_INITIAL, TMAG5273_REG_CONV_STATUS)
+    assert time.monotonic() - start >= bus.busTime >= 5 * 0.002
+
+
+def test_conversions_follow_the_configured_timing():
+    clock = ManualClock()
+    device = SimulatedTMAG5273(clock=clock)
+    sensor = TMAG5273(SimulatedBus([device], simulateTiming=False))
+    sensor.begin()
+    sensor.configure(avg=TMAG5273_X4_CONVERSION, channel=TMAG5273_X_Y_Z_ENABLE)
+    assert device.conversionTime() == pytest.approx(sensor.getConversionTime())
+    count = device.conversionCount
+    clock.now += 10.5 * device.conversionTime()
+    device.update()
+    assert device.conversionCount == count + 10
+    sensor.setOperatingMode(TMAG5273_STANDBY_BY_MODE)
+    clock.now += 10 * device.conversionTime()
+    device.update()
+    assert device.conversionCount == count + 10
+
+
+def test_address_change_and_power_on_reset(bus, device):
+    sensor = TMAG5273(bus)
+    sensor.begin()
+    sensor.setI2CAddress(0x30)
+    assert device.address == 0x30 and sensor.isConnected()
+    device.powerOnReset()
+    assert device.address == TMAG5273_I2C_ADDRESS_INITIAL
+    assert device.registers[TMAG5273_REG_CONV_STATUS] & TMAG5273_CONV_STATUS_POR_BITS
+    assert TMAG5273(bus).getManufacturerID() == TMAG5273_DEVICE_ID_VALUE
+
+
+def test_smbus_transport_needs_smbus2(monkeypatch):
+    monkeypatch.setattr(Transport, "SMBus", None)
+    with pytest.raises(ImportError):
+        SMBusTransport(1)
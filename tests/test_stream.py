@@ -0,0 +1,87 @@
+# Ring-buffered acquisition thread: order of the samples, the two overflow
+# policies and the counters of failed reads.
+import threading
+import time
+
+import pytest
+
+from TMAG5273_RaspberryPi_Library_Stream import (TMAG5273Stream, TMAG5273_STREAM_BLOCK, TMAG5273_STREAM_DROP_OLDEST,
+                                                 TMAG5273_STREAM_FIELDS)
+
+
+class CountingReader:
+    """Reader returning count numbered raw samples, then timeouts. Raises
+    OSError instead of the samples numbered in failAt."""
+
+    def __init__(self, count, failAt=()):
+        self.count = count
+        self.failAt = set(failAt)
+        self.index = 0
+        self.done = threading.Event()
+
+    def __call__(self, timeout):
+        if self.index >= self.count:
+            self.done.set()
+            time.sleep(0.001)
+            return None
+        index = self.index
+        self.index += 1
+        if index in self.failAt:
+            raise OSError(121, "Remote I/O error")
+        return (index, -index, index, 0, 1, 0, 0)
+
+
+def sequence(samples):
+    return [samples[i] for i in range(0, len(samples), TMAG5273_STREAM_FIELDS)]
+
+
+def test_drop_oldest_keeps_the_newest_samples():
+    reader = CountingReader(100)
+    stream = TMAG5273Stream(None, capacity=16, overflow=TMAG5273_STREAM_DROP_OLDEST, reader=reader)
+    with stream:
+        assert reader.done.wait(5)
+    samples, timestamps = stream.readChunk(100, timeout=0)
+    assert sequence(samples) == list(range(84, 100))
+    assert list(timestamps) == sorted(timestamps)
+    assert stream.droppedCount == 84
+    assert stream.timeoutCount > 0
+
+
+def test_block_loses_no_samples():
+    reader = CountingReader(100)
+    stream = TMAG5273Stream(None, capacity=8, overflow=TMAG5273_STREAM_BLOCK, reader=reader)
+    received = []
+    with stream:
+        while len(received) < 100:
+            samples, timestamps = stream.readChunk(5, timeout=5)
+            assert len(timestamps)
+            received += sequence(samples)
+    assert received == list(range(100))
+    assert stream.droppedCount == 0
+    assert stream.blockedCount > 0
+
+
+def test_bus_errors_are_counted_and_skipped():
+    reader = CountingReader(10, failAt=(3, 7))
+    stream = TMAG5273Stream(None, capacity=16, reader=reader)
+    with stream:
+        assert reader.done.wait(5)
+    samples, timestamps = stream.readChunk(16, timeout=0)
+    assert sequence(samples) == [0, 1, 2, 4, 5, 6, 8, 9]
+    assert stream.errorCount == 2
+
+
+def test_stream_from_simulated_sensor(sensor, field):
+    with TMAG5273Stream(sensor, capacity=64, timeout=0.1) as stream:
+        it = iter(stream)
+        readings = [next(it) for _ in range(5)]
+    assert len(readings) == 5
+    for timestamp, rawSample in readings:
+        assert sensor.decodeSample(rawSample).x == pytest.approx(field[0], abs=0.01)
+
+
+def test_invalid_arguments():
+    with pytest.raises(ValueError):
+        TMAG5273Stream(None, capacity=0, reader=CountingReader(0))
+    with pytest.raises(ValueError):
+        TMAG5273Stream(None, overflow=2, reader=CountingReader(0))
@@ -0,0 +1,85 @@
+# Threshold codes and wake-up and sleep monitoring: the interrupt of the
+# simulated sensor and getTrippedAxes() must agree on when a threshold trips.
+import pytest
+
+from TMAG5273_RaspberryPi_Library_Defs import *
+from TMAG5273_RaspberryPi_Library import TMAG5273
+from TMAG5273_RaspberryPi_Library_Sim import SimulatedBus, SimulatedTMAG5273
+
+
+class ManualClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.mark.parametrize("rangeMT", (40, 80))
+def test_threshold_code_round_trip(rangeMT):
+    step = rangeMT / 128
+    for code in range(256):
+        thresholdMT = TMAG5273.calculateThreshold(code, rangeMT)
+        assert -rangeMT <= thresholdMT < rangeMT
+        assert TMAG5273.calculateThresholdCode(thresholdMT, rangeMT) == code
+    assert TMAG5273.calculateThresholdCode(-step, rangeMT) == 0xFF
+    assert TMAG5273.calculateThresholdCode(10 * step + step / 4, rangeMT) == 10
+    with pytest.raises(ValueError):
+        TMAG5273.calculateThresholdCode(rangeMT, rangeMT)
+    with pytest.raises(ValueError):
+        TMAG5273.calculateThresholdCode(-rangeMT - step, rangeMT)
+
+
+def test_thresholds_use_the_axis_range(sensor, device):
+    sensor.configure(range_xy=TMAG5273_RANGE_80MT, range_z=TMAG5273_RANGE_40MT)
+    sensor.setThreshold(TMAG5273_AXIS_X, 20)
+    sensor.setThreshold(TMAG5273_AXIS_Z, -20)
+    assert device.registers[TMAG5273_REG_X_THR_CONFIG] == 32
+    assert device.registers[TMAG5273_REG_Z_THR_CONFIG] == 0xC0
+    assert sensor.getThreshold(TMAG5273_AXIS_X) == 20
+    assert sensor.getThreshold(TMAG5273_AXIS_Z) == -20
+    with pytest.raises(ValueError):
+        sensor.setThreshold(0, 1)
+
+
+def makeMonitor(field):
+    clock = ManualClock()
+    device = SimulatedTMAG5273(field=lambda t: tuple(field), clock=clock)
+    sensor = TMAG5273(SimulatedBus([device], simulateTiming=False))
+    sensor.begin()
+    return sensor, device, clock
+
+
+def advance(device, clock, periods):
+    """Runs periods wake-up cycles of one conversion and 1 ms sleep"""
+    for _ in range(periods):
+        clock.now += device.conversionTime() + 0.001
+        device.update()
+
+
+@pytest.mark.parametrize("crossings, needed", ((TMAG5273_THRESHOLD_1, 1), (TMAG5273_THRESHOLD_4, 4)))
+def test_wake_up_and_sleep_interrupt(crossings, needed):
+    field = [5.0, 0.0, 0.0, 25.0]
+    sensor, device, clock = makeMonitor(field)
+    sensor.armWakeUpAndSleep(x=10.0, sleepTime=TMAG5273_SLEEP_1MS, crossings=crossings)
+    assert sensor.getOperatingMode() == TMAG5273_WAKE_UP_AND_SLEEP_MODE
+    advance(device, clock, 10)
+    assert device.interruptCount == 0
+    assert sensor.getTrippedAxes() == 0
+    field[0] = 15.0
+    advance(device, clock, needed - 1)
+    assert device.interruptCount == 0
+    advance(device, clock, 1)
+    assert device.interruptCount == 1
+    assert sensor.getTrippedAxes() == TMAG5273_AXIS_X
+
+
+def test_symmetric_hysteresis_trips_in_both_directions():
+    field = [0.0, 0.0, -15.0, 25.0]
+    sensor, device, clock = makeMonitor(field)
+    sensor.armWakeUpAndSleep(z=10.0, sleepTime=TMAG5273_SLEEP_1MS, hysteresis=TMAG5273_THRESHOLD_HYST_7LSB)
+    advance(device, clock, 1)
+    assert device.interruptCount == 1
+    assert sensor.getTrippedAxes() == TMAG5273_AXIS_Z
+    with pytest.raises(ValueError):
+        sensor.armWakeUpAndSleep()
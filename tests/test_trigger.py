@@ -0,0 +1,59 @@
+# Single-shot acquisition in stand-by mode: with retrigger the burst read
+# carries the trigger bit, so each sample costs one transaction and the next
+# conversion runs while the caller works.
+import time
+
+import pytest
+
+from TMAG5273_RaspberryPi_Library_Defs import *
+
+
+def test_burst_read_retriggers(sensor, bus, device, field):
+    sample = sensor.triggerAndRead()
+    assert sample.x == pytest.approx(field[0], abs=0.01)
+    assert sensor.getOperatingMode() == TMAG5273_STANDBY_BY_MODE
+    for _ in range(5):
+        count = device.conversionCount
+        bus.resetCounters()
+        assert sensor.triggerAndReadRaw() is not None
+        assert bus.transactions == 1
+        assert device.conversionCount == count + 1
+        assert sensor.triggerPending
+
+
+def test_without_retrigger_the_sensor_stays_idle(sensor, device):
+    assert sensor.triggerAndReadRaw(retrigger=False) is not None
+    assert not sensor.triggerPending
+    count = device.conversionCount
+    time.sleep(5 * sensor.getConversionTime())
+    device.update()
+    assert device.conversionCount == count
+
+
+def test_pending_trigger_is_not_repeated(sensor, bus, device):
+    sensor.triggerAndReadRaw(retrigger=False)
+    sensor.triggerConversion()
+    count = device.conversionCount
+    time.sleep(2 * sensor.getConversionTime())
+    bus.resetCounters()
+    assert sensor.triggerAndReadRaw(retrigger=False) is not None
+    assert bus.transactions == 1
+    assert device.conversionCount == count + 1
+
+
+def test_one_byte_mode_triggers_separately(sensor, bus):
+    sensor.setReadMode(TMAG5273_I2C_MODE_1BYTE_16BIT)
+    sensor.triggerAndReadRaw()
+    bus.resetCounters()
+    for _ in range(3):
+        assert sensor.triggerAndReadRaw() is not None
+    # Plain read plus trigger command per sample
+    assert bus.transactions == 6
+
+
+def test_timeout_without_a_conversion(sensor, device, monkeypatch):
+    sensor.triggerAndReadRaw(retrigger=False)
+    # A device that ignores the trigger
+    monkeypatch.setattr(device, "_addressPhase", lambda register, now: register & ~TMAG5273_I2C_CONV_TRIGGER_BIT)
+    assert sensor.triggerAndReadRaw(timeout=0.02) is None
+    assert not sensor.triggerPending